@@ -1,6 +1,27 @@
-from fastapi import FastAPI
+import logging
+import os
+import time
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from .routers import models, exports, dashboard
+from .services.async_service import RETRY_AFTER_SECONDS, ServiceBusy
+from .utils.metrics import CONTENT_TYPE, REQUEST_SECONDS, render_latest
+
+# Nivel de los logs de la app (LOG_LEVEL) y nivel con el que se registra cada request (REQUEST_LOG_LEVEL)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+REQUEST_LOG_LEVEL = logging.getLevelName(os.getenv('REQUEST_LOG_LEVEL', 'DEBUG').upper())
+if not isinstance(REQUEST_LOG_LEVEL, int):
+    raise ValueError(f"REQUEST_LOG_LEVEL inválido: {os.getenv('REQUEST_LOG_LEVEL')}")
+
+app_logger = logging.getLogger(__package__)
+app_logger.setLevel(LOG_LEVEL)
+if not logging.getLogger().handlers and not app_logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    app_logger.addHandler(handler)
+request_logger = logging.getLogger(f'{__package__}.requests')
 
 app = FastAPI(title='ML & GenAI Model Registry')
 
@@ -13,10 +34,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware('http')
+async def observe_requests(request: Request, call_next):
+    """Mide cada request (histograma por ruta) y lo registra con REQUEST_LOG_LEVEL."""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        # Plantilla de la ruta (/models/{model_id}) para no crear una serie por id
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        REQUEST_SECONDS.observe(elapsed, request.method, route, str(status))
+        request_logger.log(REQUEST_LOG_LEVEL, '%s %s %s %.1fms', request.method, request.url.path, status, elapsed * 1000)
+
+@app.exception_handler(ServiceBusy)
+async def service_busy(request: Request, exc: ServiceBusy):
+    """Cola del pool del servicio llena: el cliente reintenta en lugar de esperar."""
+    return JSONResponse(status_code=503, content={'detail': str(exc)},
+                        headers={'Retry-After': str(RETRY_AFTER_SECONDS)})
+
 app.include_router(models.router)
 app.include_router(exports.router)
 app.include_router(dashboard.router)
 
 @app.get("/")
 async def root():
-    return {"message": "Bienvenido al registro de modelos ML"}
\ No newline at end of file
+    return {"message": "Bienvenido al registro de modelos ML"}
+
+@app.get('/metrics', include_in_schema=False)
+def metrics():
+    """Histogramas de etapas y requests en formato Prometheus."""
+    return Response(render_latest(), media_type=CONTENT_TYPE)
@@ -0,0 +1,67 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Any, List, Literal, Optional
+
+from .model_schema import MLModel
+
+
+def _check_field(name: str) -> str:
+    if name not in MLModel.model_fields:
+        raise ValueError(f'Campo desconocido: {name}')
+    return name
+
+
+class Predicate(BaseModel):
+    field: str
+    op: Literal['eq', 'in', 'gt', 'gte', 'lt', 'lte', 'between'] = 'eq'
+    value: Any
+
+    @field_validator('field')
+    @classmethod
+    def _check_name(cls, v):
+        return _check_field(v)
+
+    @model_validator(mode='after')
+    def _check_value(self):
+        if self.op == 'in' and not isinstance(self.value, list):
+            self.value = [self.value]
+        if self.op == 'between' and (not isinstance(self.value, list) or len(self.value) != 2):
+            raise ValueError("'between' requiere una lista [desde, hasta]")
+        # Los índices comparan y agrupan valores: listas y objetos solo como lista de escalares de 'in'/'between'
+        values = self.value if self.op in ('in', 'between') else [self.value]
+        if any(isinstance(v, (list, dict)) for v in values):
+            expected = 'una lista de valores simples' if self.op in ('in', 'between') else 'un valor simple'
+            raise ValueError(f"'{self.op}' requiere {expected}")
+        return self
+
+
+class ModelQuery(BaseModel):
+    filters: List[Predicate] = []
+    sort_by: Optional[str] = None
+    descending: bool = False
+    latest_only: bool = True
+    offset: int = Field(0, ge=0)
+    limit: int = Field(100, ge=1, le=1000)
+    fields: Optional[List[str]] = None
+
+    @field_validator('sort_by')
+    @classmethod
+    def _check_sort(cls, v):
+        return _check_field(v) if v is not None else v
+
+    @field_validator('fields')
+    @classmethod
+    def _check_fields(cls, v):
+        return [_check_field(f) for f in v] if v is not None else v
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "filters": [
+                    {"field": "algorithm", "op": "in", "value": ["XGBoost", "LightGBM"]},
+                    {"field": "creationTimeStamp", "op": "gte", "value": "2025-01-01T00:00:00Z"}
+                ],
+                "sort_by": "creationTimeStamp",
+                "descending": True,
+                "limit": 50
+            }
+        }
@@ -1,10 +1,11 @@
 
-from fastapi import APIRouter
-from ..services.master import compute_insights
+from fastapi import APIRouter, Request
+from .models import cached_read, model_service
 
 router = APIRouter(prefix='/dashboard', tags=['dashboard'])
 
 
 @router.get('/insights')
-def get_insights():
-    return compute_insights()
+def get_insights(request: Request):
+    # Agregados mantenidos en memoria por ModelService (no recorre el registro); ETag por generación
+    return cached_read(request, model_service, model_service.get_insights)
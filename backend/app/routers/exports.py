@@ -1,12 +1,44 @@
 
-from fastapi import APIRouter
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from ..services.master import open_export
+from ..utils.http_files import file_response
 # from sqlmodel import Session
 # from ..database import get_session
-from ..services.master import rebuild_master
+from .models import model_service
 
 router = APIRouter(prefix='/exports', tags=['exports'])
+MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'parquet': 'application/vnd.apache.parquet',
+               'arrow': 'application/vnd.apache.arrow.file'}
+COMPRESSED_MEDIA_TYPES = {'gzip': ('application/gzip', 'gz'), 'zstd': ('application/zstd', 'zst')}
 
 @router.post('/rebuild')
-def rebuild():
-    rebuild_master()
-    return {'status':'ok'}
+def rebuild(wait: bool = False, full: bool = True, timeout: Optional[float] = 60.0):
+    """Encola la regeneración de exports; con `wait=true` espera a que termine."""
+    done = model_service.exports.request_rebuild(full=full, wait=wait, timeout=timeout)
+    if not wait:
+        status = 'queued'
+    else:
+        status = 'ok' if done and not model_service.exports.last_error else ('error' if done else 'timeout')
+    return {'status': status, **model_service.exports.state()}
+
+@router.get('/status')
+def status():
+    return model_service.exports.state()
+
+@router.get('/download/{name}')
+def download(request: Request, name: Literal['master_all', 'master_latest'],
+             format: Literal['csv', 'parquet', 'arrow'] = 'csv',
+             compression: Literal['none', 'gzip', 'zstd'] = Query('none')):
+    """Descarga el último export generado; admite `Range` para reanudar o leer por partes."""
+    codec = None if compression == 'none' else compression
+    try:
+        fh, tag = open_export(name, format, codec, model_service.exports.data_dir)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail='Export no generado: usar POST /exports/rebuild')
+    filename = f'{name}.{format}'
+    media_type = MEDIA_TYPES[format]
+    if codec is not None:
+        media_type, suffix = COMPRESSED_MEDIA_TYPES[codec]
+        filename = f'{filename}.{suffix}'
+    return file_response(request, fh, media_type, filename, tag)
@@ -1,70 +1,195 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List, Optional
-import json
+from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import Any, Dict, List, Optional
+import logging
+import orjson
+from itertools import chain, islice
 from datetime import datetime
 import uuid
 from pathlib import Path
 
 from ..models.model_schema import MLModel
+from ..models.query_schema import ModelQuery
+from ..services.async_service import ServicePool
 from ..services.model_service import ModelService
+from ..services.bulk import (JSON_SUFFIXES, InvalidDocument, ingest_records, ingest_stream, iter_upload_records,
+                             prepare_record)
+from ..utils.http_cache import cached_json
+from ..utils.metrics import stage
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix='/models', tags=['models'])
 model_service = ModelService()
+# Los endpoints async llaman al servicio a través de este pool (no bloquean el event loop)
+service_pool = ServicePool()
+# Indica si la escritura creó una versión o si el envío era idéntico a la última
+VERSION_CREATED_HEADER = 'X-Version-Created'
+
+def _mark_created(response: Response, created: bool):
+    response.headers[VERSION_CREATED_HEADER] = 'true' if created else 'false'
+
+def cached_read(request: Request, service: ModelService, build):
+    """Lectura con ETag por generación: 304 si el cliente está al día, si no la respuesta cacheada."""
+    return cached_json(request, service.response_cache, service.data_generation(), service.modified_at(), build)
 
 @router.post('', response_model=MLModel)
-def register_model(model: MLModel):
-    return model_service.create_model(model)
+def register_model(model: MLModel, response: Response):
+    result = model_service.register_models([model])[0]
+    _mark_created(response, result.created)
+    return result.model
+
+@router.post('/bulk')
+def register_models_bulk(records: List[Dict[str, Any]] = Body(...)):
+    """Registra una lista de modelos en una sola escritura; reporta el resultado por registro."""
+    return ingest_records(model_service, records)
 
 @router.post('/from-json-file')
-async def register_from_json_file(file: UploadFile = File(...)):
-    print(f"Recibiendo archivo: {file.filename}")
-    if not file.filename.lower().endswith('.json'):
+def register_from_json_file(file: UploadFile = File(...)):
+    # Endpoint sincrónico: la lectura, el parseo y la validación corren en el threadpool, no en el event loop
+    if not file.filename.lower().endswith(JSON_SUFFIXES):
         raise HTTPException(status_code=400, detail='El archivo debe ser .json')
-    
+
+    records = iter_upload_records(file.filename, file.file)
+    head = list(islice(records, 2))
+    invalid = next((record for _, record in head if isinstance(record, InvalidDocument)), None)
+    if invalid is not None:
+        logger.info("JSON inválido en %s: %s", file.filename, invalid.error)
+        raise HTTPException(status_code=400, detail=invalid.error)
+
+    # Ruta relativa al export regenerado
+    export_path = str((Path(__file__).resolve().parents[3] / 'data' / 'exports' / 'master_latest.parquet'))
+    if len(head) != 1:
+        # Lista de objetos o NDJSON: se lee por bloques y se escribe por lotes
+        report = ingest_stream(model_service, chain(head, records))
+        logger.debug("Archivo %s: %d registro(s)", file.filename, report['total'])
+        return {**report, 'export_path': export_path}
+
     try:
-        content = await file.read()
-        print("Contenido del archivo recibido")
-        data = json.loads(content)
-        print("JSON parseado correctamente")
-        print(f"Datos recibidos: {json.dumps(data, indent=2)}")
-
-        # Asegurarse de que custom_properties sea una lista
-        if "custom_properties" in data and not isinstance(data["custom_properties"], list):
-            data["custom_properties"] = []
-
-        model = MLModel(**data)
-        print("Modelo creado desde JSON")
-
-        result = model_service.create_model(model)
-        print(f"Modelo guardado con ID: {result.id}")
-        # Ruta relativa al export regenerado
-        export_path = str((Path(__file__).resolve().parents[3] / 'data' / 'exports' / 'master_latest.parquet'))
-        return {'model': result, 'export_path': export_path}
-    except json.JSONDecodeError as e:
-        print(f"Error decodificando JSON: {str(e)}")
-        raise HTTPException(status_code=400, detail=f'JSON inválido: {str(e)}')
+        with stage('validation'):
+            model = MLModel(**prepare_record(head[0][1]))
+        result = model_service.register_models([model])[0]
+        logger.debug("Modelo %s desde %s (nueva versión: %s)", result.model.id, file.filename, result.created)
+        return {'model': result.model, 'created': result.created, 'export_path': export_path}
     except Exception as e:
-        print(f"Error procesando modelo: {str(e)}")
+        logger.info("Error procesando modelo de %s: %s", file.filename, e)
         raise HTTPException(status_code=400, detail=f'Error procesando modelo: {str(e)}')
 
+@router.post('/upload')
+def upload_model_files(files: List[UploadFile] = File(...)):
+    """Registra uno o varios archivos JSON/NDJSON leídos por bloques; reporta el resultado por registro."""
+    unsupported = [f.filename for f in files if not f.filename.lower().endswith(JSON_SUFFIXES)]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Se esperaban archivos .json/.ndjson/.jsonl: {', '.join(unsupported)}")
+    records = chain.from_iterable(iter_upload_records(f.filename, f.file) for f in files)
+    report = ingest_stream(model_service, records)
+    logger.debug("Carga de %d archivo(s): %d registro(s)", len(files), report['total'])
+    return {**report, 'files': [f.filename for f in files]}
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(',') if f.strip()]
+    unknown = [f for f in requested if f not in MLModel.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconocidos: {', '.join(unknown)}")
+    return requested
+
+@router.get('/page')
+async def get_models_page(latest_only: bool = True, limit: int = Query(100, ge=1, le=1000),
+                          cursor: Optional[str] = None, offset: int = Query(0, ge=0), fields: Optional[str] = None):
+    """Listado paginado; `fields=id,name,...` devuelve solo esas columnas."""
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail='Cursor inválido')
+    return await service_pool.run(model_service.get_models_page, latest_only, limit, cursor, offset,
+                                  _parse_fields(fields))
+
+@router.get('/stream')
+def stream_models(latest_only: bool = True, fields: Optional[str] = None):
+    """Listado completo en NDJSON, serializado por bloques a medida que se envía."""
+    projection = _parse_fields(fields)
+
+    def generate():
+        for chunk in model_service.iter_models(latest_only, projection):
+            yield b''.join(orjson.dumps(item) + b'\n' for item in chunk)
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+@router.get('/search')
+def search_models(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=500), fields: Optional[str] = None):
+    """Búsqueda por texto (nombre, descripción, versión, modeler y custom properties) con prefijos."""
+    return model_service.search_models(q, limit, _parse_fields(fields))
+
+@router.post('/query')
+def query_models(query: ModelQuery):
+    """Filtros de igualdad, IN y rango con orden y paginación."""
+    try:
+        return model_service.query_models(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get('/query')
+def query_models_get(algorithm: Optional[str] = None, modelType: Optional[str] = None,
+                     function: Optional[str] = None, tool: Optional[str] = None,
+                     createdBy: Optional[str] = None, created_from: Optional[datetime] = None,
+                     created_to: Optional[datetime] = None, sort_by: Optional[str] = None,
+                     descending: bool = False, latest_only: bool = True,
+                     offset: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000),
+                     fields: Optional[str] = None):
+    """Versión por query string de POST /models/query (valores separados por coma = IN)."""
+    filters = []
+    for field, value in (('algorithm', algorithm), ('modelType', modelType), ('function', function),
+                         ('tool', tool), ('createdBy', createdBy)):
+        if value is not None:
+            values = value.split(',')
+            filters.append({'field': field, 'op': 'in', 'value': values} if len(values) > 1
+                           else {'field': field, 'op': 'eq', 'value': value})
+    if created_from is not None:
+        filters.append({'field': 'creationTimeStamp', 'op': 'gte', 'value': created_from})
+    if created_to is not None:
+        filters.append({'field': 'creationTimeStamp', 'op': 'lte', 'value': created_to})
+    try:
+        query = ModelQuery(filters=filters, sort_by=sort_by, descending=descending, latest_only=latest_only,
+                           offset=offset, limit=limit, fields=_parse_fields(fields))
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False))
+    return query_models(query)
+
 @router.get("/{model_id}", response_model=MLModel)
 async def get_model(model_id: str, version: Optional[int] = None):
-    model = model_service.get_model(model_id, version)
+    if model_service.fast_serialization:
+        body = await service_pool.run(model_service.get_model_json, model_id, version)
+        if body is None:
+            raise HTTPException(status_code=404, detail="Modelo no encontrado")
+        # Mismo esquema que MLModel, sin revalidar la fila guardada
+        return Response(body, media_type='application/json')
+    model = await service_pool.run(model_service.get_model, model_id, version)
     if not model:
         raise HTTPException(status_code=404, detail="Modelo no encontrado")
     return model
 
+@router.get("/{model_id}/diff")
+def diff_model_versions(model_id: str, from_version: Optional[int] = Query(None, alias='from'),
+                        to_version: Optional[int] = Query(None, alias='to')):
+    diff = model_service.diff_versions(model_id, from_version, to_version)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Modelo o versión no encontrados")
+    return diff
+
 @router.put("/{model_id}", response_model=MLModel)
-async def update_model(model_id: str, model: MLModel):
-    updated_model = model_service.update_model(model_id, model)
-    if not updated_model:
+async def update_model(model_id: str, model: MLModel, response: Response):
+    result = await service_pool.run(model_service.revise_model, model_id, model)
+    if not result:
         raise HTTPException(status_code=404, detail="Modelo no encontrado")
-    return updated_model
+    _mark_created(response, result.created)
+    return result.model
 
 @router.get("/", response_model=List[MLModel])
-async def get_all_models(latest_only: bool = True):
-    return model_service.get_all_models(latest_only)
+async def get_all_models(request: Request, latest_only: bool = True, offset: int = Query(0, ge=0),
+                         limit: Optional[int] = Query(None, ge=1)):
+    build = model_service.get_all_models_json if model_service.fast_serialization else model_service.get_all_models
+    return await service_pool.run(cached_read, request, model_service, lambda: build(latest_only, offset, limit))
 
 @router.get("/summary/dashboard/")
-async def get_models_summary():
-    return model_service.get_models_summary()
\ No newline at end of file
+async def get_models_summary(request: Request):
+    return await service_pool.run(cached_read, request, model_service, model_service.get_models_summary)
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Retención por niveles: las versiones viejas salen del registro caliente.
+
+Casi todas las lecturas usan solo la última versión de cada modelo, pero cada
+edición agrega una fila a `models.parquet` y a la memoria del servicio. Con una
+política de retención, la compactación de `SegmentStore` mueve las versiones
+que quedan fuera de ella a un archivo frío particionado:
+
+- `MODEL_RETENTION_VERSIONS=N`: se conservan las últimas N versiones de cada modelo.
+- `MODEL_RETENTION_DAYS=D`: se conservan las versiones modificadas en los últimos D días.
+
+Una versión se archiva solo si queda fuera de las dos reglas configuradas y la
+última versión nunca se archiva. Sin ninguna de las dos variables no se
+archiva nada.
+
+El archivo está en `archive/bucket=<NN>/part-<generación>.parquet`, con los
+modelos repartidos por hash del id. Cada fila guarda la versión completa (sin
+deltas), ordenada por id y versión: leer una versión archivada abre solo los
+archivos de su partición y las estadísticas de los row groups saltan el resto.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .history import HistoryResolver
+from .registry_schema import conform_table
+
+ARCHIVE_DIR = 'archive'
+PART_PREFIX = 'part-'
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name, '').strip()
+    if not value:
+        return None
+    number = cast(value)
+    if number < 0:
+        raise ValueError(f'{name} inválido: {value}')
+    return number or None
+
+
+class RetentionPolicy(NamedTuple):
+    # Últimas versiones de cada modelo que quedan en el registro caliente (None = sin regla)
+    keep_versions: Optional[int] = None
+    # Días hacia atrás (por modifiedTimeStamp, o creationTimeStamp) que quedan calientes
+    keep_days: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> 'RetentionPolicy':
+        return cls(_env_number('MODEL_RETENTION_VERSIONS', int), _env_number('MODEL_RETENTION_DAYS', float))
+
+    @property
+    def enabled(self) -> bool:
+        return self.keep_versions is not None or self.keep_days is not None
+
+    def split(self, table: pa.Table, now: Optional[datetime] = None) -> Tuple[pa.Table, Optional[pa.Table]]:
+        """Separa `table` en (caliente, frío). Lo frío sale con las versiones completas; None si no hay nada que archivar."""
+        if not self.enabled or table.num_rows == 0 or 'id' not in table.column_names:
+            return table, None
+        keys = pd.DataFrame({'id': table.column('id').to_pandas(), 'version': table.column('version').to_pandas()})
+        # 1 = última versión del modelo; ante versiones repetidas gana la fila escrita más tarde
+        rank = keys.iloc[::-1].groupby('id', sort=False)['version'].rank(method='first', ascending=False)
+        rank = rank.sort_index().to_numpy()
+        cold = rank > (self.keep_versions or 1)
+        if not cold.any():
+            return table, None
+        resolver = HistoryResolver(table)
+        candidates = np.flatnonzero(cold)
+        archived = resolver.take(candidates)
+        if self.keep_days is not None:
+            limit = (now or datetime.now(timezone.utc)) - timedelta(days=self.keep_days)
+            stamps = archived.column('modifiedTimeStamp').to_pandas()
+            stamps = stamps.fillna(archived.column('creationTimeStamp').to_pandas())
+            # Sin fecha cuenta como vieja: solo la protege la regla de versiones
+            old = (stamps.isna() | (stamps < pd.Timestamp(limit))).to_numpy()
+            cold[candidates[~old]] = False
+            archived = archived.filter(pa.array(old))
+            if not old.any():
+                return table, None
+        hot = table.filter(pa.array(~cold))
+        return hot, archived
+
+
+def _bucket(model_id: str, buckets: int) -> int:
+    digest = hashlib.blake2b(str(model_id).encode('utf-8'), digest_size=4).digest()
+    return int.from_bytes(digest, 'big') % buckets
+
+
+class VersionArchive:
+    """Versiones archivadas, particionadas por hash del id. Los archivos no se modifican: cada compactación agrega uno por partición."""
+
+    def __init__(self, data_dir: Path, buckets: Optional[int] = None):
+        self.root = Path(data_dir) / ARCHIVE_DIR
+        self.layout_file = self.root / 'archive.json'
+        self._buckets = buckets
+
+    @property
+    def buckets(self) -> int:
+        # La cantidad de particiones queda fija con el primer archivo escrito
+        if self._buckets is None:
+            try:
+                self._buckets = int(json.loads(self.layout_file.read_text())['buckets'])
+            except (OSError, ValueError, KeyError):
+                self._buckets = int(os.getenv('MODEL_ARCHIVE_BUCKETS', '16'))
+        return self._buckets
+
+    def exists(self) -> bool:
+        return self.layout_file.exists()
+
+    def _bucket_dir(self, bucket: int) -> Path:
+        return self.root / f'bucket={bucket:02d}'
+
+    def _parts(self, bucket: Optional[int] = None) -> List[Path]:
+        if not self.exists():
+            return []
+        pattern = f'{PART_PREFIX}*.parquet'
+        dirs = [self._bucket_dir(bucket)] if bucket is not None else sorted(self.root.glob('bucket=*'))
+        return [p for d in dirs for p in sorted(d.glob(pattern))]
+
+    def write(self, table: pa.Table, generation: int) -> int:
+        """Agrega las filas de `table` (versiones completas); devuelve cuántas se escribieron."""
+        # segment_store importa este módulo
+        from .segment_store import _atomic_write, _to_parquet_bytes
+
+        if table.num_rows == 0:
+            return 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        if not self.exists():
+            _atomic_write(self.layout_file, json.dumps({'buckets': self.buckets}).encode())
+        buckets = np.array([_bucket(model_id, self.buckets) for model_id in table.column('id').to_pylist()])
+        for bucket in np.unique(buckets):
+            part = table.filter(pa.array(buckets == bucket)).sort_by([('id', 'ascending'), ('version', 'ascending')])
+            path = self._bucket_dir(int(bucket)) / f'{PART_PREFIX}{generation:012d}.parquet'
+            path.parent.mkdir(exist_ok=True)
+            # Un reintento de la misma compactación reemplaza el archivo en lugar de duplicarlo
+            _atomic_write(path, _to_parquet_bytes(part))
+        return table.num_rows
+
+    def _read(self, model_id: str, version: Optional[int] = None) -> Optional[pa.Table]:
+        filters = [('id', '=', model_id)] + ([('version', '=', int(version))] if version is not None else [])
+        tables = [pq.read_table(p, filters=filters) for p in self._parts(_bucket(model_id, self.buckets))]
+        tables = [conform_table(t) for t in tables if t.num_rows]
+        if not tables:
+            return None
+        return pa.concat_tables(tables, promote_options='permissive')
+
+    def get(self, model_id: str, version: int) -> Optional[dict]:
+        table = self._read(model_id, version)
+        # Si una compactación se repitió, todas las copias son iguales
+        return table.slice(table.num_rows - 1).to_pylist()[0] if table is not None else None
+
+    def versions(self, model_id: str) -> List[int]:
+        table = self._read(model_id)
+        return sorted(set(table.column('version').to_pylist())) if table is not None else []
+
+    def scan_table(self) -> Optional[pa.Table]:
+        """Todas las versiones archivadas (para los exports), sin repetidas."""
+        tables = [conform_table(pq.read_table(p)) for p in self._parts()]
+        tables = [t for t in tables if t.num_rows]
+        if not tables:
+            return None
+        table = pa.concat_tables(tables, promote_options='permissive')
+        keys = pd.DataFrame({'id': table.column('id').to_pandas(), 'version': table.column('version').to_pandas()})
+        unique = ~keys.duplicated(keep='last').to_numpy()
+        return table if unique.all() else table.filter(pa.array(unique))
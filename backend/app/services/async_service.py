@@ -0,0 +1,82 @@
+"""
+Llamadas a `ModelService` desde endpoints `async` sin bloquear el event loop.
+
+pandas, Arrow y el disco son síncronos: si un endpoint `async` los llama
+directo, el loop queda detenido y todos los requests del worker esperan.
+`ServicePool` corre esas llamadas en un pool de hilos acotado
+(`SERVICE_WORKERS`) y limita cuántas pueden esperar turno
+(`SERVICE_MAX_QUEUE`). Con la cola llena la llamada falla enseguida con
+`ServiceBusy` (503 con Retry-After) en lugar de acumular requests que igual
+vencerían. Dentro del pool las lecturas corren en paralelo y las escrituras
+de a una, por el `RWLock` de `ModelService`.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from ..utils.metrics import STAGE_SECONDS
+
+# Segundos sugeridos al cliente (Retry-After) cuando la cola está llena
+RETRY_AFTER_SECONDS = 1
+
+
+class ServiceBusy(RuntimeError):
+    pass
+
+
+class ServicePool:
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        if max_workers is None:
+            max_workers = int(os.getenv('SERVICE_WORKERS', '8'))
+        if max_queue is None:
+            max_queue = int(os.getenv('SERVICE_MAX_QUEUE', '64'))
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='model-service')
+        self._lock = threading.Lock()
+        # Llamadas aceptadas y todavía no terminadas (en ejecución + en cola)
+        self._pending = 0
+        self._running = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'workers': self.max_workers, 'running': self._running,
+                    'queued': self._pending - self._running, 'max_queue': self.max_queue}
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def _call(self, submitted_at: float, fn: Callable, *args, **kwargs):
+        # Tiempo en cola, separado del de la etapa que corre después
+        STAGE_SECONDS.observe(time.perf_counter() - submitted_at, 'service_queue')
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Ejecuta `fn(*args, **kwargs)` en el pool. Lanza ServiceBusy si la cola está llena."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise ServiceBusy(f'Servicio saturado: {self._pending} llamadas pendientes')
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(self._call, time.perf_counter(), fn, *args, **kwargs))
+        except BaseException:
+            self._release(None)
+            raise
+        # El cupo se libera cuando termina el hilo, aunque el request se cancele antes
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
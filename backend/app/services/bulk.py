@@ -0,0 +1,307 @@
+"""
+Ingesta masiva de modelos.
+
+Acepta un arreglo JSON, un objeto JSON, NDJSON o un directorio con archivos
+`.json`/`.ndjson`/`.jsonl`. Los registros se validan contra `MLModel` por lotes
+(en paralelo con procesos cuando el volumen lo justifica) y todos los válidos
+se escriben con un único append, un único guardado y un único rebuild de exports.
+
+Para archivos grandes (`ingest_stream`), el JSON se decodifica por bloques
+(`iter_json_stream`) y cada lote se valida en un pool de procesos mientras se
+lee el siguiente; cada lote válido se escribe con su propio append, de modo que
+la memoria depende del tamaño de lote y no del archivo.
+"""
+
+import codecs
+import json
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from pathlib import Path
+from typing import Any, BinaryIO, Deque, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..models.model_schema import MLModel
+from ..utils.metrics import stage
+
+JSON_SUFFIXES = ('.json', '.ndjson', '.jsonl')
+# Por debajo de este volumen el costo de levantar procesos supera la validación
+PARALLEL_THRESHOLD = int(os.getenv('BULK_PARALLEL_THRESHOLD', '2000'))
+# Registros por lote (validación + append) en la ingesta por streaming
+STREAM_BATCH_SIZE = int(os.getenv('BULK_STREAM_BATCH_SIZE', '2000'))
+# Procesos del pool de validación compartido (0 = núcleos disponibles)
+BULK_WORKERS = int(os.getenv('BULK_WORKERS', '0')) or (os.cpu_count() or 1)
+READ_CHUNK_SIZE = 1 << 16
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def parse_json_records(content: Union[str, bytes]) -> List[Any]:
+    """Interpreta `content` como arreglo JSON, objeto JSON o NDJSON."""
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    text = content.strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # NDJSON: un documento por línea
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+
+class _JsonStream:
+    """Texto JSON leído por bloques; solo se conserva lo que aún no se decodificó."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._raw_decode = json.JSONDecoder().raw_decode
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self) -> bool:
+        if self.eof:
+            return False
+        chunk = next(self._chunks, None)
+        self.eof = chunk is None
+        self.buf = self.buf[self.pos:] + self._decoder.decode(chunk or b'', final=self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Siguiente carácter que no es espacio ('' al final del documento)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read():
+                return ''
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._raw_decode(self.buf, self.pos)
+                # Un número que llega al borde del bloque puede seguir en el próximo
+                if end < len(self.buf) or self.eof or not isinstance(value, (int, float)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Se lee hasta duplicar lo pendiente: un registro grande no se redecodifica en cada bloque
+            pending = len(self.buf) - self.pos
+            while len(self.buf) - self.pos < 2 * pending and self._read():
+                pass
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+
+def iter_json_stream(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Equivalente incremental de `parse_json_records`: registros de un arreglo, un objeto o NDJSON."""
+    stream = _JsonStream(chunks)
+    if stream.peek() != '[':
+        # Objeto único o NDJSON: una secuencia de documentos
+        while stream.peek():
+            yield stream.value()
+        return
+    stream.pos += 1
+    if stream.peek() == ']':
+        stream.pos += 1
+    else:
+        while True:
+            yield stream.value()
+            separator = stream.peek()
+            stream.pos += 1
+            if separator == ']':
+                break
+            if separator != ',':
+                stream.pos -= 1
+                raise stream.error("Se esperaba ',' o ']'")
+    if stream.peek():
+        raise stream.error('Contenido después del arreglo')
+
+
+def read_chunks(fh: BinaryIO, size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+    return iter(lambda: fh.read(size), b'')
+
+
+class InvalidDocument:
+    """Marca en lugar de un registro cuando el archivo deja de ser JSON válido."""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def iter_upload_records(name: str, fh: BinaryIO) -> Iterator[Tuple[str, Any]]:
+    """(origen, registro) de un archivo subido; un error de formato termina el archivo con un InvalidDocument."""
+    i = 0
+    try:
+        for i, record in enumerate(iter_json_stream(read_chunks(fh)), start=1):
+            yield f'{name}[{i - 1}]', record
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        yield (f'{name}[{i}]' if i else name), InvalidDocument(f'JSON inválido: {e}')
+
+
+def iter_path_records(path: Path) -> Iterator[Tuple[str, Any]]:
+    """Recorre un archivo o directorio y produce (origen, registro).
+
+    Como en `iter_upload_records`, un archivo ilegible o con JSON inválido
+    produce un InvalidDocument y se sigue con el siguiente.
+    """
+    path = Path(path)
+    files = sorted(p for p in path.iterdir() if p.suffix.lower() in JSON_SUFFIXES) if path.is_dir() else [path]
+    for file in files:
+        try:
+            fh = open(file, 'rb')
+        except OSError as e:
+            yield file.name, InvalidDocument(f'No se pudo leer: {e}')
+            continue
+        with fh:
+            yield from iter_upload_records(file.name, fh)
+
+
+def prepare_record(record: Any) -> Any:
+    """Ajustes tolerados antes de validar contra MLModel."""
+    if not isinstance(record, dict):
+        return record
+    # Los JSON exportados de la herramienta usan "custom properties" (con espacio)
+    if "custom_properties" not in record and "custom properties" in record:
+        record = dict(record)
+        record["custom_properties"] = record.pop("custom properties")
+    # Asegurarse de que custom_properties sea una lista
+    if "custom_properties" in record and not isinstance(record["custom_properties"], list):
+        record = dict(record, custom_properties=[])
+    return record
+
+
+def _validate_batch(records: List[Any]) -> List[Tuple[Optional[MLModel], Optional[str]]]:
+    results = []
+    for record in records:
+        if isinstance(record, InvalidDocument):
+            results.append((None, record.error))
+            continue
+        try:
+            results.append((MLModel(**prepare_record(record)), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def validate_records(records: List[Any], batch_size: int = 500,
+                     workers: Optional[int] = None) -> List[Tuple[Optional[MLModel], Optional[str]]]:
+    """Valida `records` contra MLModel y devuelve (modelo, error) por registro, en orden.
+
+    Con `workers` > 1 (por defecto BULK_WORKERS) los lotes van al pool de procesos compartido.
+    """
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    if workers is None:
+        workers = BULK_WORKERS
+    with stage('validation'):
+        if workers > 1 and len(batches) > 1 and len(records) >= PARALLEL_THRESHOLD:
+            try:
+                validated = _validation_pool().map(_validate_batch, batches)
+                return [item for batch in validated for item in batch]
+            except BrokenProcessPool:
+                _reset_pool()
+        return [item for batch in batches for item in _validate_batch(batch)]
+
+
+def _report(report: dict, sources: List[str], validated, written):
+    written_iter = iter(written)
+    for source, (model, error) in zip(sources, validated):
+        report['total'] += 1
+        if model is None:
+            report['failed'] += 1
+            report['results'].append({'source': source, 'status': 'error', 'error': error})
+        else:
+            saved, created = next(written_iter)
+            report['created' if created else 'unchanged'] += 1
+            # 'unchanged': idéntico a la última versión, no se escribió
+            report['results'].append({'source': source, 'status': 'created' if created else 'unchanged',
+                                      'id': saved.id, 'version': saved.version})
+    return report
+
+
+def ingest_records(service, records: Iterable[Any], sources: Optional[List[str]] = None,
+                   batch_size: int = 500, workers: Optional[int] = None) -> dict:
+    """Valida e inserta `records` en `service` con una sola escritura.
+
+    Devuelve un reporte con el resultado de cada registro.
+    """
+    records = list(records)
+    if sources is None:
+        sources = [f'[{i}]' for i in range(len(records))]
+    validated = validate_records(records, batch_size=batch_size, workers=workers)
+
+    valid = [model for model, _ in validated if model is not None]
+    written = service.register_models(valid) if valid else []
+    return _report({'total': 0, 'created': 0, 'unchanged': 0, 'failed': 0, 'results': []},
+                   sources, validated, written)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _validation_pool() -> ProcessPoolExecutor:
+    """Pool de procesos compartido por `validate_records` y las ingestas por streaming (se crea con el primer uso)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: la ingesta corre en hilos del servidor y un fork copiaría locks tomados por otros hilos
+            _pool = ProcessPoolExecutor(max_workers=BULK_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def ingest_stream(service, records: Iterable[Tuple[str, Any]], batch_size: Optional[int] = None,
+                  parallel: bool = True) -> dict:
+    """Valida e inserta (origen, registro) por lotes a medida que se leen.
+
+    Cada lote se valida en el pool de procesos mientras se lee el siguiente (si
+    hay más de un lote) y los válidos se escriben en orden, con un append por
+    lote. Como mucho hay BULK_WORKERS lotes en vuelo. Mismo reporte que `ingest_records`.
+    """
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    report = {'total': 0, 'created': 0, 'unchanged': 0, 'failed': 0, 'results': []}
+    inflight: Deque[Tuple[List[str], List[Any], Optional[Future]]] = deque()
+
+    def write(sources: List[str], items: List[Any], future: Optional[Future]):
+        with stage('validation'):
+            try:
+                validated = future.result() if future is not None else _validate_batch(items)
+            except BrokenProcessPool:
+                _reset_pool()
+                validated = _validate_batch(items)
+        valid = [model for model, _ in validated if model is not None]
+        _report(report, sources, validated, service.register_models(valid) if valid else [])
+
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        sources, items = [s for s, _ in batch], [r for _, r in batch]
+        future = None
+        # Un solo lote corto se valida en este hilo: no justifica pasar por otro proceso
+        if parallel and BULK_WORKERS > 1 and (inflight or len(batch) == batch_size):
+            future = _validation_pool().submit(_validate_batch, items)
+        inflight.append((sources, items, future))
+        while len(inflight) > BULK_WORKERS:
+            write(*inflight.popleft())
+    while inflight:
+        write(*inflight.popleft())
+    return report
@@ -0,0 +1,53 @@
+"""
+Hash canónico del contenido de una versión.
+
+Se calcula sobre los campos que envía el cliente, sin los que asigna el
+servidor (versión, fecha de modificación, metadata del historial), así dos
+envíos iguales del mismo modelo producen el mismo hash aunque lleguen en
+momentos distintos. El servicio lo guarda en la columna `content_hash` de
+cada fila y lo usa para no escribir versiones que no cambian nada.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from .registry_schema import REGISTRY_SCHEMA
+
+HASH_COLUMN = 'content_hash'
+# Campos asignados por el servidor: no forman parte del contenido
+SERVER_FIELDS = ('version', 'modifiedTimeStamp', '_changed', HASH_COLUMN)
+HASHED_FIELDS = tuple(n for n in REGISTRY_SCHEMA.names if n not in SERVER_FIELDS)
+
+
+def _canonical(value):
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items()}
+    if hasattr(value, 'model_dump') or hasattr(value, 'dict'):
+        return _canonical(value.model_dump() if hasattr(value, 'model_dump') else value.dict())
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime):
+        # Fechas sin zona = UTC, igual que en el esquema del registro
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def content_hash(row: dict) -> str:
+    """Hash (hex) del contenido de `row`; el orden de las claves no influye."""
+    payload = {f: _canonical(row.get(f)) for f in HASHED_FIELDS}
+    text = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,142 @@
+"""
+Regeneración de exports en segundo plano.
+
+Las escrituras solo avisan al scheduler (`notify`) y un hilo worker agrupa las
+ráfagas en una sola llamada a `rebuild_master`: espera `debounce` segundos sin
+escrituras nuevas, pero nunca deja los exports más de `max_staleness` segundos
+desactualizados.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from .master import rebuild_master
+
+logger = logging.getLogger(__name__)
+
+
+class ExportScheduler:
+    def __init__(self, data_dir: Path, debounce: Optional[float] = None, max_staleness: Optional[float] = None):
+        self.data_dir = Path(data_dir)
+        if debounce is None:
+            debounce = float(os.getenv('EXPORT_DEBOUNCE_SECONDS', '1.0'))
+        if max_staleness is None:
+            max_staleness = float(os.getenv('EXPORT_MAX_STALENESS_SECONDS', '10'))
+        self.debounce = debounce
+        self.max_staleness = max(max_staleness, debounce)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        # Cada aviso o solicitud recibe un ticket; el worker marca hasta cuál completó
+        self._requested = 0
+        self._completed = 0
+        self._first_pending_at: Optional[float] = None
+        self._last_notify_at: Optional[float] = None
+        self._immediate = False
+        self._full = False
+        self._running = False
+        self.pending_generation = 0
+        self.exported_generation = 0
+        self.last_rebuild_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _enqueue(self, generation: Optional[int] = None, immediate: bool = False, full: bool = False) -> int:
+        now = time.monotonic()
+        with self._cond:
+            self._requested += 1
+            if generation is not None:
+                self.pending_generation = max(self.pending_generation, generation)
+            if self._first_pending_at is None:
+                self._first_pending_at = now
+            self._last_notify_at = now
+            self._immediate = self._immediate or immediate
+            self._full = self._full or full
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='export-scheduler', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+            return self._requested
+
+    def notify(self, generation: Optional[int] = None):
+        """Registra una escritura; la regeneración ocurre tras el debounce."""
+        self._enqueue(generation)
+
+    def request_rebuild(self, full: bool = False, wait: bool = False, timeout: Optional[float] = None) -> bool:
+        """Encola una regeneración inmediata. Con `wait` bloquea hasta que termine.
+
+        Devuelve False si se agotó `timeout` antes de completarse.
+        """
+        ticket = self._enqueue(immediate=True, full=full)
+        if not wait:
+            return True
+        with self._cond:
+            return self._cond.wait_for(lambda: self._completed >= ticket, timeout=timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Fuerza la regeneración pendiente (si la hay) y espera a que termine."""
+        with self._cond:
+            if self._completed >= self._requested:
+                return True
+        return self.request_rebuild(wait=True, timeout=timeout)
+
+    def state(self) -> dict:
+        with self._cond:
+            return {
+                'running': self._running,
+                'pending': self._completed < self._requested,
+                'pending_generation': self.pending_generation,
+                'exported_generation': self.exported_generation,
+                'last_rebuild_at': self.last_rebuild_at.isoformat() if self.last_rebuild_at else None,
+                'last_duration_seconds': self.last_duration,
+                'last_error': self.last_error,
+                'debounce_seconds': self.debounce,
+                'max_staleness_seconds': self.max_staleness,
+            }
+
+    def _due_in(self) -> float:
+        if self._immediate:
+            return 0.0
+        now = time.monotonic()
+        due = min(self._last_notify_at + self.debounce, self._first_pending_at + self.max_staleness)
+        return max(0.0, due - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._completed >= self._requested:
+                    self._cond.wait()
+                # Esperar a que la ráfaga de escrituras se calme (o venza la staleness máxima)
+                delay = self._due_in()
+                while delay > 0:
+                    self._cond.wait(delay)
+                    delay = self._due_in()
+                ticket = self._requested
+                generation = self.pending_generation
+                full = self._full
+                self._first_pending_at = None
+                self._immediate = False
+                self._full = False
+                self._running = True
+
+            started = time.monotonic()
+            error = None
+            try:
+                rebuild_master(self.data_dir, incremental=not full)
+            except Exception as e:
+                error = str(e)
+                logger.warning("Fallo al regenerar exports: %s", e)
+
+            with self._cond:
+                self._running = False
+                self._completed = ticket
+                self.last_duration = time.monotonic() - started
+                self.last_error = error
+                if error is None:
+                    self.exported_generation = max(self.exported_generation, generation)
+                    self.last_rebuild_at = datetime.now(timezone.utc)
+                self._cond.notify_all()
@@ -0,0 +1,199 @@
+"""
+Historial de versiones codificado por deltas.
+
+Cada escritura agrega la versión completa; al compactar, las versiones que
+dejaron de ser la última se reemplazan por un delta inverso respecto de la
+versión siguiente: solo guardan los campos que cambiaron y su lista en
+`_changed` (los demás quedan nulos). Así la última versión de cada modelo
+siempre está completa y una versión vieja se reconstruye caminando hacia
+adelante hasta la primera fila completa. Cada `checkpoint_every` versiones
+se conserva una fila completa, lo que acota ese camino.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .registry_schema import REGISTRY_SCHEMA, conform_table
+
+CHANGED_COLUMN = '_changed'
+# Campos versionados (id, versión y hash identifican la fila; `_changed` es metadata)
+HISTORY_FIELDS = tuple(n for n in REGISTRY_SCHEMA.names if n not in ('id', 'version', 'content_hash', CHANGED_COLUMN))
+
+
+def is_delta(changed) -> bool:
+    """True si el valor de `_changed` corresponde a una fila delta."""
+    if changed is None:
+        return False
+    if isinstance(changed, (list, tuple, np.ndarray)):
+        return True
+    return not pd.isna(changed)
+
+
+def same_value(a, b) -> bool:
+    if isinstance(a, np.ndarray):
+        a = a.tolist()
+    if isinstance(b, np.ndarray):
+        b = b.tolist()
+    a_missing = a is None or (pd.api.types.is_scalar(a) and pd.isna(a))
+    b_missing = b is None or (pd.api.types.is_scalar(b) and pd.isna(b))
+    if a_missing or b_missing:
+        return a_missing and b_missing
+    return a == b
+
+
+def make_delta(row: dict, next_full: dict) -> dict:
+    """Delta inverso de `row` respecto de la versión siguiente ya reconstruida."""
+    changed = [f for f in HISTORY_FIELDS if not same_value(row.get(f), next_full.get(f))]
+    delta = {k: (v if k not in HISTORY_FIELDS else None) for k, v in row.items()}
+    for f in changed:
+        delta[f] = row.get(f)
+    delta[CHANGED_COLUMN] = changed
+    return delta
+
+
+def apply_delta(next_full: dict, delta: dict) -> dict:
+    """Reconstruye la versión de `delta` a partir de la versión siguiente completa."""
+    row = dict(next_full)
+    changed = delta[CHANGED_COLUMN]
+    for f in (changed.tolist() if isinstance(changed, np.ndarray) else changed):
+        row[f] = delta.get(f)
+    # Lo que no es contenido versionado (versión, hash) es propio de cada fila
+    row.update((k, v) for k, v in delta.items() if k not in HISTORY_FIELDS)
+    row[CHANGED_COLUMN] = None
+    return row
+
+
+def reconstruct(chain: Iterable[dict], full: dict) -> dict:
+    """`chain` son las filas delta desde la versión pedida hacia adelante; `full` la primera fila completa."""
+    row = full
+    for delta in reversed(list(chain)):
+        row = apply_delta(row, delta)
+    return row
+
+
+def encode_history(table: Optional[pa.Table], checkpoint_every: int) -> Optional[pa.Table]:
+    """Reemplaza por deltas inversos las versiones completas que ya no son la última.
+
+    Solo se leen las filas de los modelos afectados; el resto de la tabla no se copia.
+    """
+    if table is None or checkpoint_every <= 1 or table.num_rows == 0 or 'id' not in table.column_names:
+        return table
+    ids = table.column('id').to_pylist()
+    versions = table.column('version').to_pylist()
+    deltas = table.column(CHANGED_COLUMN).is_valid().to_pylist()
+    by_id: Dict[str, List[tuple]] = {}
+    for position, (model_id, version) in enumerate(zip(ids, versions)):
+        by_id.setdefault(model_id, []).append((version, position))
+
+    # Por modelo: versiones completas superadas que no son checkpoint
+    work: Dict[str, List[tuple]] = {}
+    for model_id, entries in by_id.items():
+        if len(entries) < 2:
+            continue
+        entries.sort()
+        if len({v for v, _ in entries}) != len(entries):
+            # Versiones repetidas (datos legacy): el historial se deja como está
+            continue
+        candidates = [v for v, p in entries[:-1] if not deltas[p] and v % checkpoint_every != 0]
+        if candidates:
+            lowest = min(candidates)
+            work[model_id] = [(v, p) for v, p in entries if v >= lowest]
+    if not work:
+        return table
+
+    involved = sorted(p for entries in work.values() for _, p in entries)
+    rows = dict(zip(involved, table.take(pa.array(involved, type=pa.int64())).to_pylist()))
+    replacements: Dict[int, dict] = {}
+    for entries in work.values():
+        full = rows[entries[-1][1]]
+        for version, position in reversed(entries[:-1]):
+            row = rows[position]
+            if deltas[position]:
+                full = apply_delta(full, row)
+            elif version % checkpoint_every == 0:
+                full = row
+            else:
+                replacements[position] = make_delta(row, full)
+                full = row
+
+    positions = sorted(replacements)
+    encoded = conform_table(pa.Table.from_pylist([replacements[p] for p in positions]))
+    merged = pa.concat_tables([conform_table(table), encoded], promote_options='permissive')
+    order = np.arange(table.num_rows)
+    order[positions] = table.num_rows + np.arange(len(positions))
+    return merged.take(pa.array(order))
+
+
+class HistoryResolver:
+    """Reconstruye por lotes las versiones delta de una tabla del registro, sin expandirla completa.
+
+    Solo se indexan (versión, posición) los modelos que tienen alguna fila delta.
+    """
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        self._delta: Optional[np.ndarray] = None
+        self._chains: Dict[str, List[tuple]] = {}
+        if CHANGED_COLUMN not in table.column_names or table.num_rows == 0:
+            return
+        delta = table.column(CHANGED_COLUMN).is_valid()
+        if not pc.any(delta).as_py():
+            return
+        self._delta = delta.to_numpy()
+        ids = table.column('id')
+        affected = np.flatnonzero(pc.is_in(ids, value_set=pc.unique(ids.filter(delta))).to_numpy())
+        keys = table.select(['id', 'version']).take(pa.array(affected, type=pa.int64()))
+        for model_id, version, position in zip(keys.column('id').to_pylist(), keys.column('version').to_pylist(),
+                                               affected.tolist()):
+            self._chains.setdefault(model_id, []).append((version, position))
+        for entries in self._chains.values():
+            entries.sort()
+
+    def _chain(self, model_id, position: int) -> List[int]:
+        """Posiciones desde la versión en `position` hasta la primera fila completa posterior."""
+        entries = self._chains.get(model_id, [])
+        start = next(i for i, (_, p) in enumerate(entries) if p == position)
+        chain = []
+        for _, p in entries[start:]:
+            chain.append(p)
+            if not self._delta[p]:
+                break
+        return chain
+
+    def take(self, positions: np.ndarray) -> pa.Table:
+        """Filas en `positions`, completas y sin `_changed`."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) and positions[-1] - positions[0] == len(positions) - 1:
+            # Tramo contiguo (recorrido en orden de almacenamiento): sin copia
+            batch = self.table.slice(int(positions[0]), len(positions))
+        else:
+            batch = self.table.take(pa.array(positions))
+        if self._delta is not None:
+            local = np.flatnonzero(self._delta[positions])
+            if len(local):
+                batch = self._resolve(batch, positions, local)
+        if CHANGED_COLUMN in batch.column_names:
+            batch = batch.drop_columns([CHANGED_COLUMN])
+        return batch
+
+    def _resolve(self, batch: pa.Table, positions: np.ndarray, local: np.ndarray) -> pa.Table:
+        ids = batch.column('id').take(pa.array(local)).to_pylist()
+        chains = [self._chain(model_id, int(positions[i])) for model_id, i in zip(ids, local)]
+        needed = sorted({p for chain in chains for p in chain})
+        rows = dict(zip(needed, self.table.take(pa.array(needed, type=pa.int64())).to_pylist()))
+        rebuilt = []
+        for chain in chains:
+            if self._delta[chain[-1]]:
+                # Sin fila completa posterior (datos inconsistentes): queda como está
+                rebuilt.append(rows[chain[0]])
+            else:
+                rebuilt.append(reconstruct([rows[p] for p in chain[:-1]], rows[chain[-1]]))
+        encoded = conform_table(pa.Table.from_pylist(rebuilt))
+        merged = pa.concat_tables([batch, encoded], promote_options='permissive')
+        order = np.arange(batch.num_rows)
+        order[local] = batch.num_rows + np.arange(len(local))
+        return merged.take(pa.array(order))
@@ -1,16 +1,79 @@
+"""
+Exports del registro: master_all (todas las versiones) y master_latest (la última de cada id).
+
+`rebuild_master` normaliza y aplana el registro por lotes y escribe cada export
+en CSV, Parquet y Arrow IPC; en modo incremental agrega las filas nuevas como
+partes. `open_export` y `read_export` los leen, y `InsightsAggregate` calcula
+los insights del dashboard.
+"""
 
 from pathlib import Path
 import os
+import hashlib
 import json
+import multiprocessing
+import shutil
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
 import pandas as pd
-from ..utils.json_flatten import flatten
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from ..utils.json_flatten import LIST_MODES, flatten, flatten_column, flatten_records
+from ..utils.file_lock import FileLock
+from ..utils.metrics import stage, timed
+from .content_hash import HASH_COLUMN
+from .history import HistoryResolver
+from .registry_schema import conform_table
+from .segment_store import SegmentStore
+from .storage_engine import registry_source
 
 METRIC_KEYS_CANON = ['accuracy','precision','recall','f1','roc_auc','rmse','mae','mape','bleu','rouge','perplexity']
 
 DATA_DIR = Path(os.getenv('DATA_DIR', Path(__file__).resolve().parents[3] / 'data'))
 MODELS_FILE = DATA_DIR / 'models.parquet'
 EXPORT_DIR = DATA_DIR / 'exports'
-EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+# Regla para expandir listas (custom_properties) en el payload aplanado: keep|json|index|named
+LIST_MODE = os.getenv('MASTER_LIST_MODE', 'keep')
+if LIST_MODE not in LIST_MODES:
+    raise ValueError(f'MASTER_LIST_MODE inválido: {LIST_MODE}')
+# Campos básicos de la master: (columna destino, columnas origen en orden de preferencia)
+BASE_FIELDS = [
+    ('id', ('id',)),
+    ('version', ('version',)),
+    ('name', ('name',)),
+    ('algorithm', ('algorithm',)),
+    ('model_type', ('modelType', 'model_type')),
+    ('programming_language', ('scoreCodeType', 'programming_language')),
+    ('created_at', ('creationTimeStamp',)),
+    ('updated_at', ('modifiedTimeStamp',)),
+]
+# Marca de agua: última generación del registro incluida en los exports
+STATE_FILE = 'master_state.json'
+# Serializa las regeneraciones entre hilos y entre workers
+REBUILD_LOCK_FILE = '.rebuild.lock'
+# Filas por lote al generar los exports: acota la memoria del rebuild y es el tamaño de row group del Parquet
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '50000'))
+# Reconstrucción completa en paralelo: procesos del pool y cantidad mínima de versiones para usarlo
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', str(os.cpu_count() or 1)))
+EXPORT_PARALLEL_MIN_ROWS = int(os.getenv('EXPORT_PARALLEL_MIN_ROWS', '200000'))
+# Partes que deja el rebuild incremental antes de que el siguiente sea completo (y las una a la base)
+EXPORT_MAX_PARTS = int(os.getenv('EXPORT_MAX_PARTS', '32'))
+EXPORT_NAMES = ('master_all', 'master_latest')
+EXPORT_FORMATS = ('csv', 'parquet', 'arrow')
+# Compresiones para descarga -> extensión; las variantes se guardan en exports/.cache
+EXPORT_COMPRESSIONS = {'gzip': 'gz', 'zstd': 'zst'}
+CACHE_DIR = '.cache'
+PARTS_SUFFIX = '.parts'
+PART_PREFIX = 'part-'
+# Columnas internas del registro que no forman parte del payload exportado (tampoco salen en la API)
+INTERNAL_COLUMNS = (HASH_COLUMN,)
+_ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
 
 
 def _normalize_row(row: dict, include_payload: bool = True):
@@ -36,107 +99,756 @@ def _normalize_row(row: dict, include_payload: bool = True):
 
     # Flatten raw payload
     if include_payload and isinstance(payload, dict):
-        flat = {f'payload.{k}': v for k, v in flatten(payload).items()}
+        payload = {k: v for k, v in payload.items() if k not in INTERNAL_COLUMNS}
+        flat = {f'payload.{k}': v for k, v in flatten(payload, list_mode=LIST_MODE).items()}
         base.update(flat)
 
     return base
 
 
-def rebuild_master():
-    """Lee data/models.parquet y genera exports/master_all(.csv|.parquet) y master_latest."""
-    if not MODELS_FILE.exists():
-        # crear archivos vacíos
-        (EXPORT_DIR / 'master_all.csv').write_text('')
-        (EXPORT_DIR / 'master_latest.csv').write_text('')
-        return
+def _has_legacy_payload(df: pd.DataFrame) -> pd.Series:
+    """Filas legacy cuyo payload está en raw_payload/raw_payload_json y no en las columnas."""
+    mask = pd.Series(False, index=df.index)
+    for col in ('raw_payload', 'raw_payload_json'):
+        if col in df.columns:
+            mask |= df[col].map(lambda v: isinstance(v, (str, dict)) and len(v) > 0)
+    return mask
+
+
+def _normalize_frame(df: pd.DataFrame, include_payload: bool = True) -> pd.DataFrame:
+    """Equivalente por columnas de `_normalize_row` para filas cuyo payload es la fila misma."""
+    columns = {}
+    for target, sources in BASE_FIELDS:
+        if len(sources) == 1:
+            columns[target] = df[sources[0]] if sources[0] in df.columns else None
+        else:
+            columns[target] = _first_present(df, *sources)
+    columns['is_latest'] = True
+
+    if 'metrics' in df.columns:
+        metrics = [m if isinstance(m, dict) else {} for m in df['metrics'].tolist()]
+        for key in dict.fromkeys(k for m in metrics for k in m):
+            columns[f'metric.{key}'] = [m.get(key) for m in metrics]
+
+    if include_payload:
+        for col in df.columns:
+            if col in INTERNAL_COLUMNS:
+                continue
+            values = df[col]
+            if values.dtype != object or not any(isinstance(v, dict) for v in values):
+                if LIST_MODE == 'keep' or values.dtype != object:
+                    columns[f'payload.{col}'] = values
+                else:
+                    columns.update(flatten_records([{col: v} for v in values], 'payload', list_mode=LIST_MODE))
+                continue
+            # Columna con dicts anidados: se aplana completa de una vez
+            records = values.tolist()
+            if any(not isinstance(v, dict) for v in records):
+                columns[f'payload.{col}'] = [None if isinstance(v, dict) else v for v in records]
+            columns.update(flatten_column(records, f'payload.{col}', list_mode=LIST_MODE))
+    return pd.DataFrame(columns, index=df.index)
 
-    df = pd.read_parquet(MODELS_FILE)
+
+def _normalize_df(df: pd.DataFrame, include_payload: bool = True) -> pd.DataFrame:
     if df.empty:
-        (EXPORT_DIR / 'master_all.csv').write_text('')
-        (EXPORT_DIR / 'master_latest.csv').write_text('')
-        return
-
-    # master_all
-    all_rows = [ _normalize_row(r) for r in df.to_dict(orient='records') ]
-    df_all = pd.DataFrame(all_rows)
-    df_all.to_csv(EXPORT_DIR / 'master_all.csv', index=False)
-    df_all.to_parquet(EXPORT_DIR / 'master_all.parquet', index=False)
-
-    # master_latest: agrupar por id y tomar la última versión
-    if 'id' in df.columns and 'version' in df.columns:
-        latest_df = df.sort_values('version').groupby('id', as_index=False).last()
+        return pd.DataFrame()
+    legacy = _has_legacy_payload(df)
+    if not legacy.any():
+        return _normalize_frame(df, include_payload).reset_index(drop=True)
+    # Filas legacy: normalización fila por fila
+    parts = []
+    if not legacy.all():
+        parts.append(_normalize_frame(df[~legacy], include_payload))
+    rows = df[legacy]
+    parts.append(pd.DataFrame([_normalize_row(r, include_payload) for r in rows.to_dict(orient='records')],
+                              index=rows.index))
+    return pd.concat(parts).sort_index(kind='stable').reset_index(drop=True)
+
+
+def _latest_versions(df: pd.DataFrame) -> pd.DataFrame:
+    """Fila completa de la versión más alta de cada id."""
+    if 'id' not in df.columns or 'version' not in df.columns:
+        return df
+    return df.sort_values('version', kind='stable').drop_duplicates('id', keep='last')
+
+
+def _read_state(export_dir: Path) -> dict:
+    state_file = export_dir / STATE_FILE
+    if not state_file.exists():
+        return {}
+    try:
+        return json.loads(state_file.read_text())
+    except ValueError:
+        return {}
+
+
+def _write_state(export_dir: Path, state: dict):
+    tmp = export_dir / f'.{STATE_FILE}.tmp'
+    tmp.write_text(json.dumps(state))
+    os.replace(tmp, export_dir / STATE_FILE)
+
+
+def _write_empty(export_dir: Path):
+    for name in EXPORT_NAMES:
+        shutil.rmtree(_parts_dir(export_dir, name), ignore_errors=True)
+    (export_dir / 'master_all.csv').write_text('')
+    (export_dir / 'master_latest.csv').write_text('')
+
+
+def _parts_dir(export_dir: Path, name: str) -> Path:
+    return export_dir / f'{name}{PARTS_SUFFIX}'
+
+
+def _export_files(export_dir: Path, name: str) -> List[Path]:
+    """Parquet base del export y sus partes incrementales, en orden de escritura."""
+    parts = sorted(_parts_dir(export_dir, name).glob(f'{PART_PREFIX}*.parquet'))
+    return [export_dir / f'{name}.parquet', *parts]
+
+
+def _column_group(name: str) -> int:
+    # Mismo orden que `_normalize_frame`: campos básicos, métricas y payload
+    return 1 if name.startswith('metric.') else 2 if name.startswith('payload.') else 0
+
+
+def _widen(schema: pa.Schema, table: pa.Table) -> pa.Schema:
+    """`schema` con el tipo de `table` en las columnas que hasta ahora eran solo nulos."""
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type) and field.name in table.column_names:
+            column = table.column(field.name)
+            if column.null_count < len(column):
+                value_type = column.type.value_type if pa.types.is_dictionary(column.type) else column.type
+                schema = schema.set(i, pa.field(field.name, value_type))
+    return schema
+
+
+def _conform(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Lleva un lote al esquema unificado del export (columnas faltantes como nulos)."""
+    columns = []
+    for field in schema:
+        if field.name not in table.column_names:
+            columns.append(pa.nulls(table.num_rows, field.type))
+            continue
+        column = table.column(field.name)
+        if column.type != field.type:
+            if pa.types.is_null(field.type) and column.null_count < len(column):
+                raise pa.ArrowInvalid(f'La columna {field.name} solo admite nulos')
+            if column.null_count == len(column):
+                column = pa.nulls(len(column), field.type)
+            else:
+                try:
+                    column = column.cast(field.type)
+                except _ARROW_ERRORS:
+                    if field.type != pa.string():
+                        raise
+                    # Tipos que no se pueden unificar entre lotes: se exportan como texto
+                    column = pa.array([None if v is None else str(v) for v in column.to_pylist()], pa.string())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _value_types(table: pa.Table) -> Dict[str, Optional[pa.DataType]]:
+    """Tipo de cada columna del lote (None si solo tiene nulos)."""
+    types = {}
+    for field, column in zip(table.schema, table.columns):
+        value_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+        types[field.name] = value_type if column.null_count < len(column) else None
+    return types
+
+
+class _Spill:
+    """Lotes ya normalizados en Parquet temporales, hasta conocer el esquema de todo el export."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.parts: List[Path] = []
+        # columna -> tipos vistos en lotes donde tiene algún valor (en orden de aparición)
+        self.types: Dict[str, List[pa.DataType]] = {}
+
+    def next_path(self) -> Path:
+        return self.directory / f'part-{len(self.parts):06d}.parquet'
+
+    def add(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        path = self.next_path()
+        pq.write_table(table, path)
+        self.register(path, _value_types(table))
+
+    def register(self, path: Path, types: Dict[str, Optional[pa.DataType]]):
+        """Agrega una parte ya escrita (p. ej. por un proceso del pool) con los tipos de sus columnas."""
+        for name, value_type in types.items():
+            seen = self.types.setdefault(name, [])
+            if value_type is not None and value_type not in seen:
+                seen.append(value_type)
+        self.parts.append(path)
+
+    def schema(self) -> pa.Schema:
+        fields = []
+        for name, types in self.types.items():
+            try:
+                unified = pa.unify_schemas([pa.schema([(name, t)]) for t in types],
+                                           promote_options='permissive').field(name).type if types else pa.null()
+            except _ARROW_ERRORS:
+                unified = pa.string()
+            fields.append(pa.field(name, unified))
+        return pa.schema(sorted(fields, key=lambda f: _column_group(f.name)))
+
+    def tables(self, schema: pa.Schema) -> Iterator[pa.Table]:
+        for path in self.parts:
+            yield _conform(pq.read_table(path), schema)
+
+
+class _ExportWriter:
+    """Escribe un export lote a lote en CSV, Parquet (un row group por lote) y Arrow IPC.
+
+    Todo se escribe en temporales que reemplazan a los archivos publicados solo
+    si no hubo errores; al publicar se borran las partes incrementales del export.
+    """
+
+    def __init__(self, export_dir: Path, name: str, schema: pa.Schema, formats: Tuple[str, ...] = EXPORT_FORMATS):
+        self.schema = schema
+        self._parts = _parts_dir(export_dir, name)
+        self._paths = {fmt: export_dir / f'{name}.{fmt}' for fmt in formats}
+        self._tmp = {fmt: p.with_name(f'.{p.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+                     for fmt, p in self._paths.items()}
+        self._parquet = pq.ParquetWriter(self._tmp['parquet'], schema) if 'parquet' in formats else None
+        self._arrow = pa.ipc.new_file(str(self._tmp['arrow']), schema) if 'arrow' in formats else None
+        self._csv = open(self._tmp['csv'], 'w', newline='', encoding='utf-8') if 'csv' in formats else None
+        self._header = True
+
+    def write(self, table: pa.Table, csv_text: Optional[str] = None):
+        """Agrega un lote; `csv_text` es el mismo lote ya convertido a CSV (sin encabezado), si se tiene."""
+        if not table.num_rows:
+            return
+        if self._parquet is not None:
+            self._parquet.write_table(table, row_group_size=EXPORT_BATCH_ROWS)
+        if self._arrow is not None:
+            self._arrow.write_table(table, max_chunksize=EXPORT_BATCH_ROWS)
+        if self._csv is not None:
+            if csv_text is None:
+                table.to_pandas().to_csv(self._csv, header=self._header, index=False)
+            else:
+                if self._header:
+                    pd.DataFrame(columns=self.schema.names).to_csv(self._csv, index=False)
+                self._csv.write(csv_text)
+            self._header = False
+
+    def close(self, publish: bool = True):
+        if self._csv is not None:
+            if self._header and publish:
+                pd.DataFrame(columns=self.schema.names).to_csv(self._csv, index=False)
+            self._csv.close()
+        for writer in (self._parquet, self._arrow):
+            if writer is not None:
+                writer.close()
+        if publish:
+            # Sin las partes, un lector ve la base anterior completa hasta que se publica la nueva
+            shutil.rmtree(self._parts, ignore_errors=True)
+        for fmt, tmp in self._tmp.items():
+            if publish:
+                os.replace(tmp, self._paths[fmt])
+            else:
+                tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> '_ExportWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(publish=exc_type is None)
+
+
+def _registry_batches(resolver: HistoryResolver, positions: np.ndarray) -> Iterator[pa.Table]:
+    """Filas del registro en `positions`, por lotes de EXPORT_BATCH_ROWS y con los deltas reconstruidos."""
+    for start in range(0, len(positions), EXPORT_BATCH_ROWS):
+        yield resolver.take(positions[start:start + EXPORT_BATCH_ROWS])
+
+
+def _frames(batches: Iterable[pa.Table]) -> Iterator[pd.DataFrame]:
+    for batch in batches:
+        yield batch.to_pandas()
+
+
+def _latest_positions(table: pa.Table) -> np.ndarray:
+    """Posición de la versión más alta de cada id, en el mismo orden que `_latest_versions`."""
+    if 'id' not in table.column_names or 'version' not in table.column_names:
+        return np.arange(table.num_rows)
+    keys = pd.DataFrame({'id': table.column('id').to_pandas(), 'version': table.column('version').to_pandas()})
+    return keys.sort_values('version', kind='stable').drop_duplicates('id', keep='last').index.to_numpy()
+
+
+def _write_export(export_dir: Path, name: str, frames: Iterable[pd.DataFrame]) -> List[str]:
+    """Normaliza `frames` y escribe `name` en todos los formatos; devuelve las columnas.
+
+    Cada lote se normaliza y se guarda en un temporal; recién con todos vistos se
+    conoce el esquema final, y una segunda pasada escribe los exports.
+    """
+    with tempfile.TemporaryDirectory(prefix=f'.{name}-', dir=export_dir) as tmp:
+        spill = _Spill(Path(tmp))
+        for df in frames:
+            spill.add(_normalize_df(df))
+        schema = spill.schema()
+        with _ExportWriter(export_dir, name, schema) as writer:
+            for table in spill.tables(schema):
+                writer.write(table)
+    return schema.names
+
+
+def _read_ipc(path: Path) -> pa.Table:
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _write_ipc(path: Path, table: pa.Table):
+    with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _normalize_part(source: str, target: str) -> Optional[Dict[str, Optional[pa.DataType]]]:
+    """En un proceso del pool: normaliza y aplana un lote del registro (IPC) y lo guarda como parte del spill."""
+    df = _normalize_df(_read_ipc(Path(source)).to_pandas())
+    os.unlink(source)
+    if df.empty:
+        return None
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, target)
+    return _value_types(table)
+
+
+def _render_part(source: str, schema: pa.Schema, target: str) -> str:
+    """En un proceso del pool: lleva una parte al esquema final (IPC) y devuelve su CSV sin encabezado."""
+    table = _conform(pq.read_table(source), schema)
+    _write_ipc(Path(target), table)
+    return table.to_pandas().to_csv(header=False, index=False)
+
+
+def _write_export_parallel(export_dir: Path, name: str, batches: Iterable[pa.Table],
+                           pool: ProcessPoolExecutor, workers: int) -> List[str]:
+    """Como `_write_export`, con la normalización y la conversión de cada lote en procesos del pool.
+
+    El proceso principal solo arma los lotes (IPC en el temporal) y, mientras el
+    pool convierte los siguientes, escribe los ya listos en orden.
+    """
+    with tempfile.TemporaryDirectory(prefix=f'.{name}-', dir=export_dir) as tmp:
+        tmp = Path(tmp)
+        spill = _Spill(tmp)
+        # A lo sumo dos lotes por proceso esperando: el temporal no crece con el registro
+        pending: 'deque[Tuple[Path, Future]]' = deque()
+
+        def collect():
+            path, future = pending.popleft()
+            types = future.result()
+            if types is not None:
+                spill.register(path, types)
+
+        for i, batch in enumerate(batches):
+            source = tmp / f'batch-{i:06d}.arrow'
+            _write_ipc(source, batch)
+            path = tmp / f'normalized-{i:06d}.parquet'
+            pending.append((path, pool.submit(_normalize_part, str(source), str(path))))
+            if len(pending) >= 2 * workers:
+                collect()
+        while pending:
+            collect()
+
+        # Con todos los lotes vistos se conoce el esquema final (unión de columnas y tipos)
+        schema = spill.schema()
+        rendered = deque()
+        parts = iter(spill.parts)
+        with _ExportWriter(export_dir, name, schema) as writer:
+            while True:
+                while len(rendered) < 2 * workers:
+                    part = next(parts, None)
+                    if part is None:
+                        break
+                    target = part.with_suffix('.arrow')
+                    rendered.append((part, target, pool.submit(_render_part, str(part), schema, str(target))))
+                if not rendered:
+                    break
+                part, target, future = rendered.popleft()
+                csv_text = future.result()
+                writer.write(_read_ipc(target), csv_text)
+                part.unlink()
+                target.unlink()
+    return schema.names
+
+
+def _export_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn: el rebuild corre en un hilo del servidor y un fork copiaría locks tomados por otros hilos
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _full_rebuild(store, export_dir: Path, generation: int, workers: Optional[int] = None) -> dict:
+    # El registro se recorre por lotes: la memoria depende de EXPORT_BATCH_ROWS, no del largo del historial
+    if isinstance(store, SegmentStore):
+        table = store.scan_table(upto=generation)
+        rows = table.num_rows if table is not None else 0
+    else:
+        # SQLite no guarda deltas: los lotes salen de un cursor, sin cargar la base
+        rows = store.count_rows(upto=generation)
+    if rows == 0:
+        _write_empty(export_dir)
+        return {'generation': generation, 'columns': []}
+
+    if isinstance(store, SegmentStore):
+        # Las versiones guardadas como delta se reconstruyen completas
+        resolver = HistoryResolver(table)
+        archived = store.archived_table()
+        # master_all incluye las versiones del archivo frío (ver archive.py), antes que las del registro
+        sources = ([(HistoryResolver(archived), np.arange(archived.num_rows))] if archived is not None else []) + \
+            [(resolver, np.arange(table.num_rows))]
+        rows += archived.num_rows if archived is not None else 0
+        all_batches = chain.from_iterable(_registry_batches(r, p) for r, p in sources)
+        # master_latest: la última versión de cada id (nunca es un delta)
+        latest_batches = _registry_batches(resolver, _latest_positions(table))
     else:
-        latest_df = df
+        all_batches = store.scan_batches(generation, batch_rows=EXPORT_BATCH_ROWS)
+        latest_batches = store.scan_batches(generation, latest_only=True, batch_rows=EXPORT_BATCH_ROWS)
+
+    workers = EXPORT_WORKERS if workers is None else workers
+    if workers > 1 and rows >= EXPORT_PARALLEL_MIN_ROWS:
+        with _export_pool(workers) as pool, stage('export_parallel'):
+            columns = _write_export_parallel(export_dir, 'master_all', all_batches, pool, workers)
+            _write_export_parallel(export_dir, 'master_latest', latest_batches, pool, workers)
+    else:
+        columns = _write_export(export_dir, 'master_all', _frames(all_batches))
+        _write_export(export_dir, 'master_latest', _frames(latest_batches))
+    return {'generation': max(generation, store.base_generation()), 'columns': columns}
+
+
+def _write_part(export_dir: Path, name: str, table: pa.Table, since: int):
+    """Agrega `table` como una parte del export; la nombra la generación desde la que empieza (un reintento la reemplaza)."""
+    parts = _parts_dir(export_dir, name)
+    parts.mkdir(exist_ok=True)
+    path = parts / f'{PART_PREFIX}{since:012d}.parquet'
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    pq.write_table(table, tmp, row_group_size=EXPORT_BATCH_ROWS)
+    os.replace(tmp, path)
+
+
+def _incremental_rebuild(delta: pd.DataFrame, export_dir: Path, since: int, generation: int) -> Optional[dict]:
+    """Normaliza solo las filas nuevas y las agrega como una parte más de master_all y de master_latest.
+
+    Los archivos ya escritos no se tocan: los lectores abren la base y sus partes
+    como un dataset (ver `read_export`). Devuelve None si las filas nuevas no
+    encajan en el esquema exportado o si ya hay EXPORT_MAX_PARTS partes; en los
+    dos casos sigue un rebuild completo, que vuelve a dejar solo la base.
+    """
+    all_files, latest_files = _export_files(export_dir, 'master_all'), _export_files(export_dir, 'master_latest')
+    if len(all_files) > EXPORT_MAX_PARTS or len(latest_files) > EXPORT_MAX_PARTS:
+        return None
+    table = conform_table(pa.Table.from_pandas(delta, preserve_index=False))
+    new_all = _normalize_df(HistoryResolver(table).take(np.arange(table.num_rows)).to_pandas())
+    # Cada parte se escribe con el esquema de la anterior (ampliado): la última tiene el del dataset
+    all_schema = pq.read_schema(all_files[-1]).remove_metadata()
+    latest_schema = pq.read_schema(latest_files[-1]).remove_metadata()
+    if not set(new_all.columns) <= set(all_schema.names) or 'id' not in latest_schema.names:
+        return None
+    new_all_table = pa.Table.from_pandas(new_all, preserve_index=False)
+    new_latest_table = pa.Table.from_pandas(_latest_versions(new_all), preserve_index=False)
+    all_schema, latest_schema = _widen(all_schema, new_all_table), _widen(latest_schema, new_latest_table)
+    try:
+        new_all_table = _conform(new_all_table, all_schema)
+        new_latest_table = _conform(new_latest_table, latest_schema)
+    except _ARROW_ERRORS:
+        return None
+
+    # En master_latest la parte tiene solo los ids tocados: al leer gana la versión más alta de cada id
+    _write_part(export_dir, 'master_all', new_all_table, since)
+    _write_part(export_dir, 'master_latest', new_latest_table, since)
+    return {'generation': generation, 'columns': all_schema.names}
+
+
+def _open_files(export_dir: Path, name: str) -> List[pq.ParquetFile]:
+    """Abre la base y las partes de un export. Ya abiertos, un rebuild que las reemplace no las afecta."""
+    for _ in range(3):
+        files = []
+        try:
+            for path in _export_files(export_dir, name):
+                files.append(pq.ParquetFile(path))
+            return files
+        except FileNotFoundError:
+            # Un rebuild completo borró las partes que se estaban abriendo: se vuelve a listar
+            for file in files:
+                file.close()
+    raise FileNotFoundError(f'Export no disponible: {name}')
+
+
+def _dataset_batches(files: List[pq.ParquetFile], name: str,
+                     columns: Optional[List[str]] = None) -> Tuple[pa.Schema, Iterator[pa.Table]]:
+    """Esquema y lotes de un export abierto con `_open_files` (en master_latest, una fila por id)."""
+    schema = files[-1].schema_arrow.remove_metadata()
+    if columns is not None:
+        schema = pa.schema([schema.field(c) for c in columns if c in schema.names])
+    keep = None
+    if name == 'master_latest' and len(files) > 1:
+        key_schema = pa.schema([files[-1].schema_arrow.field(c) for c in ('id', 'version')])
+        keys = pa.concat_tables([_conform(f.read(columns=key_schema.names), key_schema) for f in files])
+        keep = np.zeros(keys.num_rows, dtype=bool)
+        keep[_latest_positions(keys)] = True
+
+    def batches() -> Iterator[pa.Table]:
+        offset = 0
+        for file in files:
+            for batch in file.iter_batches(batch_size=EXPORT_BATCH_ROWS, columns=schema.names):
+                table = pa.Table.from_batches([batch])
+                if keep is not None:
+                    table = table.filter(pa.array(keep[offset:offset + table.num_rows]))
+                    offset += batch.num_rows
+                yield _conform(table, schema)
+
+    return schema, batches()
+
 
-    latest_rows = [ _normalize_row(r) for r in latest_df.to_dict(orient='records') ]
-    df_latest = pd.DataFrame(latest_rows)
-    df_latest.to_csv(EXPORT_DIR / 'master_latest.csv', index=False)
-    df_latest.to_parquet(EXPORT_DIR / 'master_latest.parquet', index=False)
+def read_export(name: str, data_dir: Path = None, columns: Optional[List[str]] = None) -> pa.Table:
+    """Export `name` completo (base y partes) como una tabla Arrow. Lanza FileNotFoundError si no existe."""
+    if name not in EXPORT_NAMES:
+        raise ValueError(f'Export desconocido: {name}')
+    files = _open_files((Path(data_dir) if data_dir else DATA_DIR) / 'exports', name)
+    try:
+        schema, batches = _dataset_batches(files, name, columns)
+        return pa.Table.from_batches([b for t in batches for b in t.to_batches()], schema=schema)
+    finally:
+        for file in files:
+            file.close()
 
 
+@timed('export_rebuild')
+def rebuild_master(data_dir: Path = None, incremental: bool = True, workers: Optional[int] = None):
+    """Lee el registro (models.parquet + segmentos, o la base SQLite) y genera exports/master_all(.csv|.parquet|.arrow) y master_latest.
+
+    En modo incremental solo se normalizan las filas escritas después de la
+    generación registrada en `exports/master_state.json`, que se agregan como
+    partes (`exports/<export>.parts/`) sin reescribir lo ya exportado; si esas
+    filas ya no se pueden identificar (compactación, modo rewrite) se hace una
+    reconstrucción completa.
+    La reconstrucción completa reparte los lotes en `workers` procesos
+    (`EXPORT_WORKERS`) desde `EXPORT_PARALLEL_MIN_ROWS` versiones.
+    """
+    data_dir = Path(data_dir) if data_dir else DATA_DIR
+    export_dir = data_dir / 'exports'
+    export_dir.mkdir(parents=True, exist_ok=True)
+    with FileLock.for_path(export_dir / REBUILD_LOCK_FILE).acquire():
+        store = registry_source(data_dir)
+        if not store.exists():
+            # crear archivos vacíos
+            _write_empty(export_dir)
+            return
+
+        generation = store.generation
+        state = _read_state(export_dir)
+        exported = all((export_dir / f'{name}.{fmt}').exists() for name in EXPORT_NAMES for fmt in EXPORT_FORMATS)
+        delta = since = None
+        if incremental and exported and 'generation' in state:
+            since = state['generation']
+            delta = store.read_since(since, upto=generation)
+
+        if delta is not None and delta.empty:
+            return
+        if delta is not None:
+            state = _incremental_rebuild(delta, export_dir, since, generation)
+        if delta is None or state is None:
+            state = _full_rebuild(store, export_dir, generation, workers)
+        _write_state(export_dir, state)
+
+
+def _open_merged(export_dir: Path, name: str, fmt: str) -> Optional[BinaryIO]:
+    """El export en `fmt` con sus partes incluidas (generado en la caché); None si no tiene partes."""
+    paths = _export_files(export_dir, name)
+    if len(paths) == 1:
+        return None
+    try:
+        stats = [os.stat(p) for p in paths]
+    except FileNotFoundError:
+        # Un rebuild completo las está reemplazando
+        return None
+    key = hashlib.blake2b(repr([(st.st_ino, st.st_mtime_ns, st.st_size) for st in stats]).encode(),
+                          digest_size=8).hexdigest()
+    cache_dir = export_dir / CACHE_DIR
+    target = cache_dir / f'{name}.{key}.{fmt}'
+    try:
+        return open(target, 'rb')
+    except FileNotFoundError:
+        pass
+    cache_dir.mkdir(exist_ok=True)
+    files = _open_files(export_dir, name)
+    try:
+        schema, batches = _dataset_batches(files, name)
+        with stage('export_merge'), _ExportWriter(cache_dir, f'{name}.{key}', schema, formats=(fmt,)) as writer:
+            for table in batches:
+                writer.write(table)
+    finally:
+        for file in files:
+            file.close()
+    merged = open(target, 'rb')
+    for stale in cache_dir.glob(f'{name}.*.{fmt}'):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return merged
+
+
+def open_export(name: str, fmt: str, compression: Optional[str] = None,
+                data_dir: Path = None) -> Tuple[BinaryIO, str]:
+    """Abre el export `name`.`fmt` para descargarlo (comprimido con gzip/zstd si se pide).
+
+    Devuelve el archivo abierto y una marca que identifica su contenido (para
+    ETag). Si el export tiene partes incrementales, el archivo que se descarga
+    es la unión de base y partes. Esa unión y las variantes comprimidas se
+    generan la primera vez que se piden y quedan en `exports/.cache/` hasta el
+    siguiente rebuild. Como los
+    exports se reemplazan con `os.replace`, el archivo abierto no cambia aunque
+    haya un rebuild en curso. Lanza FileNotFoundError si el export no existe.
+    """
+    if name not in EXPORT_NAMES or fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Export desconocido: {name}.{fmt}')
+    if compression is not None and compression not in EXPORT_COMPRESSIONS:
+        raise ValueError(f'Compresión no soportada: {compression}')
+    export_dir = (Path(data_dir) if data_dir else DATA_DIR) / 'exports'
+    source = _open_merged(export_dir, name, fmt) or open(export_dir / f'{name}.{fmt}', 'rb')
+    st = os.fstat(source.fileno())
+    tag = f'{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}'
+    if compression is None:
+        return source, tag
+    with source:
+        suffix = EXPORT_COMPRESSIONS[compression]
+        cache_dir = export_dir / CACHE_DIR
+        target = cache_dir / f'{name}.{fmt}.{tag}.{suffix}'
+        try:
+            return open(target, 'rb'), f'{tag}-{suffix}'
+        except FileNotFoundError:
+            pass
+        cache_dir.mkdir(exist_ok=True)
+        tmp = target.with_name(f'.{target.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with stage('export_compression'):
+            with pa.CompressedOutputStream(str(tmp), compression) as out:
+                shutil.copyfileobj(source, out, 1 << 20)
+        # Se abre antes de publicarlo: otro request que limpie la caché no lo afecta
+        compressed = open(tmp, 'rb')
+        os.replace(tmp, target)
+    for stale in cache_dir.glob(f'{name}.{fmt}.*.{suffix}'):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return compressed, f'{tag}-{suffix}'
+
+
+def _missing(values: pd.Series) -> pd.Series:
+    return values.isna() | values.eq('')
+
+
+def _first_present(df: pd.DataFrame, *columns: str) -> pd.Series:
+    """Primer valor no vacío entre `columns` (equivalente vectorizado de `a or b`)."""
+    result = pd.Series(None, index=df.index, dtype=object)
+    for col in columns:
+        if col not in df.columns:
+            continue
+        values = df[col].astype(object)
+        result = result.where(~_missing(result), values)
+    return result.where(~_missing(result), None)
+
+
+def _insight_columns(df: pd.DataFrame) -> dict:
+    """Columnas derivadas que alimentan los insights, calculadas en bloque."""
+    metrics = {}
+    for k in METRIC_KEYS_CANON:
+        col = f'metric.{k}'
+        if col in df.columns:
+            metrics[k] = pd.to_numeric(df[col], errors='coerce')
+    model_type = _first_present(df, 'model_type', 'payload.modelType')
+    algorithm = _first_present(df, 'algorithm', 'payload.algorithm')
+    language = _first_present(df, 'programming_language', 'payload.scoreCodeType')
+    name = _first_present(df, 'name', 'payload.name')
+    missing = sum(_missing(col).astype(int) for col in (name, algorithm, model_type, language))
+    return {'model_type': model_type, 'algorithm': algorithm, 'language': language,
+            'metrics': metrics, 'missing': missing}
+
+
+class InsightsAggregate:
+    """Conteos y sumas de métricas de las últimas versiones, mantenidos de forma incremental.
+
+    `snapshot()` devuelve lo mismo que `compute_insights` sin recorrer el registro.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.por_tipo = Counter()
+        self.algorithms = Counter()
+        self.languages = Counter()
+        self.metric_sum = {k: 0.0 for k in METRIC_KEYS_CANON}
+        self.metric_count = {k: 0 for k in METRIC_KEYS_CANON}
+        self.missing_sum = 0
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'InsightsAggregate':
+        """Construye el agregado a partir de filas normalizadas (formato master_latest)."""
+        agg = cls()
+        if df.empty:
+            return agg
+        cols = _insight_columns(df)
+        agg.total = len(df)
+        agg.por_tipo.update(cols['model_type'].value_counts().to_dict())
+        agg.algorithms.update(cols['algorithm'].value_counts().to_dict())
+        agg.languages.update(cols['language'].value_counts().to_dict())
+        for k, values in cols['metrics'].items():
+            agg.metric_sum[k] = float(values.sum())
+            agg.metric_count[k] = int(values.count())
+        agg.missing_sum = int(cols['missing'].sum())
+        return agg
+
+    def _apply(self, row: dict, sign: int):
+        df = pd.DataFrame([_normalize_row(row, include_payload=False)])
+        cols = _insight_columns(df)
+        self.total += sign
+        for counter, key in ((self.por_tipo, 'model_type'), (self.algorithms, 'algorithm'), (self.languages, 'language')):
+            value = cols[key].iloc[0]
+            if value is not None:
+                counter[value] += sign
+                if counter[value] <= 0:
+                    del counter[value]
+        for k, values in cols['metrics'].items():
+            value = values.iloc[0]
+            if pd.notna(value):
+                self.metric_sum[k] += sign * float(value)
+                self.metric_count[k] += sign
+        self.missing_sum += sign * int(cols['missing'].iloc[0])
+
+    def add(self, row: dict):
+        """Suma una fila cruda del registro (última versión de un modelo)."""
+        self._apply(row, 1)
+
+    def remove(self, row: dict):
+        self._apply(row, -1)
+
+    def replace(self, old_row: Optional[dict], new_row: dict):
+        """Una versión nueva reemplaza a la anterior como última del modelo."""
+        if old_row is not None:
+            self.remove(old_row)
+        self.add(new_row)
+
+    def snapshot(self) -> dict:
+        algoritmo_mas_usado = self.algorithms.most_common(1)[0][0] if self.algorithms else None
+        top_lenguajes = self.languages.most_common(5)
+        promedio_metricas = {
+            k: self.metric_sum[k] / self.metric_count[k] for k in METRIC_KEYS_CANON if self.metric_count[k] > 0
+        }
+        return {
+            'total_modelos': self.total,
+            'por_tipo': dict(self.por_tipo),
+            'algoritmo_mas_usado': algoritmo_mas_usado,
+            'top_lenguajes': [{k: v} for k, v in top_lenguajes],
+            'metricas_disponibles': sorted(promedio_metricas),
+            'promedio_metricas': promedio_metricas,
+            'campos_faltantes_promedio': (self.missing_sum / self.total) if self.total else 0.0,
+        }
+
+
+@timed('insights')
 def compute_insights():
     """Calcula insights a partir de exports/master_latest.parquet (si existe) o del models.parquet."""
     latest_file = EXPORT_DIR / 'master_latest.parquet'
     if latest_file.exists():
-        df = pd.read_parquet(latest_file)
+        df = read_export('master_latest', DATA_DIR).to_pandas()
     elif MODELS_FILE.exists():
-        df_raw = pd.read_parquet(MODELS_FILE)
-        if 'id' in df_raw.columns and 'version' in df_raw.columns:
-            df = df_raw.sort_values('version').groupby('id', as_index=False).last()
-        else:
-            df = df_raw
+        df = _normalize_df(_latest_versions(SegmentStore(DATA_DIR).load()))
     else:
         return {}
-
-    total = len(df)
-    por_tipo = {}
-    algo_counts = {}
-    lang_counts = {}
-    metric_keys = set()
-    metric_values = {k: [] for k in METRIC_KEYS_CANON}
-    campos_faltantes = []
-
-    for _, r in df.iterrows():
-        # tipos y conteos
-        mt = r.get('model_type') or r.get('payload.modelType')
-        if mt:
-            por_tipo[mt] = por_tipo.get(mt, 0) + 1
-        alg = r.get('algorithm') or r.get('payload.algorithm')
-        if alg:
-            algo_counts[alg] = algo_counts.get(alg, 0) + 1
-        lang = r.get('programming_language') or r.get('payload.scoreCodeType')
-        if lang:
-            lang_counts[lang] = lang_counts.get(lang, 0) + 1
-
-        # métricas (busca columnas metric.<k>)
-        for k in METRIC_KEYS_CANON:
-            col = f'metric.{k}'
-            if col in r and pd.notna(r[col]):
-                try:
-                    v = float(r[col])
-                    metric_values[k].append(v)
-                    metric_keys.add(k)
-                except Exception:
-                    pass
-
-        # campos faltantes promedio: verificar core
-        core_fields = [r.get('name') or r.get('payload.name'), r.get('algorithm') or r.get('payload.algorithm'), mt, lang]
-        missing = sum(1 for x in core_fields if x in (None, '', []))
-        campos_faltantes.append(missing)
-
-    algoritmo_mas_usado = None
-    if algo_counts:
-        algoritmo_mas_usado = sorted(algo_counts.items(), key=lambda x: x[1], reverse=True)[0][0]
-    top_lenguajes = sorted(lang_counts.items(), key=lambda x: x[1], reverse=True)[:5]
-    promedio_metricas = {k: (sum(v)/len(v) if v else None) for k, v in metric_values.items()}
-    campos_faltantes_promedio = (sum(campos_faltantes)/len(campos_faltantes)) if campos_faltantes else 0.0
-
-    return {
-        'total_modelos': total,
-        'por_tipo': por_tipo,
-        'algoritmo_mas_usado': algoritmo_mas_usado,
-        'top_lenguajes': [{k: v} for k, v in top_lenguajes],
-        'metricas_disponibles': sorted(list(metric_keys)),
-        'promedio_metricas': {k: v for k, v in promedio_metricas.items() if v is not None},
-        'campos_faltantes_promedio': campos_faltantes_promedio,
-    }
+    return InsightsAggregate.from_frame(df).snapshot()
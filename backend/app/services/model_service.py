@@ -1,150 +1,438 @@
+import functools
+import logging
+import threading
+
 import pandas as pd
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pydantic_core import to_jsonable_python
 
 from ..models.model_schema import MLModel, CustomProperty
+from ..models.query_schema import ModelQuery
+from .content_hash import HASH_COLUMN, content_hash
+from .export_scheduler import ExportScheduler
+from .master import InsightsAggregate, _normalize_df
+from .query import predicate_mask
+from .row_json import dumps, json_record, json_records, serialization_mode
+from .search_index import SEARCH_COLUMNS, SearchIndex
+from .segment_store import SegmentStore
+from .storage_engine import EngineListener, clean_value, open_engine
+from ..utils.http_cache import ResponseCache
+from ..utils.metrics import stage, timed
+from ..utils.rw_lock import RWLock
 import os
 
-class ModelService:
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = ('algorithm', 'function', 'scoreCodeType', 'modelType', 'targetLevel', 'tool')
+
+
+class WriteResult(NamedTuple):
+    model: MLModel
+    # False si el envío era idéntico a la última versión y no se escribió nada
+    created: bool
+
+
+def _reads(method):
+    """Lectura concurrente con otras lecturas. Si otro worker escribió, sus cambios se aplican antes en exclusiva.
+
+    Es el único lugar donde una lectura aplica cambios: dentro del lock de lectura el estado no se modifica,
+    salvo las estructuras perezosas (insights, índice de búsqueda), que se arman una sola vez con `_lazy_lock`.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.engine.has_changes():
+            with self.rw_lock.write():
+                self.refresh()
+        with self.rw_lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _writes(method):
+    """Escritura: corre sola, sin lecturas en curso dentro del proceso."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.rw_lock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _sort_key(values: pd.Series) -> pd.Series:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(object)
+    return values
+
+
+class ModelService(EngineListener):
     def __init__(self):
         self.data_dir = Path(os.getenv('DATA_DIR', Path(__file__).resolve().parents[3] / 'data'))
-        self.models_file = self.data_dir / 'models.parquet'
         self.data_dir.mkdir(parents=True, exist_ok=True)
-        self.df = self._load_or_create_df()
-
-    def _load_or_create_df(self) -> pd.DataFrame:
-        if self.models_file.exists():
-            print(f"Cargando datos desde: {self.models_file}")
-            return pd.read_parquet(self.models_file)
-        print("No se encontró archivo de datos, creando uno nuevo")
-        return pd.DataFrame()
-
-    def _save_df(self):
-        print(f"Guardando datos en: {self.models_file}")
-        self.df.to_parquet(self.models_file, index=False)
+        # Persistencia según MODEL_STORAGE_ENGINE (ver storage_engine.py); avisa aquí los cambios de últimas versiones
+        self.engine = open_engine(self.data_dir)
+        self.engine.listener = self
+        # El índice guarda la generación del motor con que se construyó: un archivo por motor
+        self.search_file = self.data_dir / ('models.search.json' if self.engine.name == 'parquet'
+                                            else f'models.search.{self.engine.name}.json')
+        # Cada cuántas escrituras se vuelve a guardar el índice de búsqueda
+        self.search_save_every = int(os.getenv('SEARCH_INDEX_SAVE_EVERY', '200'))
+        self.exports = ExportScheduler(self.data_dir)
+        # Agregados del dashboard; se construyen en la primera consulta y luego se actualizan por escritura
+        self._insights: Optional[InsightsAggregate] = None
+        self._search: Optional[SearchIndex] = None
+        self._search_unsaved = 0
+        # Lecturas en paralelo, escrituras de a una (el estado en memoria no se ve a medio actualizar)
+        self.rw_lock = RWLock()
+        # Arma una sola vez las estructuras perezosas cuando varias lecturas las piden a la vez
+        self._lazy_lock = threading.Lock()
+        # Respuestas HTTP serializadas; cada entrada vale para una sola generación
+        self.response_cache = ResponseCache(int(os.getenv('RESPONSE_CACHE_ENTRIES', '256')))
+        # Respuestas armadas por columna desde las filas guardadas, sin MLModel por fila (ver row_json.py)
+        self.fast_serialization = serialization_mode() == 'fast'
+
+    @property
+    def store(self) -> SegmentStore:
+        """`SegmentStore` del motor Parquet (compactación, mantenimiento)."""
+        return self.engine.store
+
+    @classmethod
+    def _row_to_model(cls, row: dict) -> MLModel:
+        model_data = {k: clean_value(v) for k, v in row.items()}
+        props = model_data.get("custom_properties")
+        model_data["custom_properties"] = [
+            CustomProperty(**prop) for prop in (props if props is not None else [])
+        ]
+        return MLModel(**model_data)
+
+    def refresh(self) -> bool:
+        """Aplica las escrituras de otros procesos. Devuelve True si hubo cambios."""
+        changed = self.engine.refresh()
+        if changed and self._search is not None:
+            self._search.generation = self.engine.generation
+        return changed
+
+    @_reads
+    def data_generation(self) -> int:
+        """Generación de los datos visibles: crece con cada escritura (de este u otro worker)."""
+        return self.engine.generation
+
+    def modified_at(self) -> Optional[datetime]:
+        return self.engine.modified_at()
+
+    def on_reset(self):
+        self._insights = None
+        self._search = None
+
+    def on_latest_changed(self, row: dict, previous: Callable[[], Optional[dict]]):
+        """Actualiza las estructuras derivadas de las últimas versiones (si ya existen)."""
+        if self._search is not None:
+            self._search.update(row["id"], row)
+        if self._insights is not None:
+            self._insights.replace(previous(), row)
+
+    def _after_write(self, generation: int):
+        # Los exports se regeneran en segundo plano, fuera del request
+        self.exports.notify(generation)
+        if self._search is not None:
+            self._search.generation = generation
+            self._search_unsaved += 1
+            if self._search_unsaved >= self.search_save_every:
+                self._save_search_index()
+
+    def _save_search_index(self):
         try:
-            # Regenerar exports después de guardar
-            from .master import rebuild_master
-            print("Regenerando exports master...")
-            rebuild_master()
-        except Exception as e:
-            print(f"Warning: fallo al regenerar exports: {e}")
+            self._search.save(self.search_file)
+            self._search_unsaved = 0
+        except OSError as e:
+            logger.warning("No se pudo guardar el índice de búsqueda: %s", e)
+
+    def _search_index(self) -> SearchIndex:
+        if self._search is not None:
+            return self._search
+        with self._lazy_lock:
+            if self._search is None:
+                self._load_search_index()
+            return self._search
+
+    def _load_search_index(self):
+        generation = self.engine.generation
+        index = SearchIndex.load(self.search_file)
+        if index is not None and index.generation <= generation:
+            # Reaplicar solo los modelos modificados después de la generación guardada
+            changed = self.engine.changed_ids_since(index.generation)
+            if changed is None:
+                index = None
+            elif changed:
+                for row in self.engine.latest_rows(changed).to_dict(orient='records'):
+                    index.update(row['id'], row)
+        else:
+            index = None
+        if index is None:
+            index = SearchIndex.build(self.engine.latest_rows(fields=list(SEARCH_COLUMNS)).to_dict(orient='records'))
+        stale = index.generation != generation or not self.search_file.exists()
+        index.generation = generation
+        self._search = index
+        if stale:
+            self._save_search_index()
+
+    @staticmethod
+    def _model_to_row(model: MLModel) -> dict:
+        # Usar .dict() para compatibilidad con pydantic v1
+        if hasattr(model, 'dict'):
+            model_dict = model.dict()
+        else:
+            # pydantic v2 fallback
+            model_dict = model.model_dump()
+        if hasattr(model, 'custom_properties'):
+            model_dict["custom_properties"] = [
+                (prop.dict() if hasattr(prop, 'dict') else prop.model_dump()) if hasattr(prop, 'model_dump') or hasattr(prop, 'dict') else prop
+                for prop in model.custom_properties
+            ]
+        model_dict[HASH_COLUMN] = content_hash(model_dict)
+        return model_dict
+
+    def _unchanged(self, rows: List[dict]) -> List[bool]:
+        """Por fila: True si su contenido es idéntico a la última versión de su id."""
+        flags = []
+        seen: Dict[str, str] = {}
+        for row in rows:
+            model_id = row['id']
+            previous = seen.get(model_id)
+            if previous is None:
+                entry = self.engine.latest_entry(model_id)
+                previous = entry.content_hash if entry is not None else None
+            flags.append(row[HASH_COLUMN] == previous)
+            seen[model_id] = row[HASH_COLUMN]
+        return flags
+
+    def _latest_model(self, model_id: str) -> MLModel:
+        return self._row_to_model(self.engine.get(model_id))
+
+    @_writes
+    def register_models(self, models: List[MLModel]) -> List[WriteResult]:
+        """Registra un lote con una sola escritura.
+
+        Los modelos idénticos a su última versión (mismo hash de contenido) no
+        se escriben ni disparan el rebuild de exports; se devuelve la versión
+        guardada con `created=False`.
+        """
+        if not models:
+            return []
+        for model in models:
+            if not model.id:
+                model.id = str(uuid.uuid4())
+        rows = [self._model_to_row(model) for model in models]
+        self.refresh()
+        unchanged = self._unchanged(rows)
+        if not all(unchanged):
+            generation = None
+            with self.engine.write_lock():
+                # Se vuelve a comparar con lo que otros workers hayan escrito
+                unchanged = self._unchanged(rows)
+                changed = [row for row, same in zip(rows, unchanged) if not same]
+                if changed:
+                    generation = self.engine.append(changed)
+            if generation is not None:
+                self._after_write(generation)
+        return [WriteResult(self._latest_model(model.id), False) if same else WriteResult(model, True)
+                for model, same in zip(models, unchanged)]
+
+    @_writes
+    def revise_model(self, model_id: str, model: MLModel) -> Optional[WriteResult]:
+        """Nueva versión de `model_id`; si el contenido no cambió devuelve la actual sin escribir."""
+        digest = self._model_to_row(model)[HASH_COLUMN]
+        self.refresh()
+        entry = self.engine.latest_entry(model_id)
+        if entry is not None and entry.content_hash == digest:
+            return WriteResult(self._latest_model(model_id), False)
+        # La versión se calcula con el lock tomado para no repetirla entre workers
+        with self.engine.write_lock():
+            entry = self.engine.latest_entry(model_id)
+            if entry is None:
+                return None
+            if entry.content_hash == digest:
+                return WriteResult(self._latest_model(model_id), False)
+            # Incrementar versión y actualizar timestamps
+            model.version = entry.version + 1
+            model.modifiedTimeStamp = datetime.now(timezone.utc)
+            generation = self.engine.append([self._model_to_row(model)])
+        self._after_write(generation)
+        return WriteResult(model, True)
 
     def create_model(self, model: MLModel) -> MLModel:
         try:
-            print("Iniciando creación del modelo")
             if not model.id:
                 model.id = str(uuid.uuid4())
-                print(f"Generado nuevo ID: {model.id}")
-            
-            print("Convirtiendo modelo a diccionario")
-            # Usar .dict() para compatibilidad con pydantic v1
-            if hasattr(model, 'dict'):
-                model_dict = model.dict()
-            else:
-                # pydantic v2 fallback
-                model_dict = model.model_dump()
-            
-            print("Procesando propiedades personalizadas")
-            if hasattr(model, 'custom_properties'):
-                model_dict["custom_properties"] = [
-                    (prop.dict() if hasattr(prop, 'dict') else prop.model_dump()) if hasattr(prop, 'model_dump') or hasattr(prop, 'dict') else prop
-                    for prop in model.custom_properties
-                ]
-            
-            print("Creando DataFrame con los datos del modelo")
-            new_row = pd.DataFrame([model_dict])
-            print(f"Columnas en el nuevo DataFrame: {new_row.columns.tolist()}")
-            
-            if self.df.empty:
-                print("DataFrame vacío, iniciando nuevo DataFrame")
-                self.df = new_row
+                logger.debug("Generado nuevo ID: %s", model.id)
+            result = self.register_models([model])[0]
+            if result.created:
+                logger.debug("Modelo guardado con ID: %s", model.id)
             else:
-                print("Concatenando con DataFrame existente")
-                print(f"Columnas existentes: {self.df.columns.tolist()}")
-                self.df = pd.concat([self.df, new_row], ignore_index=True)
-            
-            print("Guardando cambios")
-            self._save_df()
-            print(f"Modelo guardado exitosamente con ID: {model.id}")
-            
-            return model
-        except Exception as e:
-            print(f"Error en create_model: {str(e)}")
+                logger.debug("Sin cambios respecto de la versión %s de %s: no se escribió nada",
+                             result.model.version, model.id)
+            return result.model
+        except Exception:
+            logger.exception("Error en create_model")
             raise
 
+    def create_models(self, models: List[MLModel]) -> List[MLModel]:
+        """Registra un lote de modelos con un único append, guardado y rebuild de exports."""
+        results = self.register_models(models)
+        logger.info("Lote guardado: %d de %d modelos con cambios", sum(r.created for r in results), len(results))
+        return [r.model for r in results]
+
     def update_model(self, model_id: str, model: MLModel) -> Optional[MLModel]:
-        if not self.df.empty and model_id in self.df["id"].values:
-            # Incrementar versión y actualizar timestamps
-            current_version = self.df[self.df["id"] == model_id]["version"].max()
-            model.version = current_version + 1
-            model.modifiedTimeStamp = datetime.now()
-            
-            if hasattr(model, 'dict'):
-                model_dict = model.dict()
-            else:
-                model_dict = model.model_dump()
-            model_dict["custom_properties"] = [prop.dict() if hasattr(prop, 'dict') else prop.model_dump() for prop in model.custom_properties]
-            
-            self.df = pd.concat([self.df, pd.DataFrame([model_dict])], ignore_index=True)
-            self._save_df()
-            return model
-        return None
+        result = self.revise_model(model_id, model)
+        return result.model if result is not None else None
 
+    @_reads
     def get_model(self, model_id: str, version: Optional[int] = None) -> Optional[MLModel]:
-        if self.df.empty or model_id not in self.df["id"].values:
+        # Sin versión (o versión 0) se devuelve la última
+        row = self.engine.get(model_id, version or None)
+        if row is None:
             return None
-        
-        model_df = self.df[self.df["id"] == model_id]
-        if version:
-            model_df = model_df[model_df["version"] == version]
-        else:
-            # Obtener la última versión
-            max_version = model_df["version"].max()
-            model_df = model_df[model_df["version"] == max_version]
-        
-        if model_df.empty:
+        return self._row_to_model(row)
+
+    @_reads
+    def get_model_json(self, model_id: str, version: Optional[int] = None) -> Optional[bytes]:
+        """Como `get_model`, pero ya serializado a JSON."""
+        row = self.engine.get(model_id, version or None)
+        if row is None:
             return None
-            
-        model_data = model_df.iloc[0].to_dict()
-        model_data["custom_properties"] = [
-            CustomProperty(**prop) for prop in model_data["custom_properties"]
-        ]
-        return MLModel(**model_data)
+        with stage('serialization'):
+            return dumps(json_record(row))
+
+    @_reads
+    def diff_versions(self, model_id: str, from_version: Optional[int] = None,
+                      to_version: Optional[int] = None) -> Optional[dict]:
+        """Campos que difieren entre dos versiones (por defecto, la última contra la anterior)."""
+        return self.engine.diff(model_id, from_version, to_version)
+
+    @_reads
+    def get_insights(self) -> dict:
+        if not self.engine.count(latest_only=True):
+            return {}
+        with stage('insights'):
+            if self._insights is None:
+                with self._lazy_lock:
+                    if self._insights is None:
+                        latest = self.engine.latest_rows()
+                        self._insights = InsightsAggregate.from_frame(_normalize_df(latest, include_payload=False))
+            return self._insights.snapshot()
+
+    @_reads
+    def query_models(self, query: ModelQuery) -> dict:
+        """Filtra, ordena y pagina modelos. El motor resuelve los predicados que puede indexar."""
+        try:
+            rows, residual = self.engine.scan(query.filters, query.latest_only)
+            if not rows.empty:
+                for predicate in residual:
+                    rows = rows[predicate_mask(rows, predicate)]
+                if query.sort_by and query.sort_by in rows.columns:
+                    # Las columnas categóricas se ordenan por valor, no por el orden del diccionario
+                    rows = rows.sort_values(query.sort_by, ascending=not query.descending,
+                                            kind='stable', na_position='last', key=_sort_key)
+        except TypeError as e:
+            raise ValueError(f'Filtro u orden no aplicable: {e}')
+        total = len(rows)
+        page = rows.iloc[query.offset:query.offset + query.limit]
+        items = self._serialize_rows(page, query.fields) if total else []
+        return {'items': items, 'total': total, 'offset': query.offset, 'limit': query.limit}
 
+    @_reads
+    def search_models(self, q: str, limit: int = 20, fields: Optional[List[str]] = None) -> dict:
+        """Búsqueda de texto sobre las últimas versiones, ordenada por relevancia."""
+        if not self.engine.count(latest_only=True):
+            return {'query': q, 'total': 0, 'items': []}
+        ranked = self._search_index().search(q, limit=None)
+        top = ranked[:limit]
+        rows = self.engine.latest_rows([model_id for model_id, _ in top], fields)
+        items = self._serialize_rows(rows, fields) if top else []
+        for item, (_, score) in zip(items, top):
+            item['score'] = round(score, 4)
+        return {'query': q, 'total': len(ranked), 'items': items}
+
+    @_reads
     def get_models_summary(self) -> dict:
-        if self.df.empty:
+        total = self.engine.count(latest_only=True)
+        if not total:
             return {}
-        
-        latest_versions = self.df.sort_values("version").groupby("id").last()
-        
+
+        counts = self.engine.summary(SUMMARY_FIELDS)
+
         return {
-            "total_models": len(latest_versions),
-            "algorithms": latest_versions["algorithm"].value_counts().to_dict(),
-            "functions": latest_versions["function"].value_counts().to_dict(),
-            "languages": latest_versions["scoreCodeType"].value_counts().to_dict(),
-            "model_types": latest_versions["modelType"].value_counts().to_dict(),
-            "target_levels": latest_versions["targetLevel"].value_counts().to_dict(),
-            "tools": latest_versions["tool"].value_counts().to_dict(),
+            "total_models": total,
+            "algorithms": counts["algorithm"],
+            "functions": counts["function"],
+            "languages": counts["scoreCodeType"],
+            "model_types": counts["modelType"],
+            "target_levels": counts["targetLevel"],
+            "tools": counts["tool"],
         }
 
-    def get_all_models(self, latest_only: bool = True) -> List[MLModel]:
-        if self.df.empty:
+    @_reads
+    def get_all_models(self, latest_only: bool = True, offset: int = 0, limit: Optional[int] = None) -> List[MLModel]:
+        if not self.engine.count(latest_only=False):
             return []
-            
-        if latest_only:
-            models_df = self.df.sort_values("version").groupby("id").last()
-        else:
-            models_df = self.df
-            
-        models = []
-        for _, row in models_df.iterrows():
-            model_data = row.to_dict()
-            model_data["custom_properties"] = [
-                CustomProperty(**prop) for prop in model_data["custom_properties"]
-            ]
-            models.append(MLModel(**model_data))
-            
-        return models
\ No newline at end of file
+
+        models_df, _ = self.engine.rows(latest_only, offset, limit)
+        with stage('serialization'):
+            return [self._row_to_model(row) for row in models_df.to_dict(orient='records')]
+
+    @_reads
+    def get_all_models_json(self, latest_only: bool = True, offset: int = 0, limit: Optional[int] = None) -> bytes:
+        """Como `get_all_models`, pero serializado a JSON directo desde las columnas."""
+        if not self.engine.count(latest_only=False):
+            return dumps([])
+        models_df, _ = self.engine.rows(latest_only, offset, limit)
+        with stage('serialization'):
+            return dumps(json_records(models_df))
+
+    @timed('serialization')
+    def _serialize_rows(self, df: pd.DataFrame, fields: Optional[List[str]] = None) -> List[dict]:
+        if self.fast_serialization:
+            return json_records(df, fields)
+        records = df.to_dict(orient='records')
+        if fields is None:
+            return [self._row_to_model(row).model_dump(mode='json') for row in records]
+        # Proyección: solo las columnas pedidas, en el mismo formato JSON que MLModel
+        return [
+            to_jsonable_python({f: clean_value(row.get(f)) for f in fields})
+            for row in records
+        ]
+
+    def iter_models(self, latest_only: bool = True, fields: Optional[List[str]] = None,
+                    chunk_size: int = 500) -> Iterator[List[dict]]:
+        """Produce los modelos serializados por bloques, sin construir la lista completa."""
+        after = None
+        while True:
+            # El lock de lectura se toma por bloque: no queda tomado mientras el cliente consume
+            items, after = self._models_chunk(latest_only, fields, chunk_size, after)
+            if items:
+                yield items
+            if len(items) < chunk_size:
+                return
+
+    @_reads
+    def _models_chunk(self, latest_only: bool, fields: Optional[List[str]], chunk_size: int,
+                      after: Optional[int]) -> Tuple[List[dict], Optional[int]]:
+        rows, keys = self.engine.rows(latest_only, limit=chunk_size, after=after, fields=fields)
+        return (self._serialize_rows(rows, fields) if keys else []), (keys[-1] if keys else after)
+
+    @_reads
+    def get_models_page(self, latest_only: bool = True, limit: int = 100, cursor: Optional[str] = None,
+                        offset: int = 0, fields: Optional[List[str]] = None) -> dict:
+        """Página de modelos. `cursor` es opaco: se obtiene de `next_cursor` de la página anterior."""
+        after = int(cursor) if cursor else None
+        rows, keys = self.engine.rows(latest_only, offset, limit + 1, after, fields)
+        has_more = len(keys) > limit
+        keys = keys[:limit]
+        items = self._serialize_rows(rows.iloc[:limit], fields) if keys else []
+        return {
+            'items': items,
+            'next_cursor': str(keys[-1]) if has_more else None,
+            'total': self.engine.count(latest_only),
+        }
@@ -0,0 +1,495 @@
+"""
+Motor Parquet: el registro completo en memoria sobre `SegmentStore`.
+
+Las filas se leen de la instantánea Arrow (memory-map) más los segmentos
+posteriores, y las escrituras agregan un segmento (o reescriben la base en
+modo `rewrite`). Las búsquedas usan índices en memoria por posición: id ->
+versiones, últimas versiones y `LatestIndex` para /models/query.
+
+Con retención (ver archive.py) en memoria queda solo el registro caliente; una
+versión archivada se lee del archivo frío cuando se pide por número.
+"""
+
+import logging
+import os
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+from ..models.query_schema import Predicate
+from .content_hash import HASH_COLUMN, content_hash
+from .history import CHANGED_COLUMN, HISTORY_FIELDS, is_delta, reconstruct, same_value
+from .query import INDEXED_FIELDS, RANGE_FIELDS, LatestIndex
+from .registry_schema import conform_table, registry_table, utc_row
+from .segment_store import SegmentStore, concat_tables
+from .storage_engine import LatestEntry, StorageEngine, clean_value
+from ..utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Cuántos chunks acumula la tabla en memoria antes de consolidarla
+MAX_TABLE_CHUNKS = 64
+
+
+def _counts(values: pd.Series) -> dict:
+    """value_counts sobre los códigos de una columna categórica (sin las categorías vacías)."""
+    counts = values.value_counts()
+    return counts[counts > 0].to_dict()
+
+
+class ParquetEngine(StorageEngine):
+    name = 'parquet'
+
+    def __init__(self, data_dir: Path):
+        super().__init__(data_dir)
+        self.models_file = self.data_dir / 'models.parquet'
+        # 'segments': cada escritura agrega un segmento delta; 'rewrite': reescribe models.parquet
+        self.storage_mode = os.getenv('MODEL_STORAGE_MODE', 'segments')
+        self.store = SegmentStore(self.data_dir)
+        self.store.schedule_archiving()
+        # El registro se abre en el primer uso, no al importar el router
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        # Las lecturas concurrentes también cambian el estado (filas pendientes, segmentos de otros workers)
+        self._state_lock = threading.RLock()
+        # Generación del registro reflejada en memoria; si otro worker escribe, se aplican sus segmentos
+        self._generation = 0
+        # Filas cargadas: tabla Arrow (memory-map de la instantánea) y, solo si hace falta, su DataFrame
+        self._table: Optional[pa.Table] = None
+        self._base_df: Optional[pd.DataFrame] = None
+        # Filas agregadas desde la última materialización de `df` (evita pd.concat por escritura)
+        self._pending_rows: List[dict] = []
+        # Índices en memoria: id -> {versión: posición} e id -> posición de la última versión
+        self._positions: Dict[str, Dict[int, int]] = {}
+        self._latest: Dict[str, int] = {}
+        self._latest_version: Dict[str, int] = {}
+        # Posiciones de las últimas versiones ordenadas (se invalida cuando cambia alguna)
+        self._sorted_latest: Optional[List[int]] = None
+        # id -> hash del contenido de la última versión (None en filas legacy: se calcula al usarlo)
+        self._hashes: Dict[str, Optional[str]] = {}
+        # Índices por columna para /models/query (perezosos)
+        self._query_index: Optional[LatestIndex] = None
+
+    @property
+    def df(self) -> pd.DataFrame:
+        self._ensure_loaded()
+        self._fold_pending()
+        if self._base_df is None:
+            self._base_df = self._table.to_pandas() if self._table is not None else pd.DataFrame()
+        if self._pending_rows:
+            new_rows = pd.DataFrame(self._pending_rows)
+            if self._base_df.empty:
+                self._base_df = new_rows
+            else:
+                self._base_df = pd.concat([self._base_df, new_rows], ignore_index=True)
+            self._pending_rows = []
+        return self._base_df
+
+    @df.setter
+    def df(self, value: pd.DataFrame):
+        self._table = None
+        self._base_df = value
+        self._pending_rows = []
+        self._rebuild_index()
+
+    def _set_table(self, table: Optional[pa.Table]):
+        self._table = table
+        self._base_df = None
+        self._pending_rows = []
+        self._rebuild_index()
+
+    def _fold_pending(self):
+        """Pasa las filas pendientes a la tabla Arrow (codificadas con el esquema del registro)."""
+        if not self._pending_rows or self._base_df is not None:
+            return
+        with self._state_lock:
+            if not self._pending_rows or self._base_df is not None:
+                return
+            new_rows = registry_table(self._pending_rows)
+            table = new_rows if self._table is None else concat_tables([self._table, new_rows])
+            if table.column('id').num_chunks > MAX_TABLE_CHUNKS:
+                table = table.unify_dictionaries().combine_chunks()
+            self._table, self._pending_rows = table, []
+
+    def _as_table(self) -> pa.Table:
+        if self._base_df is not None:
+            return conform_table(pa.Table.from_pandas(self.df, preserve_index=False))
+        self._fold_pending()
+        return self._table
+
+    def _base_len(self) -> int:
+        if self._base_df is not None:
+            return len(self._base_df)
+        return self._table.num_rows if self._table is not None else 0
+
+    def _row_count(self) -> int:
+        return self._base_len() + len(self._pending_rows)
+
+    def _index_row(self, position: int, model_id, version, digest: Optional[str] = None):
+        version = int(version)
+        self._positions.setdefault(model_id, {})[version] = position
+        # Ante versiones repetidas gana la fila escrita más tarde
+        if version >= self._latest_version.get(model_id, version):
+            self._latest[model_id] = position
+            self._latest_version[model_id] = version
+            self._hashes[model_id] = digest
+            self._sorted_latest = None
+
+    def _rebuild_index(self):
+        self._positions = {}
+        self._latest = {}
+        self._latest_version = {}
+        self._sorted_latest = None
+        self._hashes = {}
+        self._query_index = None
+        self.listener.on_reset()
+        if self._base_df is not None:
+            if self._base_df.empty or 'id' not in self._base_df.columns:
+                return
+            ids = self._base_df['id'].tolist()
+            versions = self._base_df['version'].tolist()
+            digests = self._base_df[HASH_COLUMN].tolist() if HASH_COLUMN in self._base_df.columns else None
+        elif self._table is not None and 'id' in self._table.column_names:
+            # Solo se leen las columnas del índice
+            ids = self._table.column('id').to_pylist()
+            versions = self._table.column('version').to_pylist()
+            digests = self._table.column(HASH_COLUMN).to_pylist() if HASH_COLUMN in self._table.column_names else None
+        else:
+            return
+        if digests is None:
+            digests = [None] * len(ids)
+        for position, (model_id, version, digest) in enumerate(zip(ids, versions, digests)):
+            self._index_row(position, model_id, version, digest if isinstance(digest, str) else None)
+
+    def _row(self, position: int) -> dict:
+        base_len = self._base_len()
+        if position >= base_len:
+            return self._pending_rows[position - base_len]
+        if self._base_df is not None:
+            return self._base_df.iloc[position].to_dict()
+        return self._table.slice(position, 1).to_pylist()[0]
+
+    def _latest_positions(self) -> List[int]:
+        if self._sorted_latest is None:
+            self._sorted_latest = sorted(self._latest.values())
+        return self._sorted_latest
+
+    def _latest_df(self, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        return self._rows_at(self._latest_positions(), fields)
+
+    @staticmethod
+    def _records(df: pd.DataFrame) -> List[dict]:
+        """Filas de `df` como dicts con tipos de Python (None en lugar de NaN/NaT)."""
+        return [{k: clean_value(v) for k, v in row.items()} for row in df.to_dict(orient='records')]
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._load_lock, self.store.lock(shared=True):
+            if not self._loaded:
+                self._load()
+
+    def _load(self):
+        """Abre la instantánea Arrow y aplica los segmentos posteriores.
+
+        Sin instantánea (o si quedó detrás de una compactación) se lee el
+        Parquet y se deja una instantánea nueva para el próximo arranque.
+        """
+        generation = self.store.generation
+        table, snapshot_generation = self.store.open_snapshot()
+        delta = None
+        if table is not None and snapshot_generation <= generation:
+            delta = self.store.read_since(snapshot_generation, upto=generation)
+        if delta is None:
+            if not self.models_file.exists():
+                logger.info("No se encontró archivo de datos, creando uno nuevo")
+            else:
+                logger.info("Cargando datos desde: %s", self.models_file)
+            table = self.store.load_table(upto=generation)
+            if table is not None:
+                try:
+                    self.store.write_snapshot(table, generation)
+                except OSError as e:
+                    logger.warning("No se pudo guardar la instantánea: %s", e)
+        self._set_table(table)
+        if delta is not None and not delta.empty:
+            self._add_pending(self._records(delta))
+        self._generation = generation
+        self._loaded = True
+
+    @property
+    def generation(self) -> int:
+        self._ensure_loaded()
+        return self._generation
+
+    def modified_at(self) -> Optional[datetime]:
+        return self.store.modified_at()
+
+    def has_changes(self) -> bool:
+        return not self._loaded or self.store.generation != self._generation
+
+    def refresh(self) -> bool:
+        """Sin cambios el costo es un `stat` del manifest."""
+        if not self._loaded:
+            self._ensure_loaded()
+            return True
+        if self.store.generation == self._generation:
+            return False
+        with self.store.lock(shared=True):
+            return self._sync()
+
+    def _sync(self) -> bool:
+        # Se llama con el lock del store tomado
+        self._ensure_loaded()
+        with self._state_lock:
+            generation = self.store.generation
+            if generation == self._generation:
+                return False
+            delta = self.store.read_since(self._generation, upto=generation) if generation > self._generation else None
+            if delta is None:
+                # Los segmentos ya se compactaron (o el registro se reescribió): recarga completa
+                self._generation = generation
+                self._set_table(self.store.load_table(upto=generation))
+            else:
+                if not delta.empty:
+                    self._add_pending(self._records(delta))
+                self._generation = generation
+            return True
+
+    @contextmanager
+    def write_lock(self):
+        with self.store.lock():
+            # Las filas de otros workers van antes que las nuevas, igual que en disco
+            self._sync()
+            yield
+
+    def append(self, rows: List[dict]) -> int:
+        with self.write_lock():
+            if self.storage_mode == 'rewrite':
+                with stage('append'):
+                    self._add_pending(rows)
+                logger.debug("Guardando datos en: %s", self.models_file)
+                with stage('parquet_write'):
+                    generation = self.store.write_base(self._as_table())
+            else:
+                # Solo se persisten las filas nuevas: el costo no depende del tamaño del registro
+                with stage('parquet_write'):
+                    generation = self.store.append(registry_table(rows))
+                with stage('append'):
+                    self._add_pending(rows)
+            self._generation = generation
+        return generation
+
+    def _add_pending(self, rows: List[dict]):
+        for row in rows:
+            # Mismos tipos que las filas ya plegadas a la tabla Arrow
+            row = utc_row(row)
+            previous = self._latest.get(row["id"])
+            position = self._row_count()
+            self._pending_rows.append(row)
+            self._index_row(position, row["id"], row["version"], row.get(HASH_COLUMN))
+            if self._latest[row["id"]] == position:
+                self._on_latest_changed(previous, position, row)
+
+    def _on_latest_changed(self, previous: Optional[int], position: int, row: dict):
+        cached = []
+
+        def previous_row() -> Optional[dict]:
+            # La fila anterior se lee una sola vez y solo si alguien la usa
+            if not cached:
+                cached.append(self._row(previous) if previous is not None else None)
+            return cached[0]
+
+        if self._query_index is not None:
+            if previous is not None:
+                self._query_index.remove(previous, previous_row())
+            self._query_index.add(position, row)
+        self.listener.on_latest_changed(row, previous_row)
+
+    def _latest_hash(self, model_id: str) -> str:
+        digest = self._hashes.get(model_id)
+        if digest is None:
+            digest = self._hashes[model_id] = content_hash(self._row(self._latest[model_id]))
+        return digest
+
+    def latest_entry(self, model_id: str) -> Optional[LatestEntry]:
+        if model_id not in self._latest:
+            return None
+        return LatestEntry(self._latest_version[model_id], self._latest_hash(model_id))
+
+    def get(self, model_id: str, version: Optional[int] = None) -> Optional[dict]:
+        versions = self._positions.get(model_id)
+        if not versions:
+            return None
+        if version is not None and version not in versions:
+            return self.store.archive.get(model_id, version)
+        return self._full_row_at(self._latest[model_id] if version is None else versions[version])
+
+    def versions(self, model_id: str) -> List[int]:
+        hot = self._positions.get(model_id)
+        if not hot:
+            return []
+        return sorted(set(hot) | set(self.store.archive.versions(model_id)))
+
+    def count(self, latest_only: bool = True) -> int:
+        return len(self._latest) if latest_only else self._row_count()
+
+    def _full_row_at(self, position: int) -> dict:
+        """Fila completa de una posición; las versiones delta se reconstruyen desde las siguientes."""
+        row = self._row(position)
+        if not is_delta(row.get(CHANGED_COLUMN)):
+            return row
+        versions = self._positions[row['id']]
+        chain = [row]
+        for version in sorted(v for v in versions if v > int(row['version'])):
+            following = self._row(versions[version])
+            if not is_delta(following.get(CHANGED_COLUMN)):
+                return reconstruct(chain, following)
+            chain.append(following)
+        return row
+
+    def _cell(self, position: int, field: str):
+        """Un solo valor del registro, sin materializar la fila."""
+        base_len = self._base_len()
+        if position >= base_len:
+            return self._pending_rows[position - base_len].get(field)
+        if self._base_df is not None:
+            return self._base_df.at[position, field] if field in self._base_df.columns else None
+        if field not in self._table.column_names:
+            return None
+        return self._table.column(field)[position].as_py()
+
+    def _value_at(self, versions: Dict[int, int], ordered: List[int], version: int, field: str):
+        # Un delta guarda el valor del campo solo si cambió; si no, vale lo de la versión siguiente
+        for v in ordered[ordered.index(version):]:
+            position = versions[v]
+            changed = self._cell(position, CHANGED_COLUMN)
+            if not is_delta(changed) or field in list(changed):
+                return self._cell(position, field)
+        return None
+
+    def diff(self, model_id: str, from_version: Optional[int] = None,
+             to_version: Optional[int] = None) -> Optional[dict]:
+        """Con el historial en deltas solo se leen los campos listados en `_changed`."""
+        versions = self._positions.get(model_id)
+        if not versions:
+            return None
+        ordered = sorted(versions)
+        if to_version is None:
+            to_version = self._latest_version[model_id]
+        if from_version is None:
+            earlier = [v for v in ordered if v < to_version]
+            from_version = earlier[-1] if earlier else None
+        if from_version not in versions or to_version not in versions:
+            # Alguna versión puede estar en el archivo frío: comparación por filas completas
+            return super().diff(model_id, from_version, to_version)
+        low, high = sorted((from_version, to_version))
+        marks = [self._cell(versions[v], CHANGED_COLUMN) for v in ordered if low <= v < high]
+        if all(is_delta(m) for m in marks):
+            candidates = list(dict.fromkeys(f for m in marks for f in m))
+        else:
+            # Hay versiones completas en el rango: se comparan todos los campos
+            candidates = list(HISTORY_FIELDS)
+        changes = {}
+        for field in candidates:
+            before = self._value_at(versions, ordered, from_version, field)
+            after = self._value_at(versions, ordered, to_version, field)
+            if not same_value(before, after):
+                changes[field] = {'from': clean_value(before), 'to': clean_value(after)}
+        return {'id': model_id, 'from': from_version, 'to': to_version, 'changes': changes}
+
+    def _listing_positions(self, latest_only: bool) -> Sequence[int]:
+        if latest_only:
+            return self._latest_positions()
+        return range(self._row_count())
+
+    def _page_positions(self, latest_only: bool, offset: int = 0, limit: Optional[int] = None,
+                        after: Optional[int] = None) -> Sequence[int]:
+        positions = self._listing_positions(latest_only)
+        start = offset
+        if after is not None:
+            start += bisect_right(positions, after)
+        end = None if limit is None else start + limit
+        return positions[start:end]
+
+    def rows(self, latest_only: bool = True, offset: int = 0, limit: Optional[int] = None,
+             after: Optional[int] = None, fields: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[int]]:
+        # La clave de cada fila es su posición en el registro
+        positions = list(self._page_positions(latest_only, offset, limit, after))
+        return self._rows_at(positions, fields), positions
+
+    def latest_rows(self, ids: Optional[Sequence[str]] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        if ids is None:
+            return self._latest_df(fields)
+        return self._rows_at([self._latest[model_id] for model_id in ids if model_id in self._latest], fields)
+
+    def scan(self, filters: List[Predicate], latest_only: bool = True) -> Tuple[pd.DataFrame, List[Predicate]]:
+        """Los predicados indexables se resuelven con `LatestIndex`, sin escanear."""
+        if latest_only:
+            if self._query_index is None:
+                # Varias lecturas pueden llegar a la vez: se arma una sola vez
+                with self._state_lock:
+                    if self._query_index is None:
+                        positions = self._latest_positions()
+                        self._query_index = LatestIndex.from_frame(
+                            self._rows_at(positions, list(INDEXED_FIELDS + RANGE_FIELDS)), positions)
+            candidates, residual = self._query_index.candidates(filters)
+            positions = sorted(candidates) if candidates is not None else self._latest_positions()
+        else:
+            positions, residual = range(self._row_count()), filters
+        return (self._rows_at(positions) if len(positions) else pd.DataFrame()), residual
+
+    def summary(self, fields: Sequence[str]) -> Dict[str, dict]:
+        latest = self._latest_df(list(fields))
+        return {field: _counts(latest[field]) for field in fields}
+
+    def changed_ids_since(self, generation: int) -> Optional[List[str]]:
+        delta = self.store.read_since(generation, upto=self._generation)
+        if delta is None:
+            return None
+        return list(dict.fromkeys(delta['id'].tolist())) if not delta.empty else []
+
+    def _rows_at(self, positions: Sequence[int], fields: Optional[List[str]] = None) -> pd.DataFrame:
+        positions = list(positions)
+        # `_changed` siempre se lee para detectar versiones guardadas como delta
+        columns = None if fields is None else list(dict.fromkeys([*fields, CHANGED_COLUMN]))
+        if self._base_df is None:
+            self._fold_pending()
+        if self._base_df is None and self._table is not None:
+            frame = self._take_from_table(positions, columns)
+        else:
+            df = self.df
+            if columns is None:
+                frame = df.take(positions)
+            else:
+                # Solo se copian las columnas pedidas de las filas de la página
+                frame = df.iloc[positions, [df.columns.get_loc(f) for f in columns if f in df.columns]]
+        return self._resolve_history(frame)
+
+    def _resolve_history(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Reemplaza las filas delta de `frame` (indexado por posición) por la versión completa."""
+        if CHANGED_COLUMN not in frame.columns:
+            return frame
+        deltas = frame[CHANGED_COLUMN].notna()
+        frame = frame.drop(columns=[CHANGED_COLUMN])
+        if not deltas.any():
+            return frame
+        positions = frame.index[deltas]
+        rebuilt = pd.DataFrame([self._full_row_at(p) for p in positions], index=positions)
+        rebuilt = rebuilt[[c for c in frame.columns if c in rebuilt.columns]]
+        return pd.concat([frame[~deltas], rebuilt]).loc[frame.index]
+
+    def _take_from_table(self, positions: List[int], fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """Materializa solo las filas y columnas pedidas, sin convertir la tabla completa."""
+        table = self._table
+        if fields is not None:
+            table = table.select([f for f in fields if f in table.column_names])
+        frame = table.take(pa.array(positions, type=pa.int64())).to_pandas()
+        frame.index = positions
+        return frame
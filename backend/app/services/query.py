@@ -0,0 +1,149 @@
+"""
+Filtros sobre el registro en memoria.
+
+`LatestIndex` mantiene índices por columna sobre las últimas versiones:
+valor -> posiciones para los campos categóricos y listas ordenadas para los
+campos de rango (fechas, versión). Los predicados que un índice puede
+resolver no tocan el DataFrame; el resto se evalúa vectorizado solo sobre
+las filas candidatas.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+from ..models.query_schema import Predicate
+
+INDEXED_FIELDS = ('algorithm', 'modelType', 'function', 'tool', 'createdBy',
+                  'scoreCodeType', 'targetLevel', 'modeler')
+RANGE_FIELDS = ('creationTimeStamp', 'modifiedTimeStamp', 'version')
+DATETIME_FIELDS = ('creationTimeStamp', 'modifiedTimeStamp')
+
+
+def range_key(field: str, value):
+    """Clave comparable para los campos de rango (fechas como ns UTC)."""
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    if field in DATETIME_FIELDS:
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is None:
+            ts = ts.tz_localize('UTC')
+        return ts.value
+    return int(value)
+
+
+def _hashable(value):
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None
+    return value if pd.api.types.is_scalar(value) else None
+
+
+class LatestIndex:
+    def __init__(self):
+        self.values: Dict[str, Dict[object, Set[int]]] = {f: {} for f in INDEXED_FIELDS}
+        self.ranges: Dict[str, List[Tuple[int, int]]] = {f: [] for f in RANGE_FIELDS}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, positions: List[int]) -> 'LatestIndex':
+        """`df` son las últimas versiones y `positions` su posición en el registro."""
+        index = cls()
+        for field in INDEXED_FIELDS:
+            if field not in df.columns:
+                continue
+            buckets = index.values[field]
+            for position, value in zip(positions, df[field].tolist()):
+                value = _hashable(value)
+                if value is not None:
+                    buckets.setdefault(value, set()).add(position)
+        for field in RANGE_FIELDS:
+            if field not in df.columns:
+                continue
+            keys = [(range_key(field, v), p) for p, v in zip(positions, df[field].tolist())]
+            index.ranges[field] = sorted(k for k in keys if k[0] is not None)
+        return index
+
+    def add(self, position: int, row: dict):
+        for field in INDEXED_FIELDS:
+            value = _hashable(row.get(field))
+            if value is not None:
+                self.values[field].setdefault(value, set()).add(position)
+        for field in RANGE_FIELDS:
+            key = range_key(field, row.get(field))
+            if key is not None:
+                insort(self.ranges[field], (key, position))
+
+    def remove(self, position: int, row: dict):
+        for field in INDEXED_FIELDS:
+            value = _hashable(row.get(field))
+            bucket = self.values[field].get(value)
+            if bucket is not None:
+                bucket.discard(position)
+                if not bucket:
+                    del self.values[field][value]
+        for field in RANGE_FIELDS:
+            key = range_key(field, row.get(field))
+            entries = self.ranges[field]
+            i = bisect_left(entries, (key, position)) if key is not None else len(entries)
+            if i < len(entries) and entries[i] == (key, position):
+                del entries[i]
+
+    def _lookup(self, predicate: Predicate) -> Optional[Set[int]]:
+        field, op, value = predicate.field, predicate.op, predicate.value
+        if field in INDEXED_FIELDS and op in ('eq', 'in'):
+            buckets = self.values[field]
+            values = value if op == 'in' else [value]
+            return set().union(*(buckets.get(v, set()) for v in values))
+        if field in RANGE_FIELDS and op in ('gt', 'gte', 'lt', 'lte', 'between', 'eq'):
+            entries = self.ranges[field]
+            lo, hi = 0, len(entries)
+            if op == 'between':
+                lo = bisect_left(entries, (range_key(field, value[0]), -1))
+                hi = bisect_right(entries, (range_key(field, value[1]), float('inf')))
+            elif op == 'eq':
+                key = range_key(field, value)
+                lo = bisect_left(entries, (key, -1))
+                hi = bisect_right(entries, (key, float('inf')))
+            elif op in ('gt', 'gte'):
+                key = range_key(field, value)
+                lo = bisect_right(entries, (key, float('inf'))) if op == 'gt' else bisect_left(entries, (key, -1))
+            else:
+                key = range_key(field, value)
+                hi = bisect_left(entries, (key, -1)) if op == 'lt' else bisect_right(entries, (key, float('inf')))
+            return {p for _, p in entries[lo:hi]}
+        return None
+
+    def candidates(self, predicates: List[Predicate]) -> Tuple[Optional[Set[int]], List[Predicate]]:
+        """Posiciones que cumplen los predicados indexables y los predicados restantes.
+
+        Devuelve None como candidatos si ningún predicado usó un índice.
+        """
+        result: Optional[Set[int]] = None
+        residual = []
+        for predicate in predicates:
+            matched = self._lookup(predicate)
+            if matched is None:
+                residual.append(predicate)
+            else:
+                result = matched if result is None else result & matched
+        return result, residual
+
+
+def predicate_mask(df: pd.DataFrame, predicate: Predicate) -> pd.Series:
+    """Evalúa un predicado de forma vectorizada sobre `df`."""
+    if predicate.field not in df.columns:
+        return pd.Series(False, index=df.index)
+    column = df[predicate.field]
+    value = predicate.value
+    if predicate.field in DATETIME_FIELDS:
+        column = pd.to_datetime(column, utc=True)
+        to_value = lambda v: pd.Timestamp(range_key(predicate.field, v), tz='UTC')
+        value = [to_value(v) for v in value] if isinstance(value, list) else to_value(value)
+    op = predicate.op
+    if op == 'eq':
+        return column == value
+    if op == 'in':
+        return column.isin(value)
+    if op == 'between':
+        return (column >= value[0]) & (column <= value[1])
+    return {'gt': column.gt, 'gte': column.ge, 'lt': column.lt, 'lte': column.le}[op](value)
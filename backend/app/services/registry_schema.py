@@ -0,0 +1,127 @@
+"""
+Esquema Arrow fijo del registro de modelos.
+
+Las columnas de baja cardinalidad (algoritmo, función, herramienta, autores...)
+se guardan codificadas por diccionario, las fechas como timestamp UTC y
+`custom_properties` como lista de structs. Todas las tablas que llegan al
+servicio (base, segmentos, instantánea y filas nuevas) pasan por
+`conform_table`, así que en memoria el registro siempre tiene la misma forma.
+"""
+
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import pyarrow as pa
+
+CATEGORICAL_FIELDS = ('createdBy', 'modifiedBy', 'scoreCodeType', 'algorithm', 'function', 'modeler',
+                      'modelType', 'trainCodeType', 'targetLevel', 'tool', 'toolVersion')
+TIMESTAMP_TYPE = pa.timestamp('us', tz='UTC')
+CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+CUSTOM_PROPERTY_TYPE = pa.struct([('name', pa.string()), ('value', pa.string()), ('type', pa.string())])
+
+REGISTRY_SCHEMA = pa.schema([
+    ('creationTimeStamp', TIMESTAMP_TYPE),
+    ('createdBy', CATEGORY_TYPE),
+    ('modifiedTimeStamp', TIMESTAMP_TYPE),
+    ('modifiedBy', CATEGORY_TYPE),
+    ('id', pa.string()),
+    ('name', pa.string()),
+    ('description', pa.string()),
+    ('scoreCodeType', CATEGORY_TYPE),
+    ('algorithm', CATEGORY_TYPE),
+    ('function', CATEGORY_TYPE),
+    ('modeler', CATEGORY_TYPE),
+    ('modelType', CATEGORY_TYPE),
+    ('trainCodeType', CATEGORY_TYPE),
+    ('targetLevel', CATEGORY_TYPE),
+    ('tool', CATEGORY_TYPE),
+    ('toolVersion', CATEGORY_TYPE),
+    ('externalUrl', pa.string()),
+    ('modelVersionName', pa.string()),
+    ('custom_properties', pa.list_(CUSTOM_PROPERTY_TYPE)),
+    ('version', pa.int64()),
+    # Hash del contenido de la versión, ver content_hash.py
+    ('content_hash', pa.string()),
+    # Campos guardados en una fila delta del historial (nulo = versión completa), ver history.py
+    ('_changed', pa.list_(pa.string())),
+])
+TIMESTAMP_FIELDS = tuple(f.name for f in REGISTRY_SCHEMA if f.type == TIMESTAMP_TYPE)
+
+
+def _struct_list_chunk(chunk: pa.Array) -> pa.Array:
+    """Reordena/completa los campos de una lista de structs (p. ej. datos con otro orden de campos)."""
+    if pa.types.is_null(chunk.type):
+        return pa.nulls(len(chunk), pa.list_(CUSTOM_PROPERTY_TYPE))
+    values = chunk.values
+    if pa.types.is_null(values.type):
+        children = [pa.nulls(len(values), pa.string()) for _ in CUSTOM_PROPERTY_TYPE]
+        mask = None
+    else:
+        names = [values.type.field(i).name for i in range(values.type.num_fields)]
+        children = [values.field(names.index(f.name)).cast(pa.string()) if f.name in names
+                    else pa.nulls(len(values), pa.string()) for f in CUSTOM_PROPERTY_TYPE]
+        mask = values.is_null() if values.null_count else None
+    struct = pa.StructArray.from_arrays(children, fields=list(CUSTOM_PROPERTY_TYPE), mask=mask)
+    offsets = chunk.offsets
+    if chunk.null_count:
+        return pa.ListArray.from_arrays(offsets, struct, mask=chunk.is_null())
+    return pa.ListArray.from_arrays(offsets, struct)
+
+
+def _conform_column(column: pa.ChunkedArray, field: pa.Field) -> pa.ChunkedArray:
+    if column.type == field.type:
+        return column
+    if field.type == CATEGORY_TYPE:
+        if pa.types.is_dictionary(column.type):
+            return column.cast(CATEGORY_TYPE)
+        return column.cast(pa.string()).dictionary_encode()
+    if field.name == 'custom_properties':
+        return pa.chunked_array([_struct_list_chunk(c) for c in column.chunks], type=field.type)
+    # Fechas sin zona se interpretan como UTC (igual que en los filtros de /models/query)
+    return column.cast(field.type, safe=False)
+
+
+def conform_table(table: Optional[pa.Table]) -> Optional[pa.Table]:
+    """Lleva `table` al esquema del registro. Las columnas extra (datos legacy) se conservan al final."""
+    if table is None:
+        return None
+    names: List[str] = []
+    columns = []
+    for field in REGISTRY_SCHEMA:
+        if field.name in table.column_names:
+            column = table.column(field.name)
+            try:
+                column = _conform_column(column, field)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                # Un valor que no encaja en el tipo: la columna se conserva como llegó
+                pass
+        else:
+            column = pa.nulls(table.num_rows, field.type)
+        names.append(field.name)
+        columns.append(column)
+    for name in table.column_names:
+        if name not in REGISTRY_SCHEMA.names:
+            names.append(name)
+            columns.append(table.column(name))
+    return pa.Table.from_arrays(columns, names=names)
+
+
+def registry_table(rows: List[dict]) -> pa.Table:
+    """Tabla con el esquema del registro a partir de filas (dicts de MLModel o del registro)."""
+    return conform_table(pa.Table.from_pylist(rows))
+
+
+def _utc(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return value
+    if hasattr(value, 'to_pydatetime'):
+        value = value.to_pydatetime()
+    # Igual que Arrow: una fecha sin zona se toma como UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def utc_row(row: dict) -> dict:
+    """Copia de `row` con las fechas como datetime UTC, los mismos valores que devuelve una fila Arrow."""
+    return {**row, **{f: _utc(row[f]) for f in TIMESTAMP_FIELDS if row.get(f) is not None}}
@@ -0,0 +1,102 @@
+"""
+Serialización rápida de filas del registro a JSON.
+
+Las filas guardadas ya pasaron por `MLModel` al escribirse, así que para
+responder no hace falta reconstruir un `CustomProperty`/`MLModel` por fila y
+volver a validarlo: las columnas del DataFrame se convierten de a una a
+valores JSON (timestamps en el formato de Pydantic, NaN/NaT como null) y
+`orjson` arma los bytes. El esquema de la respuesta es el mismo que el de
+`MLModel.model_dump(mode='json')`: mismos campos, en el mismo orden.
+
+`RESPONSE_SERIALIZATION=pydantic` vuelve al camino con modelos por fila.
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Iterable, List, Optional
+
+import orjson
+import pandas as pd
+
+from ..models.model_schema import CustomProperty, MLModel
+from .storage_engine import clean_value
+
+SERIALIZATION_MODES = ('fast', 'pydantic')
+MODEL_FIELDS = tuple(MLModel.model_fields)
+PROPERTY_FIELDS = tuple(CustomProperty.model_fields)
+_TEXT_FIELDS = frozenset(f for f, info in MLModel.model_fields.items() if info.annotation in (str, Optional[str]))
+
+
+def serialization_mode() -> str:
+    mode = os.getenv('RESPONSE_SERIALIZATION', 'fast')
+    if mode not in SERIALIZATION_MODES:
+        raise ValueError(f"RESPONSE_SERIALIZATION inválido: {mode} (opciones: {', '.join(SERIALIZATION_MODES)})")
+    return mode
+
+
+def _timestamp_text(value: datetime) -> str:
+    # Mismo formato que Pydantic: ISO 8601 con 'Z' para UTC
+    text = value.isoformat()
+    return text[:-6] + 'Z' if text.endswith('+00:00') else text
+
+
+def _properties(value) -> List[dict]:
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return []
+    return [{f: clean_value(prop.get(f)) for f in PROPERTY_FIELDS} for prop in value]
+
+
+def _json_value(value) -> Any:
+    value = clean_value(value)
+    return _timestamp_text(value) if isinstance(value, datetime) else value
+
+
+def _default(field: str) -> Any:
+    info = MLModel.model_fields.get(field)
+    return None if info is None or info.is_required() else info.default
+
+
+def _column(frame: pd.DataFrame, field: str) -> list:
+    """Valores JSON de una columna completa."""
+    if field not in frame.columns:
+        return [_default(field)] * len(frame)
+    series = frame[field]
+    if field == 'custom_properties':
+        return [_properties(v) for v in series.tolist()]
+    missing = series.isna().to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        values = series.array.to_pydatetime()
+        return [None if m else _timestamp_text(v) for v, m in zip(values, missing)]
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if series.dtype == object:
+        values = series.tolist()
+        if field in _TEXT_FIELDS and not missing.any():
+            # Texto sin nulos: la columna pasa tal cual
+            return values
+        return [None if m else _json_value(v) for v, m in zip(values, missing)]
+    if field == 'version' and pd.api.types.is_float_dtype(series.dtype):
+        return [None if m else int(v) for v, m in zip(series.tolist(), missing)]
+    values = series.tolist()
+    return [None if m else v for v, m in zip(values, missing)] if missing.any() else values
+
+
+def json_records(frame: pd.DataFrame, fields: Optional[Iterable[str]] = None) -> List[dict]:
+    """Filas de `frame` como dicts JSON (campos de MLModel, o solo `fields`), armados por columna."""
+    fields = MODEL_FIELDS if fields is None else tuple(fields)
+    columns = [_column(frame, field) for field in fields]
+    return [dict(zip(fields, values)) for values in zip(*columns)] if len(frame) else []
+
+
+def json_record(row: dict, fields: Optional[Iterable[str]] = None) -> dict:
+    """Una fila (dict) como dict JSON, con los mismos valores que `json_records`."""
+    fields = MODEL_FIELDS if fields is None else tuple(fields)
+    out = {}
+    for field in fields:
+        value = row.get(field, _default(field))
+        out[field] = _properties(value) if field == 'custom_properties' else _json_value(value)
+    return out
+
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload)
@@ -0,0 +1,202 @@
+"""
+Índice invertido para la búsqueda de modelos.
+
+Indexa la última versión de cada modelo (`name`, `description`,
+`modelVersionName`, `modeler` y los pares nombre/valor de `custom_properties`).
+Cada término de la consulta se expande por prefijo sobre el vocabulario
+ordenado y los resultados se ordenan por un puntaje tf-idf ponderado por campo.
+El índice se guarda junto a `models.parquet` con la generación del registro
+que refleja, para que al reiniciar solo se reapliquen los cambios posteriores.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'modelVersionName': 2.0,
+    'modeler': 1.5,
+    'description': 1.0,
+}
+CUSTOM_PROPERTY_WEIGHT = 1.0
+# Columnas del registro que necesita el índice
+SEARCH_COLUMNS = ('id', *FIELD_WEIGHTS, 'custom_properties')
+# Una coincidencia por prefijo vale menos que una exacta
+PREFIX_FACTOR = 0.5
+MIN_PREFIX_LENGTH = 2
+INDEX_FORMAT = 1
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text) -> List[str]:
+    if text is None:
+        return []
+    text = str(text).lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+
+def document_terms(row: dict) -> Dict[str, float]:
+    """Términos ponderados de una fila del registro."""
+    terms: Dict[str, float] = {}
+
+    def add(text, weight):
+        for token in tokenize(text):
+            terms[token] = terms.get(token, 0.0) + weight
+
+    for field, weight in FIELD_WEIGHTS.items():
+        value = row.get(field)
+        if isinstance(value, str):
+            add(value, weight)
+    props = row.get('custom_properties')
+    if isinstance(props, (list, tuple, np.ndarray)):
+        for prop in props:
+            if isinstance(prop, dict):
+                add(prop.get('name'), CUSTOM_PROPERTY_WEIGHT)
+                add(prop.get('value'), CUSTOM_PROPERTY_WEIGHT)
+    return terms
+
+
+class SearchIndex:
+    def __init__(self):
+        self.generation = 0
+        self.docs: Dict[str, Dict[str, float]] = {}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.vocabulary: List[str] = []
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _add_terms(self, doc_id: str, terms: Dict[str, float]):
+        self.docs[doc_id] = terms
+        for token, weight in terms.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                insort(self.vocabulary, token)
+            posting[doc_id] = weight
+
+    def remove(self, doc_id: str):
+        for token in self.docs.pop(doc_id, {}):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[token]
+                i = bisect_left(self.vocabulary, token)
+                if i < len(self.vocabulary) and self.vocabulary[i] == token:
+                    del self.vocabulary[i]
+
+    def update(self, doc_id: str, row: dict):
+        """Reemplaza el documento `doc_id` por el contenido de `row`."""
+        self.remove(doc_id)
+        self._add_terms(doc_id, document_terms(row))
+
+    @classmethod
+    def build(cls, rows: Iterable[dict], generation: int = 0) -> 'SearchIndex':
+        index = cls()
+        for row in rows:
+            terms = document_terms(row)
+            index.docs[row['id']] = terms
+            for token, weight in terms.items():
+                index.postings.setdefault(token, {})[row['id']] = weight
+        index.vocabulary = sorted(index.postings)
+        index.generation = generation
+        return index
+
+    def _expand(self, term: str) -> List[str]:
+        i = bisect_left(self.vocabulary, term)
+        matches = []
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(term):
+            matches.append(self.vocabulary[i])
+            i += 1
+        return matches
+
+    def _term_scores(self, term: str, tokens: List[str], n_docs: int,
+                     candidates: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """Mejor puntaje de cada documento para un término de la consulta.
+
+        Con `candidates` solo se evalúan esos documentos (recorriendo el lado más chico).
+        """
+        scored = []
+        for token in tokens:
+            posting = self.postings[token]
+            factor = 1.0 if token == term else PREFIX_FACTOR
+            scored.append((posting, math.log(1 + n_docs / len(posting)) * factor))
+        term_scores: Dict[str, float] = {}
+        for posting, boost in scored:
+            if candidates is not None and len(candidates) < len(posting):
+                items = ((d, posting[d]) for d in candidates if d in posting)
+            else:
+                items = posting.items()
+            for doc_id, weight in items:
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                score = weight * boost
+                if score > term_scores.get(doc_id, 0.0):
+                    term_scores[doc_id] = score
+        return term_scores
+
+    def search(self, query: str, limit: Optional[int] = 20) -> List[Tuple[str, float]]:
+        """Documentos que contienen todos los términos (exactos o por prefijo), ordenados por puntaje."""
+        terms = tokenize(query)
+        if not terms or not self.docs:
+            return []
+        n_docs = len(self.docs)
+        expanded = []
+        for term in dict.fromkeys(terms):
+            # Prefijos de un solo carácter solo coinciden exactamente
+            tokens = self._expand(term) if len(term) >= MIN_PREFIX_LENGTH else [t for t in [term] if t in self.postings]
+            if not tokens:
+                return []
+            expanded.append((sum(len(self.postings[t]) for t in tokens), term, tokens))
+        # Empezar por el término más selectivo para acotar los candidatos cuanto antes
+        expanded.sort()
+        scores: Optional[Dict[str, float]] = None
+        for _, term, tokens in expanded:
+            term_scores = self._term_scores(term, tokens, n_docs, scores)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {d: scores[d] + s for d, s in term_scores.items()}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if limit is None else ranked[:limit]
+
+    def save(self, path: Path):
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps({'format': INDEX_FORMAT, 'generation': self.generation, 'docs': self.docs}))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['SearchIndex']:
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text())
+        except ValueError:
+            return None
+        if data.get('format') != INDEX_FORMAT:
+            return None
+        index = cls()
+        for doc_id, terms in data['docs'].items():
+            index.docs[doc_id] = terms
+            for token, weight in terms.items():
+                index.postings.setdefault(token, {})[doc_id] = weight
+        index.vocabulary = sorted(index.postings)
+        index.generation = data.get('generation', 0)
+        return index
@@ -0,0 +1,368 @@
+"""
+Almacenamiento append-only del registro de modelos.
+
+`models.parquet` es el archivo base y cada escritura agrega un segmento pequeño
+(`segments/seg-<generación>.parquet`) en lugar de reescribir todo el registro.
+La lectura combina base + segmentos y una compactación en segundo plano los
+integra en la base. La base guarda en su metadata la última generación
+compactada, de modo que un segmento nunca se aplica dos veces.
+
+Varios procesos pueden compartir el directorio: las escrituras y la
+compactación toman un lock exclusivo (`.models.lock`) y las lecturas uno
+compartido. `models.manifest.json` guarda la última generación escrita; los
+lectores lo consultan (un `stat`) para saber si hay cambios de otro proceso.
+
+Cada compactación deja además `models.arrow`, una instantánea Arrow IPC sin
+comprimir que se abre con memory-map: arrancar cuesta abrir ese archivo y leer
+los pocos segmentos posteriores, no decodificar todo el Parquet.
+
+Con una política de retención (ver archive.py) la compactación además mueve
+las versiones viejas al archivo frío; como eso cambia las filas visibles, se
+publica una generación nueva y los lectores recargan el registro.
+"""
+
+import io
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..utils.file_lock import FileLock
+from ..utils.metrics import stage
+from .archive import RetentionPolicy, VersionArchive
+from .history import encode_history
+from .registry_schema import conform_table
+
+logger = logging.getLogger(__name__)
+
+GENERATION_KEY = b'segment_generation'
+SEGMENT_PREFIX = 'seg-'
+
+
+def _atomic_write(path: Path, data: Union[bytes, Callable]):
+    """Escribe `data` (bytes o una función que recibe el archivo) en un temporal,
+    hace fsync y lo renombra sobre `path`."""
+    # Nombre único por proceso/hilo: dos escritores nunca comparten el temporal
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp, 'wb') as fh:
+        if callable(data):
+            data(fh)
+        else:
+            fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def _with_generation(table: pa.Table, generation: Optional[int]) -> pa.Table:
+    if generation is None:
+        return table
+    metadata = dict(table.schema.metadata or {})
+    metadata[GENERATION_KEY] = str(generation).encode()
+    return table.replace_schema_metadata(metadata)
+
+
+def _to_parquet_bytes(df: Union[pd.DataFrame, pa.Table], generation: Optional[int] = None) -> bytes:
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    buf = io.BytesIO()
+    pq.write_table(_with_generation(table, generation), buf)
+    return buf.getvalue()
+
+
+def concat_tables(tables: List[pa.Table]) -> Optional[pa.Table]:
+    """Une base y segmentos en el esquema del registro (pueden venir con columnas o tipos distintos)."""
+    tables = [conform_table(t) for t in tables if t.num_rows]
+    if not tables:
+        return None
+    if len(tables) == 1:
+        return tables[0]
+    try:
+        return pa.concat_tables(tables, promote_options='permissive')
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        merged = pd.concat([t.to_pandas() for t in tables], ignore_index=True)
+        return conform_table(pa.Table.from_pandas(merged, preserve_index=False))
+
+
+class SegmentStore:
+    def __init__(self, data_dir: Path, compact_threshold: Optional[int] = None,
+                 checkpoint_every: Optional[int] = None, retention: Optional[RetentionPolicy] = None):
+        self.data_dir = Path(data_dir)
+        self.base_file = self.data_dir / 'models.parquet'
+        self.segments_dir = self.data_dir / 'segments'
+        if compact_threshold is None:
+            compact_threshold = int(os.getenv('MODEL_SEGMENT_COMPACT_THRESHOLD', '64'))
+        self.compact_threshold = compact_threshold
+        # Al compactar, las versiones superadas se guardan como deltas salvo cada N (ver history.py)
+        if checkpoint_every is None:
+            checkpoint_every = int(os.getenv('MODEL_CHECKPOINT_EVERY', '10'))
+        self.checkpoint_every = checkpoint_every
+        # Versiones que salen del registro caliente al compactar (por defecto ninguna)
+        self.retention = RetentionPolicy.from_env() if retention is None else retention
+        self.archive = VersionArchive(self.data_dir)
+        self.manifest_file = self.data_dir / 'models.manifest.json'
+        self.snapshot_file = self.data_dir / 'models.arrow'
+        self._file_lock = FileLock.for_path(self.data_dir / '.models.lock')
+        self._compact_lock = threading.Lock()
+        self._archiver: Optional[threading.Thread] = None
+        # (inode, mtime, tamaño) del manifest leído por última vez y su generación
+        self._manifest_stat = None
+        self._manifest_generation: Optional[int] = None
+
+    def lock(self, shared: bool = False):
+        """Lock entre procesos sobre el registro (reentrante dentro del hilo)."""
+        return self._file_lock.acquire(shared=shared)
+
+    @property
+    def generation(self) -> int:
+        """Última generación escrita por cualquier proceso."""
+        try:
+            st = os.stat(self.manifest_file)
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            # Sin manifest nadie escribió con este formato: la generación sale de los archivos
+            key = None
+        if key != self._manifest_stat or self._manifest_generation is None:
+            try:
+                generation = int(json.loads(self.manifest_file.read_text())['generation']) if key else None
+            except (OSError, ValueError, KeyError):
+                generation = None
+            if generation is None:
+                generation = self._scan_generation()
+            self._manifest_stat, self._manifest_generation = key, generation
+        return self._manifest_generation
+
+    def modified_at(self) -> Optional[datetime]:
+        """Momento de la última escritura (mtime del manifest o, sin manifest, de la base)."""
+        for path in (self.manifest_file, self.base_file):
+            try:
+                return datetime.fromtimestamp(os.stat(path).st_mtime, tz=timezone.utc)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _scan_generation(self) -> int:
+        """Generación deducida de los archivos (directorios sin manifest)."""
+        with self.lock(shared=True):
+            return max([self.base_generation()] + [g for g, _ in self._list_segments()])
+
+    def _write_manifest(self, generation: int):
+        _atomic_write(self.manifest_file, json.dumps({'generation': generation}).encode())
+
+    def _segment_path(self, generation: int) -> Path:
+        return self.segments_dir / f'{SEGMENT_PREFIX}{generation:012d}.parquet'
+
+    def _list_segments(self) -> List[Tuple[int, Path]]:
+        if not self.segments_dir.exists():
+            return []
+        segments = []
+        for path in self.segments_dir.glob(f'{SEGMENT_PREFIX}*.parquet'):
+            try:
+                segments.append((int(path.stem[len(SEGMENT_PREFIX):]), path))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def exists(self) -> bool:
+        return self.base_file.exists()
+
+    def archived_table(self) -> Optional[pa.Table]:
+        """Versiones movidas al archivo frío (None si no hay)."""
+        return self.archive.scan_table()
+
+    def base_generation(self) -> int:
+        """Última generación incorporada al archivo base (0 si no tiene metadata)."""
+        if not self.base_file.exists():
+            return 0
+        metadata = pq.read_schema(self.base_file).metadata or {}
+        return int(metadata.get(GENERATION_KEY, b'0'))
+
+    def _pending_segments(self, after: int, upto: Optional[int] = None) -> List[Tuple[int, Path]]:
+        return [(g, p) for g, p in self._list_segments() if g > after and (upto is None or g <= upto)]
+
+    def segment_count(self) -> int:
+        return len(self._pending_segments(self.base_generation()))
+
+    def load(self, upto: Optional[int] = None) -> pd.DataFrame:
+        """Devuelve el registro completo: base + segmentos aún no compactados.
+
+        Con `upto` se ignoran los segmentos posteriores a esa generación.
+        """
+        with self.lock(shared=True):
+            base_gen = self.base_generation()
+            frames = []
+            if self.base_file.exists():
+                frames.append(pd.read_parquet(self.base_file))
+            frames.extend(pd.read_parquet(p) for _, p in self._pending_segments(base_gen, upto))
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def load_table(self, upto: Optional[int] = None) -> Optional[pa.Table]:
+        """Como `load`, pero devuelve una tabla Arrow (None si el registro está vacío)."""
+        with self.lock(shared=True):
+            base_gen = self.base_generation()
+            tables = []
+            if self.base_file.exists():
+                tables.append(pq.read_table(self.base_file))
+            tables.extend(pq.read_table(p) for _, p in self._pending_segments(base_gen, upto))
+        return concat_tables(tables)
+
+    def scan_table(self, upto: Optional[int] = None) -> Optional[pa.Table]:
+        """Como `load_table`, pero parte de la instantánea con memory-map cuando está al día.
+
+        Pensada para recorrer el registro por lotes (exports): las columnas de la
+        instantánea no se copian a memoria, solo se leen los segmentos posteriores.
+        """
+        with self.lock(shared=True):
+            snapshot, snapshot_gen = self.open_snapshot()
+            if snapshot is None or snapshot_gen < self.base_generation() or (upto is not None and snapshot_gen > upto):
+                return self.load_table(upto)
+            tables = [snapshot]
+            tables.extend(pq.read_table(p) for _, p in self._pending_segments(snapshot_gen, upto))
+        return concat_tables(tables)
+
+    def open_snapshot(self) -> Tuple[Optional[pa.Table], int]:
+        """Abre la instantánea con memory-map (sin copiar datos). Devuelve (tabla, generación)."""
+        if not self.snapshot_file.exists():
+            return None, 0
+        try:
+            table = pa.ipc.open_file(pa.memory_map(str(self.snapshot_file))).read_all()
+            generation = int(table.schema.metadata[GENERATION_KEY])
+        except (OSError, pa.ArrowInvalid, KeyError, TypeError, ValueError):
+            return None, 0
+        # Las columnas que ya tienen el tipo del esquema no se copian
+        return conform_table(table), generation
+
+    def write_snapshot(self, table: pa.Table, generation: int):
+        # El formato IPC admite un solo diccionario por columna
+        table = _with_generation(table.unify_dictionaries().combine_chunks(), generation)
+
+        def write(fh):
+            with pa.ipc.new_file(fh, table.schema) as writer:
+                writer.write_table(table)
+
+        # Los lectores que ya mapearon la instantánea anterior conservan su inode
+        _atomic_write(self.snapshot_file, write)
+
+    def read_since(self, generation: int, upto: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """Filas escritas después de `generation` (y hasta `upto`, si se indica).
+
+        Devuelve None si esas filas ya fueron compactadas en la base y no se
+        pueden distinguir del resto (el llamador debe hacer una lectura completa).
+        """
+        with self.lock(shared=True):
+            if generation >= self.generation:
+                return pd.DataFrame()
+            if self.base_generation() > generation:
+                return None
+            frames = [pd.read_parquet(p) for _, p in self._pending_segments(generation, upto)]
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def append(self, rows: pd.DataFrame) -> int:
+        """Persiste `rows` como un segmento nuevo y devuelve su generación."""
+        with self.lock():
+            generation = self.generation + 1
+            if not self.base_file.exists() and not self._list_segments():
+                # Registro vacío: la primera escritura es directamente la base
+                _atomic_write(self.base_file, _to_parquet_bytes(rows, generation))
+            else:
+                self.segments_dir.mkdir(parents=True, exist_ok=True)
+                _atomic_write(self._segment_path(generation), _to_parquet_bytes(rows))
+            # El manifest se publica al final: quien lo ve ya encuentra el segmento
+            self._write_manifest(generation)
+        if self.compact_threshold and self.segment_count() >= self.compact_threshold:
+            self.compact_in_background()
+        return generation
+
+    def write_base(self, df: pd.DataFrame) -> int:
+        """Reescribe la base completa (modo `rewrite`) y descarta los segmentos."""
+        with self.lock():
+            generation = self.generation + 1
+            _atomic_write(self.base_file, _to_parquet_bytes(df, generation))
+            for _, path in self._list_segments():
+                path.unlink(missing_ok=True)
+            self._write_manifest(generation)
+        return generation
+
+    def compact(self, force: bool = False) -> bool:
+        """Integra los segmentos pendientes en la base. Devuelve True si hubo cambios.
+
+        Con `force` también se compacta sin segmentos nuevos si hay versiones para archivar.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return False
+        try:
+            with self.lock(), stage('compaction'):
+                return self._compact_locked(force)
+        finally:
+            self._compact_lock.release()
+
+    def _compact_locked(self, force: bool = False) -> bool:
+        base_gen = self.base_generation()
+        segments = self._pending_segments(base_gen)
+        if not segments and not (force and self.retention.enabled and self.base_file.exists()):
+            return False
+        upto = segments[-1][0] if segments else base_gen
+        tables = []
+        if self.base_file.exists():
+            tables.append(pq.read_table(self.base_file))
+        tables.extend(pq.read_table(p) for _, p in segments)
+        merged = concat_tables(tables)
+        if merged is not None and self.retention.enabled:
+            merged, cold = self.retention.split(merged)
+            if cold is not None:
+                # Las filas archivadas dejan de estar en la base: es una generación nueva
+                upto = self.generation + 1
+                self.archive.write(cold, upto)
+                # El manifest va antes que la base: si el proceso cae en medio,
+                # la próxima escritura no puede quedar con una generación ya compactada
+                self._write_manifest(upto)
+                logger.info("Archivadas %d versiones (generación %d)", cold.num_rows, upto)
+            elif not segments:
+                return False
+        merged = encode_history(merged, self.checkpoint_every)
+        if merged is None:
+            merged = pa.Table.from_pandas(pd.DataFrame())
+        # La base se reemplaza de forma atómica antes de borrar segmentos:
+        # si el proceso cae en medio, la metadata evita aplicarlos dos veces.
+        _atomic_write(self.base_file, _to_parquet_bytes(merged, upto))
+        self.write_snapshot(merged, upto)
+        for _, path in segments:
+            path.unlink(missing_ok=True)
+        return True
+
+    def compact_in_background(self):
+        threading.Thread(target=self.compact, name='segment-compaction', daemon=True).start()
+
+    def schedule_archiving(self, interval: Optional[float] = None):
+        """Compacta cada `interval` segundos (`MODEL_ARCHIVE_INTERVAL_SECONDS`) para archivar
+        las versiones que envejecen aunque no haya escrituras. No hace nada sin política de retención."""
+        if interval is None:
+            interval = float(os.getenv('MODEL_ARCHIVE_INTERVAL_SECONDS', '3600'))
+        if not self.retention.enabled or interval <= 0 or self._archiver is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact(force=True)
+                except Exception as e:
+                    logger.warning("Fallo al archivar versiones: %s", e)
+
+        self._archiver = threading.Thread(target=run, name='version-archiver', daemon=True)
+        self._archiver.start()
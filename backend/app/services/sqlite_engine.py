@@ -0,0 +1,446 @@
+"""
+Motor SQLite: el registro en una base embebida (`models.sqlite3`) en modo WAL.
+
+Cada versión es una fila de `model_versions` y `is_latest` marca la última
+de cada id; los índices parciales sobre las últimas versiones resuelven
+listados, filtros y conteos sin recorrer el historial. Una escritura son
+inserts (más el cambio de `is_latest` de la versión anterior) dentro de una
+transacción `BEGIN IMMEDIATE`, que serializa a los escritores de todos los
+procesos; en WAL los lectores no se bloquean mientras tanto.
+
+La generación vive en la tabla `meta` y cada fila guarda la generación en que
+se escribió, así que las escrituras de otros procesos se detectan con una
+consulta y se identifican por id. Las fechas se guardan como texto ISO en UTC
+con microsegundos fijos: el orden del texto es el orden temporal.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from ..models.query_schema import Predicate
+from .content_hash import HASH_COLUMN, content_hash
+from .history import CHANGED_COLUMN, HistoryResolver
+from .query import DATETIME_FIELDS, INDEXED_FIELDS, RANGE_FIELDS
+from .registry_schema import REGISTRY_SCHEMA, conform_table
+from .segment_store import SegmentStore, concat_tables
+from .storage_engine import LatestEntry, StorageEngine, clean_value
+from ..utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+DB_FILE = 'models.sqlite3'
+COLUMNS = tuple(n for n in REGISTRY_SCHEMA.names if n != CHANGED_COLUMN)
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+# Segundos que una conexión espera el lock de escritura de otro proceso
+BUSY_TIMEOUT = 30.0
+# Con más últimas versiones cambiadas por otros procesos se reconstruyen los agregados en lugar de aplicarlas
+MAX_NOTIFIED_ROWS = 2000
+# Límite de parámetros por consulta en listas IN
+IN_CHUNK = 500
+
+
+def _quote(name: str) -> str:
+    return f'"{name}"'
+
+
+SELECT_COLUMNS = ', '.join(_quote(c) for c in COLUMNS)
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS model_versions (
+    seq INTEGER PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    is_latest INTEGER NOT NULL,
+    {', '.join(f'{_quote(c)} INTEGER NOT NULL' if c == 'version' else f'{_quote(c)} TEXT' for c in COLUMNS)}
+);
+CREATE INDEX IF NOT EXISTS ix_versions_id ON model_versions(id, version);
+CREATE INDEX IF NOT EXISTS ix_versions_generation ON model_versions(generation);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_latest_id ON model_versions(id) WHERE is_latest = 1;
+CREATE INDEX IF NOT EXISTS ix_latest_seq ON model_versions(seq) WHERE is_latest = 1;
+{''.join(f'CREATE INDEX IF NOT EXISTS ix_latest_{f} ON model_versions({_quote(f)}) WHERE is_latest = 1;'
+         for f in INDEXED_FIELDS + RANGE_FIELDS)}
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+
+def _timestamp_text(value) -> str:
+    if not isinstance(value, datetime):
+        value = pd.Timestamp(value)
+    # Las fechas sin zona se interpretan como UTC (igual que en el esquema Arrow)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime(TIMESTAMP_FORMAT)
+
+
+def _encode(field: str, value):
+    if value is None or value is pd.NaT:
+        return None
+    if field in DATETIME_FIELDS:
+        return _timestamp_text(value)
+    if field == 'custom_properties':
+        return json.dumps([dict(p) for p in value], ensure_ascii=False)
+    if field == 'version':
+        return int(value)
+    if isinstance(value, str):
+        return value
+    value = clean_value(value)
+    return None if value is None else str(value)
+
+
+# Posiciones de COLUMNS cuyo texto también se normaliza
+_CONVERTED = frozenset(i for i, c in enumerate(COLUMNS) if c in DATETIME_FIELDS)
+
+
+def _encode_row(row: dict) -> list:
+    values = [row.get(c) for c in COLUMNS]
+    for i, value in enumerate(values):
+        if value is not None and (type(value) is not str or i in _CONVERTED):
+            values[i] = _encode(COLUMNS[i], value)
+    return values
+
+
+def _decode_row(columns: Sequence[str], values: Sequence) -> dict:
+    row = dict(zip(columns, values))
+    for field in DATETIME_FIELDS:
+        if row.get(field) is not None:
+            row[field] = datetime.fromisoformat(row[field]).replace(tzinfo=timezone.utc)
+    if row.get('custom_properties') is not None:
+        row['custom_properties'] = json.loads(row['custom_properties'])
+    return row
+
+
+def _frame(records: List[tuple], columns: Sequence[str]) -> pd.DataFrame:
+    """DataFrame indexado por `seq` con los mismos tipos que el motor Parquet (fechas UTC, listas)."""
+    frame = pd.DataFrame.from_records(records, columns=['seq', *columns], index='seq')
+    frame.index.name = None
+    for field in columns:
+        if field in DATETIME_FIELDS:
+            frame[field] = pd.to_datetime(frame[field], utc=True, format='ISO8601')
+        elif field == 'custom_properties':
+            frame[field] = [json.loads(v) if v is not None else None for v in frame[field]]
+    return frame
+
+
+def _predicate_sql(predicate: Predicate) -> Optional[Tuple[str, list]]:
+    """Condición SQL equivalente a `predicate_mask`; None si se evalúa en pandas."""
+    field, op = predicate.field, predicate.op
+    if field not in COLUMNS or field == 'custom_properties':
+        return None
+    values = predicate.value if isinstance(predicate.value, list) else [predicate.value]
+    if any(v is None for v in values):
+        return None
+    try:
+        if field in DATETIME_FIELDS:
+            values = [_timestamp_text(v) for v in values]
+        elif field == 'version':
+            values = [int(v) for v in values]
+        elif not all(isinstance(v, str) for v in values):
+            return None
+    except (TypeError, ValueError):
+        return None
+    column = _quote(field)
+    if op == 'in':
+        return f"{column} IN ({', '.join('?' * len(values))})", values
+    if op == 'between':
+        return f'{column} BETWEEN ? AND ?', values
+    sql_op = {'eq': '=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}[op]
+    return f'{column} {sql_op} ?', values
+
+
+class SqliteEngine(StorageEngine):
+    name = 'sqlite'
+
+    def __init__(self, data_dir: Path):
+        super().__init__(data_dir)
+        self.db_file = self.data_dir / DB_FILE
+        # Una conexión por hilo; `depth` cuenta los write_lock anidados del hilo
+        self._local = threading.local()
+        self._write_mutex = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._schema_ready = False
+        # Generación ya notificada al listener (None: todavía no se leyó la base)
+        self._generation: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_file, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL solo sincroniza en los checkpoints; un corte de luz puede perder la última transacción
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn, self._local.depth = conn, 0
+        if not self._schema_ready:
+            conn.executescript(SCHEMA)
+            self._import_parquet(conn)
+            self._schema_ready = True
+        return conn
+
+    def _import_parquet(self, conn: sqlite3.Connection):
+        """Primera apertura junto a un registro Parquet: se copian sus versiones (deltas reconstruidos)."""
+        store = SegmentStore(self.data_dir)
+        if not store.exists():
+            return
+        with self.write_lock():
+            if self._stored_generation(conn) or conn.execute('SELECT 1 FROM model_versions LIMIT 1').fetchone():
+                return
+            # Las versiones del archivo frío (ver archive.py) también pasan a la base
+            table = concat_tables([t for t in (store.archived_table(), store.load_table()) if t is not None])
+            if table is None or table.num_rows == 0:
+                return
+            logger.info("Importando %d versiones desde %s", table.num_rows, store.base_file)
+            rows = HistoryResolver(table).take(np.arange(table.num_rows)).to_pylist()
+            for row in rows:
+                if not row.get(HASH_COLUMN):
+                    row[HASH_COLUMN] = content_hash(row)
+            self.append(rows)
+
+    @staticmethod
+    def _stored_generation(conn: sqlite3.Connection) -> int:
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0])
+
+    def _catch_up(self, conn: sqlite3.Connection) -> bool:
+        """Avisa al listener las últimas versiones escritas desde la generación conocida."""
+        with self._state_lock:
+            generation = self._stored_generation(conn)
+            known = self._generation
+            if generation == known:
+                return False
+            self._generation = generation
+            if known is None:
+                return True
+            if generation < known:
+                # La base se reemplazó: no se puede saber qué cambió
+                self.listener.on_reset()
+                return True
+            where = 'is_latest = 1 AND generation > ?'
+            if conn.execute(f'SELECT COUNT(*) FROM model_versions WHERE {where}', (known,)).fetchone()[0] \
+                    > MAX_NOTIFIED_ROWS:
+                self.listener.on_reset()
+                return True
+            records = conn.execute(f'SELECT {SELECT_COLUMNS} FROM model_versions WHERE {where} ORDER BY seq',
+                                   (known,)).fetchall()
+            for values in records:
+                row = _decode_row(COLUMNS, values)
+                self.listener.on_latest_changed(row, lambda model_id=row['id']: self._version_at(conn, model_id, known))
+            return True
+
+    def _version_at(self, conn: sqlite3.Connection, model_id: str, generation: int) -> Optional[dict]:
+        """Última versión de `model_id` según lo escrito hasta `generation`."""
+        values = conn.execute(f'SELECT {SELECT_COLUMNS} FROM model_versions WHERE id = ? AND generation <= ? '
+                              'ORDER BY version DESC, seq DESC LIMIT 1', (model_id, generation)).fetchone()
+        return _decode_row(COLUMNS, values) if values is not None else None
+
+    @property
+    def generation(self) -> int:
+        if self._generation is None:
+            self.refresh()
+        return self._generation
+
+    def modified_at(self) -> Optional[datetime]:
+        value = self._connection().execute("SELECT value FROM meta WHERE key = 'modified_at'").fetchone()
+        return datetime.fromisoformat(value[0]) if value else None
+
+    def has_changes(self) -> bool:
+        return self._generation is None or self._stored_generation(self._connection()) != self._generation
+
+    def refresh(self) -> bool:
+        """Sin cambios el costo es una consulta a `meta`."""
+        return self._catch_up(self._connection())
+
+    @contextmanager
+    def write_lock(self):
+        conn = self._connection()
+        local = self._local
+        if local.depth:
+            local.depth += 1
+            try:
+                yield
+            finally:
+                local.depth -= 1
+            return
+        with self._write_mutex:
+            conn.execute('BEGIN IMMEDIATE')
+            local.depth = 1
+            try:
+                self._catch_up(conn)
+                yield
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                local.depth = 0
+        # Las filas propias se notifican igual que las de otros procesos, ya confirmadas
+        self._catch_up(conn)
+
+    def latest_entry(self, model_id: str) -> Optional[LatestEntry]:
+        values = self._connection().execute(
+            'SELECT version, content_hash FROM model_versions WHERE id = ? AND is_latest = 1', (model_id,)).fetchone()
+        return LatestEntry(*values) if values is not None else None
+
+    def append(self, rows: List[dict]) -> int:
+        with self.write_lock():
+            conn = self._connection()
+            generation = self._stored_generation(conn) + 1
+            ids = list(dict.fromkeys(row['id'] for row in rows))
+            latest: Dict[str, int] = {}
+            for start in range(0, len(ids), IN_CHUNK):
+                chunk = ids[start:start + IN_CHUNK]
+                latest.update(conn.execute(
+                    f"SELECT id, version FROM model_versions WHERE is_latest = 1 AND id IN ({', '.join('?' * len(chunk))})",
+                    chunk).fetchall())
+            # Ante versiones repetidas gana la fila escrita más tarde (igual que en el motor Parquet)
+            winner: Dict[str, int] = {}
+            for i, row in enumerate(rows):
+                version = int(row['version'])
+                if version >= latest.get(row['id'], version):
+                    latest[row['id']] = version
+                    winner[row['id']] = i
+            with stage('sqlite_write'):
+                conn.executemany('UPDATE model_versions SET is_latest = 0 WHERE id = ? AND is_latest = 1',
+                                 [(model_id,) for model_id in winner])
+                conn.executemany(
+                    f"INSERT INTO model_versions (generation, is_latest, {SELECT_COLUMNS}) "
+                    f"VALUES ({', '.join('?' * (len(COLUMNS) + 2))})",
+                    [(generation, int(winner.get(row['id']) == i), *_encode_row(row))
+                     for i, row in enumerate(rows)])
+                conn.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                 [('generation', generation),
+                                  ('modified_at', datetime.now(timezone.utc).isoformat())])
+        return generation
+
+    def _select(self, where: str = '', params: Sequence = (), fields: Optional[List[str]] = None,
+                suffix: str = 'ORDER BY seq') -> pd.DataFrame:
+        columns = COLUMNS if fields is None else [f for f in fields if f in COLUMNS]
+        select = ', '.join(['seq', *(_quote(c) for c in columns)])
+        sql = f"SELECT {select} FROM model_versions {'WHERE ' + where if where else ''} {suffix}"
+        return _frame(self._connection().execute(sql, list(params)).fetchall(), columns)
+
+    def get(self, model_id: str, version: Optional[int] = None) -> Optional[dict]:
+        if version is None:
+            sql, params = 'id = ? AND is_latest = 1', (model_id,)
+        else:
+            sql, params = 'id = ? AND version = ? ORDER BY seq DESC LIMIT 1', (model_id, int(version))
+        values = self._connection().execute(f'SELECT {SELECT_COLUMNS} FROM model_versions WHERE {sql}',
+                                            params).fetchone()
+        return _decode_row(COLUMNS, values) if values is not None else None
+
+    def versions(self, model_id: str) -> List[int]:
+        return [v for (v,) in self._connection().execute(
+            'SELECT DISTINCT version FROM model_versions WHERE id = ? ORDER BY version', (model_id,))]
+
+    def count(self, latest_only: bool = True) -> int:
+        where = ' WHERE is_latest = 1' if latest_only else ''
+        return self._connection().execute(f'SELECT COUNT(*) FROM model_versions{where}').fetchone()[0]
+
+    def rows(self, latest_only: bool = True, offset: int = 0, limit: Optional[int] = None,
+             after: Optional[int] = None, fields: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[int]]:
+        # La clave de cada fila es su `seq` (orden de escritura)
+        clauses = (['is_latest = 1'] if latest_only else []) + ['seq > ?']
+        frame = self._select(' AND '.join(clauses), [after if after is not None else 0], fields,
+                             f'ORDER BY seq LIMIT {-1 if limit is None else int(limit)} OFFSET {int(offset)}')
+        return frame, frame.index.tolist()
+
+    def latest_rows(self, ids: Optional[Sequence[str]] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        if ids is None:
+            return self._select('is_latest = 1', fields=fields)
+        ids = list(ids)
+        columns = fields if fields is None or 'id' in fields else [*fields, 'id']
+        parts = [self._select(f"is_latest = 1 AND id IN ({', '.join('?' * len(chunk))})", chunk, columns)
+                 for chunk in (ids[start:start + IN_CHUNK] for start in range(0, len(ids), IN_CHUNK))]
+        frame = pd.concat(parts) if len(parts) > 1 else (parts[0] if parts else self._select('0', fields=columns))
+        # Mismo orden que `ids`
+        order = {model_id: i for i, model_id in enumerate(ids)}
+        frame = frame.iloc[np.argsort([order[i] for i in frame['id']], kind='stable')]
+        return frame if columns is fields else frame.drop(columns=['id'])
+
+    def scan(self, filters: List[Predicate], latest_only: bool = True) -> Tuple[pd.DataFrame, List[Predicate]]:
+        """Los predicados sobre columnas escalares se resuelven en SQL (con los índices parciales)."""
+        clauses, params, residual = (['is_latest = 1'] if latest_only else []), [], []
+        for predicate in filters:
+            condition = _predicate_sql(predicate)
+            if condition is None:
+                residual.append(predicate)
+            else:
+                clauses.append(condition[0])
+                params.extend(condition[1])
+        return self._select(' AND '.join(clauses), params), residual
+
+    def summary(self, fields: Sequence[str]) -> Dict[str, dict]:
+        conn = self._connection()
+        return {field: dict(conn.execute(
+            f'SELECT {_quote(field)}, COUNT(*) FROM model_versions WHERE is_latest = 1 AND {_quote(field)} IS NOT NULL '
+            f'GROUP BY {_quote(field)} ORDER BY COUNT(*) DESC, {_quote(field)}').fetchall()) for field in fields}
+
+    def changed_ids_since(self, generation: int) -> Optional[List[str]]:
+        current = self.generation
+        if generation > current:
+            return None
+        return [model_id for (model_id,) in self._connection().execute(
+            'SELECT DISTINCT id FROM model_versions WHERE generation > ? AND generation <= ?', (generation, current))]
+
+    # --- Origen de filas para los exports (misma interfaz que SegmentStore)
+
+    def exists(self) -> bool:
+        return self.db_file.exists()
+
+    def base_generation(self) -> int:
+        # No hay compactación: todas las filas conservan su generación
+        return 0
+
+    def archived_table(self) -> Optional[pa.Table]:
+        # Sin archivo frío: las versiones viejas quedan en la base, indexadas en disco
+        return None
+
+    def _rows_upto(self, after: int, upto: Optional[int]) -> pd.DataFrame:
+        upto = self._stored_generation(self._connection()) if upto is None else upto
+        return self._select('generation > ? AND generation <= ?', (after, upto))
+
+    def count_rows(self, upto: Optional[int] = None) -> int:
+        upto = self._stored_generation(self._connection()) if upto is None else upto
+        return self._connection().execute('SELECT COUNT(*) FROM model_versions WHERE generation <= ?',
+                                          (upto,)).fetchone()[0]
+
+    def scan_batches(self, upto: Optional[int] = None, latest_only: bool = False,
+                     batch_rows: int = 50000) -> Iterator[pa.Table]:
+        """Filas escritas hasta `upto`, por lotes de `batch_rows` leídos de un cursor (sin cargar el registro).
+
+        Con `latest_only`, la última versión de cada id a esa generación, ordenadas
+        por versión como `master_latest`. Un solo SELECT: en WAL ve la base de un momento.
+        """
+        conn = self._connection()
+        upto = self._stored_generation(conn) if upto is None else upto
+        select = ', '.join(['seq', *(_quote(c) for c in COLUMNS)])
+        if latest_only:
+            sql = (f'SELECT {select} FROM model_versions v WHERE generation <= ? AND NOT EXISTS ('
+                   'SELECT 1 FROM model_versions w WHERE w.id = v.id AND w.generation <= ? '
+                   'AND (w.version > v.version OR (w.version = v.version AND w.seq > v.seq))) '
+                   'ORDER BY version, seq')
+            params = (upto, upto)
+        else:
+            sql, params = f'SELECT {select} FROM model_versions WHERE generation <= ? ORDER BY seq', (upto,)
+        cursor = conn.execute(sql, params)
+        try:
+            while True:
+                records = cursor.fetchmany(batch_rows)
+                if not records:
+                    break
+                yield conform_table(pa.Table.from_pandas(_frame(records, COLUMNS), preserve_index=False))
+        finally:
+            cursor.close()
+
+    def read_since(self, generation: int, upto: Optional[int] = None) -> Optional[pd.DataFrame]:
+        if generation >= self._stored_generation(self._connection()):
+            return pd.DataFrame()
+        return self._rows_upto(generation, upto).reset_index(drop=True)
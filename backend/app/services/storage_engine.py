@@ -0,0 +1,184 @@
+"""
+Motores de almacenamiento del registro.
+
+`ModelService` resuelve el versionado, la deduplicación por hash y las
+respuestas; la persistencia queda detrás de `StorageEngine`: agregar
+versiones, leer por id/versión, listar las últimas versiones, escanear con
+filtros y contar por campo. Hay dos implementaciones, elegidas con
+`MODEL_STORAGE_ENGINE`:
+
+- `parquet` (por defecto): Parquet base + segmentos con el registro en
+  memoria (ver parquet_engine.py y segment_store.py).
+- `sqlite`: una base SQLite embebida en modo WAL con índices por id/versión
+  y por los campos filtrables (ver sqlite_engine.py). Las escrituras son
+  inserts y varios procesos leen en paralelo sin cargar el registro.
+
+Toda escritura incrementa la generación del motor (ETags, exports, índice de
+búsqueda). Cuando cambia la última versión de un modelo, propia o de otro
+proceso, el motor avisa a su `listener` para mantener los agregados en memoria.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from contextlib import AbstractContextManager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..models.query_schema import Predicate
+from .history import HISTORY_FIELDS, same_value
+
+STORAGE_ENGINES = ('parquet', 'sqlite')
+
+
+def clean_value(value):
+    """Valor de una celda con tipos de Python (None en lugar de NaN/NaT)."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class LatestEntry(NamedTuple):
+    version: int
+    content_hash: str
+
+
+class EngineListener:
+    """Recibe los cambios de últimas versiones; por defecto no hace nada."""
+
+    def on_latest_changed(self, row: dict, previous: Callable[[], Optional[dict]]):
+        """`row` es la nueva última versión; `previous()` devuelve la que reemplaza (None si es nueva)."""
+
+    def on_reset(self):
+        """El motor recargó el registro: lo derivado de las últimas versiones se debe reconstruir."""
+
+
+class StorageEngine(ABC):
+    name: str
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.listener = EngineListener()
+
+    # --- Estado
+
+    @property
+    @abstractmethod
+    def generation(self) -> int:
+        """Generación de los datos visibles (carga el registro si hace falta)."""
+
+    @abstractmethod
+    def modified_at(self) -> Optional[datetime]:
+        """Momento de la última escritura de cualquier proceso."""
+
+    @abstractmethod
+    def has_changes(self) -> bool:
+        """True si hay escrituras (o una carga pendiente) que `refresh` todavía no aplicó; no modifica nada."""
+
+    @abstractmethod
+    def refresh(self) -> bool:
+        """Incorpora las escrituras de otros procesos. Devuelve True si hubo cambios."""
+
+    @abstractmethod
+    def write_lock(self) -> AbstractContextManager:
+        """Lock de escritura entre procesos (reentrante); al tomarlo el motor queda al día."""
+
+    # --- Escritura
+
+    @abstractmethod
+    def latest_entry(self, model_id: str) -> Optional[LatestEntry]:
+        """Versión y hash de la última versión de `model_id` (None si no existe)."""
+
+    @abstractmethod
+    def append(self, rows: List[dict]) -> int:
+        """Agrega versiones (filas con `content_hash`) y devuelve la generación nueva."""
+
+    # --- Lectura
+
+    @abstractmethod
+    def get(self, model_id: str, version: Optional[int] = None) -> Optional[dict]:
+        """Fila completa de una versión (la última si `version` es None)."""
+
+    @abstractmethod
+    def versions(self, model_id: str) -> List[int]:
+        """Versiones guardadas de `model_id`, ordenadas."""
+
+    @abstractmethod
+    def count(self, latest_only: bool = True) -> int:
+        ...
+
+    @abstractmethod
+    def rows(self, latest_only: bool = True, offset: int = 0, limit: Optional[int] = None,
+             after: Optional[int] = None, fields: Optional[List[str]] = None) -> Tuple[pd.DataFrame, List[int]]:
+        """Filas en orden de escritura y la clave de cada una (para paginar con `after`)."""
+
+    @abstractmethod
+    def latest_rows(self, ids: Optional[Sequence[str]] = None, fields: Optional[List[str]] = None) -> pd.DataFrame:
+        """Últimas versiones de `ids` en ese orden (todas, en orden de escritura, si `ids` es None)."""
+
+    @abstractmethod
+    def scan(self, filters: List[Predicate], latest_only: bool = True) -> Tuple[pd.DataFrame, List[Predicate]]:
+        """Filas que cumplen los filtros que el motor resuelve y los predicados que quedan por evaluar."""
+
+    @abstractmethod
+    def summary(self, fields: Sequence[str]) -> Dict[str, dict]:
+        """Conteo de valores por campo sobre las últimas versiones."""
+
+    @abstractmethod
+    def changed_ids_since(self, generation: int) -> Optional[List[str]]:
+        """Ids escritos después de `generation`; None si ya no se pueden distinguir."""
+
+    def diff(self, model_id: str, from_version: Optional[int] = None,
+             to_version: Optional[int] = None) -> Optional[dict]:
+        """Campos que difieren entre dos versiones (por defecto, la última contra la anterior)."""
+        ordered = self.versions(model_id)
+        if not ordered:
+            return None
+        if to_version is None:
+            to_version = ordered[-1]
+        if from_version is None:
+            earlier = [v for v in ordered if v < to_version]
+            from_version = earlier[-1] if earlier else to_version
+        if from_version not in ordered or to_version not in ordered:
+            return None
+        before, after = self.get(model_id, from_version), self.get(model_id, to_version)
+        changes = {field: {'from': clean_value(before.get(field)), 'to': clean_value(after.get(field))}
+                   for field in HISTORY_FIELDS if not same_value(before.get(field), after.get(field))}
+        return {'id': model_id, 'from': from_version, 'to': to_version, 'changes': changes}
+
+
+def engine_name() -> str:
+    name = os.getenv('MODEL_STORAGE_ENGINE', 'parquet')
+    if name not in STORAGE_ENGINES:
+        raise ValueError(f"MODEL_STORAGE_ENGINE inválido: {name} (opciones: {', '.join(STORAGE_ENGINES)})")
+    return name
+
+
+def open_engine(data_dir: Path) -> StorageEngine:
+    """Motor configurado en `MODEL_STORAGE_ENGINE` sobre `data_dir`."""
+    if engine_name() == 'sqlite':
+        from .sqlite_engine import SqliteEngine
+        return SqliteEngine(data_dir)
+    from .parquet_engine import ParquetEngine
+    return ParquetEngine(data_dir)
+
+
+def registry_source(data_dir: Path):
+    """Origen de las filas para los exports: `SegmentStore` o el motor SQLite.
+
+    Ambos exponen `exists`, `generation`, `base_generation`, `read_since` y
+    `archived_table`. SegmentStore da el registro completo con `scan_table`
+    (instantánea con memory-map) y SQLite por lotes con `scan_batches` (cursor).
+    """
+    if engine_name() == 'sqlite':
+        from .sqlite_engine import SqliteEngine
+        return SqliteEngine(data_dir)
+    from .segment_store import SegmentStore
+    return SegmentStore(data_dir)
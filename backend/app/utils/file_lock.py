@@ -0,0 +1,75 @@
+"""
+Lock de archivo advisory para coordinar varios procesos (workers de uvicorn)
+que comparten el mismo directorio de datos.
+
+Dentro de un proceso el lock es reentrante por hilo; entre procesos se usa
+`flock` (compartido para lecturas, exclusivo para escrituras). En plataformas
+sin `fcntl` solo queda la exclusión entre hilos del mismo proceso.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+_registry: Dict[str, 'FileLock'] = {}
+_registry_lock = threading.Lock()
+
+
+class FileLock:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    @classmethod
+    def for_path(cls, path: Path) -> 'FileLock':
+        """Instancia única por archivo dentro del proceso (comparte el lock entre hilos)."""
+        key = os.path.abspath(path)
+        with _registry_lock:
+            lock = _registry.get(key)
+            if lock is None:
+                lock = _registry[key] = cls(Path(key))
+            return lock
+
+    @contextmanager
+    def acquire(self, shared: bool = False):
+        """Toma el lock. `shared` solo aplica al nivel más externo del hilo que lo toma."""
+        with self._thread_lock:
+            if self._depth == 0:
+                self._lock_file(shared)
+            self._depth += 1
+            try:
+                yield self
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._unlock_file()
+
+    def _lock_file(self, shared: bool):
+        if fcntl is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _unlock_file(self):
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,93 @@
+"""
+Caché HTTP por generación del registro.
+
+La generación (ver `SegmentStore.generation`) aumenta con cada escritura de
+cualquier worker, así que identifica por completo el estado de los datos: las
+lecturas exponen un `ETag` derivado de ella y responden 304 a `If-None-Match`
+sin recalcular nada, y las respuestas serializadas se guardan en memoria hasta
+que la generación cambia.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import format_datetime
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+
+class ResponseCache:
+    """Cuerpos JSON ya serializados por clave, válidos solo para la generación con que se guardaron (LRU)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[int, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, generation: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, generation: int, body: bytes):
+        with self._lock:
+            self._entries[key] = (generation, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _request_key(request: Request) -> str:
+    query = '&'.join(sorted(f'{k}={v}' for k, v in request.query_params.multi_items()))
+    return f'{request.url.path}?{query}'
+
+
+def make_etag(generation: int, key: str) -> str:
+    # La generación identifica los datos; el hash de la URL distingue representaciones (parámetros)
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4).hexdigest()
+    return f'"g{generation}-{digest}"'
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(',')]
+    # Las comparaciones de If-None-Match son débiles: W/"x" equivale a "x"
+    return '*' in candidates or any(c.removeprefix('W/') == etag for c in candidates)
+
+
+def cached_json(request: Request, cache: ResponseCache, generation: int,
+                modified_at: Optional[datetime], build: Callable[[], Any]) -> Response:
+    """Respuesta JSON de `build()` (objeto o bytes) con ETag/Last-Modified; 304 si el cliente ya tiene esta generación."""
+    key = _request_key(request)
+    etag = make_etag(generation, key)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if modified_at is not None:
+        headers['Last-Modified'] = format_datetime(modified_at, usegmt=True)
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    body = cache.get(key, generation)
+    if body is None:
+        result = build()
+        # `build` puede devolver el JSON ya serializado
+        body = result if isinstance(result, bytes) else \
+            json.dumps(jsonable_encoder(result), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cache.put(key, generation, body)
+    return Response(body, media_type='application/json', headers=headers)
@@ -0,0 +1,92 @@
+"""
+Descarga de archivos con soporte de rangos HTTP.
+
+Se admite un único rango por request (`bytes=a-b`, `bytes=a-`, `bytes=-n`);
+con varios rangos se responde el archivo completo, que también es válido. El
+archivo se envía por bloques de `CHUNK_SIZE` sin cargarlo en memoria, y
+`If-Range` evita mezclar partes de dos versiones del mismo export.
+"""
+
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from .http_cache import _etag_matches
+
+CHUNK_SIZE = 1 << 20
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(inicio, fin inclusive) del rango pedido; None si no hay rango utilizable.
+
+    Lanza ValueError si el rango es válido pero no se puede satisfacer (416).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header or size == 0:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    if not (first or last) or any(part and not part.isdigit() for part in (first, last)):
+        # Sintaxis inválida: se ignora el encabezado
+        return None
+    if not first:
+        # Sufijo: los últimos `last` bytes
+        if int(last) == 0:
+            raise ValueError('Rango vacío')
+        return max(size - int(last), 0), size - 1
+    start, end = int(first), int(last) if last else size - 1
+    if start > end and last:
+        return None
+    if start >= size:
+        raise ValueError('Rango fuera del archivo')
+    return start, min(end, size - 1)
+
+
+def _read_chunks(fh: BinaryIO, start: int, length: int) -> Iterator[bytes]:
+    try:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def file_response(request: Request, fh: BinaryIO, media_type: str, filename: str, tag: str) -> Response:
+    """Respuesta 200/206/304/416 para el archivo abierto `fh`; `tag` identifica su contenido (ETag)."""
+    st = os.fstat(fh.fileno())
+    size = st.st_size
+    etag = f'"{tag}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': format_datetime(datetime.fromtimestamp(st.st_mtime, tz=timezone.utc), usegmt=True),
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{filename}"',
+    }
+    if _etag_matches(request.headers.get('if-none-match'), etag):
+        fh.close()
+        return Response(status_code=304, headers=headers)
+
+    span = None
+    if_range = request.headers.get('if-range')
+    if if_range is None or if_range.strip() == etag:
+        try:
+            span = parse_range(request.headers.get('range'), size)
+        except ValueError:
+            fh.close()
+            return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    status, start, end = 200, 0, size - 1
+    if span is not None:
+        status, (start, end) = 206, span
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    # Si el cliente corta la descarga el generador no termina: el archivo se cierra igual al final
+    return StreamingResponse(_read_chunks(fh, start, end - start + 1), status_code=status, media_type=media_type,
+                             headers=headers, background=BackgroundTask(fh.close))
@@ -1,12 +1,95 @@
 
-from typing import Any, Dict
-
-def flatten(d: Dict[str, Any], parent_key: str = '', sep: str = '.') -> Dict[str, Any]:
-    items = []
-    for k, v in (d or {}).items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten(v, new_key, sep=sep).items())
+from typing import Any, Dict, Iterable, List, Optional
+import json
+
+import numpy as np
+import pyarrow as pa
+
+# Reglas para las listas (p. ej. custom_properties):
+#  - keep:  se conserva la lista tal cual en una sola columna
+#  - json:  se serializa como texto JSON
+#  - index: se expande por posición (clave.0.campo, clave.1.campo, ...)
+#  - named: listas de {"name", "value"} se expanden como clave.<name> = value
+LIST_KEEP, LIST_JSON, LIST_INDEX, LIST_NAMED = 'keep', 'json', 'index', 'named'
+LIST_MODES = (LIST_KEEP, LIST_JSON, LIST_INDEX, LIST_NAMED)
+
+
+def _is_list(v: Any) -> bool:
+    return isinstance(v, (list, tuple, np.ndarray))
+
+
+def _is_named_list(v) -> bool:
+    return len(v) > 0 and all(isinstance(item, dict) and 'name' in item for item in v)
+
+
+def flatten(d: Dict[str, Any], parent_key: str = '', sep: str = '.', list_mode: str = LIST_KEEP) -> Dict[str, Any]:
+    """Aplana `d` en un solo nivel (`a.b.c`) de forma iterativa, sin dicts intermedios."""
+    out: Dict[str, Any] = {}
+    stack = [(parent_key, iter((d or {}).items()))]
+    while stack:
+        prefix, items = stack[-1]
+        for k, v in items:
+            new_key = f"{prefix}{sep}{k}" if prefix else k
+            if isinstance(v, dict):
+                stack.append((new_key, iter(v.items())))
+                break
+            if list_mode != LIST_KEEP and _is_list(v):
+                if list_mode == LIST_JSON:
+                    out[new_key] = json.dumps(list(v), default=str, ensure_ascii=False)
+                elif list_mode == LIST_NAMED and _is_named_list(v):
+                    for item in v:
+                        out[f"{new_key}{sep}{item['name']}"] = item.get('value')
+                elif list_mode == LIST_INDEX:
+                    stack.append((new_key, ((str(i), item) for i, item in enumerate(v))))
+                    break
+                else:
+                    out[new_key] = v
+                continue
+            out[new_key] = v
         else:
-            items.append((new_key, v))
-    return dict(items)
+            stack.pop()
+    return out
+
+
+def infer_schema(flat_records: Iterable[Dict[str, Any]]) -> List[str]:
+    """Unión ordenada (por primera aparición) de las claves de un lote ya aplanado."""
+    columns: Dict[str, None] = {}
+    for record in flat_records:
+        for key in record:
+            if key not in columns:
+                columns[key] = None
+    return list(columns)
+
+
+def flatten_records(records: List[Optional[Dict[str, Any]]], parent_key: str = '', sep: str = '.',
+                    list_mode: str = LIST_KEEP, columns: Optional[List[str]] = None) -> Dict[str, list]:
+    """Aplana un lote de dicts a columnas. El esquema se infiere una vez por lote
+    (o se reutiliza `columns`) y las filas sin un valor quedan en None."""
+    flat = [flatten(r, parent_key, sep, list_mode) if isinstance(r, dict) else None for r in records]
+    if columns is None:
+        columns = infer_schema(f for f in flat if f is not None)
+    return {c: [f.get(c) if f is not None else None for f in flat] for c in columns}
+
+
+def _flatten_arrow(records: List[Optional[Dict[str, Any]]], parent_key: str) -> Dict[str, list]:
+    table = pa.table({parent_key: pa.array(records)})
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    return {name: table.column(name).to_pylist() for name in table.column_names}
+
+
+def flatten_column(records: List[Optional[Dict[str, Any]]], parent_key: str, sep: str = '.',
+                   list_mode: str = LIST_KEEP) -> Dict[str, list]:
+    """Aplana una columna completa de dicts (None en las filas sin dict).
+
+    Si las listas se conservan y el separador es '.', se usa el aplanado de
+    structs de Arrow sobre toda la columna; si los tipos no son compatibles
+    con Arrow se vuelve al aplanado por lote en Python.
+    """
+    records = [r if isinstance(r, dict) else None for r in records]
+    if list_mode == LIST_KEEP and sep == '.':
+        try:
+            return _flatten_arrow(records, parent_key)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            pass
+    return flatten_records(records, parent_key, sep, list_mode)
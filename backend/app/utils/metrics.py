@@ -0,0 +1,128 @@
+"""
+Métricas en formato de exposición de Prometheus (texto 0.0.4), sin dependencias.
+
+`STAGE_SECONDS` acumula la duración de cada etapa del registro (validación,
+append en memoria, escritura de segmentos, rebuild de exports, compresión de
+descargas, insights, serialización) y `REQUEST_SECONDS` la de cada request HTTP por ruta. Cada
+proceso lleva sus propios contadores: con varios workers, cada uno expone los
+suyos en `/metrics`.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Segundos; cubren desde lecturas en memoria hasta rebuilds completos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # valores de labels -> (conteo por bucket, suma, total)
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *labels: str):
+        key = tuple(str(v) for v in labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(tuple(str(v) for v in labels))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for labels, (counts, total, n) in series:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = _format_labels(self.labelnames, labels, ('le', _format_value(bound)))
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{plain} {_format_value(total)}')
+            lines.append(f'{self.name}_count{plain} {n}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Histogram] = []
+
+    def register(self, metric: Histogram) -> Histogram:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self._metrics for line in metric.render()) + '\n'
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'registry_stage_duration_seconds', 'Duración de cada etapa del registro de modelos.', ('stage',)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Duración de los requests HTTP por ruta.', ('method', 'route', 'status')))
+
+
+def stage(name: str):
+    """Context manager que mide una etapa: `with stage('parquet_write'): ...`."""
+    return STAGE_SECONDS.time(name)
+
+
+def timed(name: str):
+    """Decorador equivalente a `stage` para una función completa."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_latest() -> str:
+    return REGISTRY.render()
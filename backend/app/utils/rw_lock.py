@@ -0,0 +1,68 @@
+"""
+Lock de lectores/escritor entre hilos de un proceso.
+
+Muchas lecturas pueden correr a la vez; una escritura espera a que terminen
+y corre sola. Los escritores tienen prioridad: cuando uno espera, las
+lecturas nuevas esperan detrás de él, así una ráfaga de lecturas no lo deja
+sin turno. El hilo que tiene la escritura puede volver a tomarla o tomar
+lecturas (reentrante); una lectura no se puede convertir en escritura.
+"""
+
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writers_waiting = 0
+        self._writer = None
+        self._writer_depth = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                # Lectura dentro de la escritura del mismo hilo
+                self._writer_depth += 1
+                owned = True
+            else:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+                self._readers += 1
+                owned = False
+        try:
+            yield
+        finally:
+            with self._cond:
+                if owned:
+                    self._writer_depth -= 1
+                else:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._cond.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer, self._writer_depth = me, 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._cond.notify_all()
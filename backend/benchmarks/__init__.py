@@ -0,0 +1 @@
+"""Benchmarks del registro de modelos (ver run_benchmarks.py)."""
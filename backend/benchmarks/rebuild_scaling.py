@@ -0,0 +1,77 @@
+"""
+Escalado de la reconstrucción completa de exports según la cantidad de procesos.
+
+Uso (desde `backend/`):
+    python benchmarks/rebuild_scaling.py [--size 500000] [--workers 1,2,4,8] [--repeat 2]
+        [--batch-rows 50000] [--output resultados.json]
+
+Arma un registro sintético de `--size` versiones y mide `rebuild_master` en
+modo completo con cada cantidad de procesos (1 = camino serial). Reporta el
+mejor tiempo de cada una y el speedup respecto de un proceso.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import master
+from benchmarks.run_benchmarks import _machine
+from benchmarks.synthetic import synthetic_table, write_registry
+
+
+def measure_scaling(size: int, workers: List[int], repeat: int = 2, seed: int = 0) -> Dict[int, dict]:
+    results = {}
+    # Con cualquier tamaño se usa el pool cuando hay más de un proceso
+    previous_min_rows, master.EXPORT_PARALLEL_MIN_ROWS = master.EXPORT_PARALLEL_MIN_ROWS, 0
+    try:
+        with tempfile.TemporaryDirectory(prefix=f'rebuild-scaling-{size}-') as tmp:
+            data_dir = Path(tmp)
+            write_registry(data_dir, synthetic_table(size, seed=seed))
+            for n in workers:
+                times = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    master.rebuild_master(data_dir, incremental=False, workers=n)
+                    times.append(time.perf_counter() - start)
+                results[n] = {'best_s': round(min(times), 3), 'mean_s': round(sum(times) / len(times), 3)}
+    finally:
+        master.EXPORT_PARALLEL_MIN_ROWS = previous_min_rows
+    serial = results.get(1, {}).get('best_s')
+    for n, stats in results.items():
+        stats['speedup'] = round(serial / stats['best_s'], 2) if serial else None
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Speedup de rebuild_master completo por cantidad de procesos.')
+    parser.add_argument('--size', type=int, default=500000, help='versiones del registro sintético')
+    parser.add_argument('--workers', default=','.join(str(n) for n in sorted({1, 2, 4, os.cpu_count() or 1})),
+                        help='cantidades de procesos separadas por coma')
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--batch-rows', type=int, default=master.EXPORT_BATCH_ROWS, help='filas por lote')
+    parser.add_argument('--output', type=Path, default=None, help='archivo JSON con los resultados')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    master.EXPORT_BATCH_ROWS = args.batch_rows
+    workers = [int(n) for n in args.workers.split(',') if n.strip()]
+    results = measure_scaling(args.size, workers, args.repeat, args.seed)
+    for n, stats in results.items():
+        print(f'{args.size:>9} versiones {n:>3} procesos  mejor={stats["best_s"]:>8.2f}s '
+              f'media={stats["mean_s"]:>8.2f}s  speedup={stats["speedup"]}x', flush=True)
+    if args.output:
+        report = {'machine': _machine(), 'size': args.size, 'batch_rows': args.batch_rows,
+                  'results': {str(n): stats for n, stats in results.items()}}
+        args.output.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
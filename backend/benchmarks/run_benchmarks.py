@@ -0,0 +1,250 @@
+"""
+Benchmarks del servicio y de la capa HTTP sobre registros sintéticos.
+
+Uso (desde `backend/`):
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000,100000,1000000] [--repeat 20]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.5] [--output resultados.json]
+        [--update-baseline] [--skip-http]
+
+Por cada tamaño se arma un registro sintético en un directorio temporal y se
+mide cada operación directamente sobre `ModelService`/`master` y a través de
+`TestClient`: latencia (p50/p95/p99), throughput y memoria pico de Python
+(tracemalloc, en una ejecución aparte para no afectar los tiempos). Los
+resultados se comparan con `baseline.json`; si el p50 o la memoria de alguna
+operación empeora más que `--tolerance`, el proceso termina con código 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+
+try:
+    import resource
+except ImportError:  # Windows: sin max RSS del proceso
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from app.services import master
+from app.services.model_service import ModelService
+from benchmarks.synthetic import sample_model, synthetic_table, write_registry
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+class Operation(NamedTuple):
+    name: str
+    layer: str  # 'service' | 'http'
+    run: Callable[[int], object]
+    # Operaciones que recorren todo el registro: se repiten menos veces
+    heavy: bool = False
+
+
+def measure(run: Callable[[int], object], repeat: int) -> dict:
+    """Ejecuta `run(i)` `repeat` veces y resume latencias; la memoria se mide en una ejecución extra."""
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run(i)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run(repeat)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    ms = np.asarray(times) * 1000
+    return {
+        'runs': repeat,
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'ops_per_s': round(repeat / float(sum(times)), 2),
+        'peak_python_mb': round(peak / 2 ** 20, 2),
+    }
+
+
+@contextmanager
+def _registry_dir(size: int, seed: int):
+    """Directorio temporal con un registro sintético de `size` versiones, apuntado por DATA_DIR y master."""
+    previous = os.environ.get('DATA_DIR'), master.DATA_DIR, master.MODELS_FILE, master.EXPORT_DIR
+    with tempfile.TemporaryDirectory(prefix=f'registry-bench-{size}-') as tmp:
+        data_dir = Path(tmp)
+        write_registry(data_dir, synthetic_table(size, seed=seed))
+        os.environ['DATA_DIR'] = str(data_dir)
+        # compute_insights lee las rutas del módulo
+        master.DATA_DIR, master.MODELS_FILE, master.EXPORT_DIR = data_dir, data_dir / 'models.parquet', data_dir / 'exports'
+        try:
+            yield data_dir
+        finally:
+            if previous[0] is None:
+                os.environ.pop('DATA_DIR', None)
+            else:
+                os.environ['DATA_DIR'] = previous[0]
+            master.DATA_DIR, master.MODELS_FILE, master.EXPORT_DIR = previous[1:]
+
+
+def _use_service(service: ModelService):
+    """Hace que los routers de la app usen `service`."""
+    from app.routers import dashboard, exports, models
+    for module in (models, dashboard, exports):
+        module.model_service = service
+
+
+def _model_ids(service: ModelService) -> List[str]:
+    return service.engine.latest_rows(fields=['id'])['id'].tolist()
+
+
+def service_operations(service: ModelService, data_dir: Path, size: int, seed: int) -> List[Operation]:
+    rng = np.random.default_rng(seed)
+    ids = _model_ids(service)
+    pick = lambda: ids[int(rng.integers(0, len(ids)))]
+    return [
+        Operation('cold_load', 'service', lambda i: ModelService().refresh(), heavy=True),
+        Operation('create_model', 'service', lambda i: service.create_model(sample_model(f'svc-new-{size}-{i}', seed=i))),
+        Operation('get_model', 'service', lambda i: service.get_model(pick())),
+        Operation('get_model_version', 'service', lambda i: service.get_model(pick(), version=1)),
+        Operation('get_all_models_page', 'service',
+                  lambda i: service.get_all_models(offset=int(rng.integers(0, len(ids))), limit=100)),
+        Operation('get_all_models', 'service', lambda i: service.get_all_models(), heavy=True),
+        Operation('get_all_models_json', 'service', lambda i: service.get_all_models_json(), heavy=True),
+        Operation('get_models_summary', 'service', lambda i: service.get_models_summary()),
+        Operation('get_insights', 'service', lambda i: service.get_insights()),
+        Operation('rebuild_master', 'service', lambda i: master.rebuild_master(data_dir, incremental=False), heavy=True),
+        # Lee exports/master_latest.parquet, que deja rebuild_master
+        Operation('compute_insights', 'service', lambda i: master.compute_insights(), heavy=True),
+    ]
+
+
+def http_operations(client, service: ModelService, size: int, seed: int) -> List[Operation]:
+    rng = np.random.default_rng(seed + 1)
+    ids = _model_ids(service)
+    pick = lambda: ids[int(rng.integers(0, len(ids)))]
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.request.method} {response.request.url}: {response.status_code}')
+        return response
+
+    def uncached(request, *args, **kwargs):
+        # Sin esto, desde la segunda repetición se mediría la respuesta guardada de la generación
+        service.response_cache.clear()
+        return request(*args, **kwargs)
+
+    def post_model(i):
+        body = sample_model(f'http-new-{size}-{i}', seed=i).model_dump(mode='json')
+        return check(client.post('/models', json=body))
+
+    return [
+        Operation('POST /models', 'http', post_model),
+        Operation('GET /models/{id}', 'http', lambda i: check(client.get(f'/models/{pick()}'))),
+        Operation('GET /models/?limit=100', 'http',
+                  lambda i: check(client.get('/models/', params={'offset': int(rng.integers(0, len(ids))), 'limit': 100}))),
+        Operation('GET /models/', 'http', lambda i: check(uncached(client.get, '/models/')), heavy=True),
+        Operation('GET /models/summary/dashboard/', 'http', lambda i: check(client.get('/models/summary/dashboard/'))),
+        Operation('GET /dashboard/insights', 'http', lambda i: check(client.get('/dashboard/insights'))),
+        Operation('POST /exports/rebuild?wait=true', 'http',
+                  lambda i: check(client.post('/exports/rebuild', params={'wait': True, 'timeout': 3600})), heavy=True),
+    ]
+
+
+def run_size(size: int, repeat: int, heavy_repeat: int, http: bool, seed: int = 0) -> Dict[str, dict]:
+    results = {}
+    with _registry_dir(size, seed) as data_dir:
+        service = ModelService()
+        # Los exports solo se regeneran cuando un benchmark lo pide, no en segundo plano durante las mediciones
+        service.exports.debounce = service.exports.max_staleness = 3600.0
+        service.refresh()
+        operations = service_operations(service, data_dir, size, seed)
+        client = None
+        if http:
+            from fastapi.testclient import TestClient
+            from app.main import app
+            _use_service(service)
+            client = TestClient(app)
+            operations += http_operations(client, service, size, seed)
+        for op in operations:
+            stats = measure(op.run, heavy_repeat if op.heavy else repeat)
+            results[f'{size}:{op.layer}:{op.name}'] = stats
+            print(f'{size:>8} {op.layer:<8} {op.name:<32} p50={stats["p50_ms"]:>10.2f}ms '
+                  f'p95={stats["p95_ms"]:>10.2f}ms {stats["ops_per_s"]:>9.1f} op/s {stats["peak_python_mb"]:>8.1f} MB',
+                  flush=True)
+        if client is not None:
+            client.close()
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[dict]:
+    """Operaciones cuyo p50 o memoria pico superan la línea base en más de `tolerance` (fracción)."""
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        for metric, floor in (('p50_ms', 0.05), ('peak_python_mb', 1.0)):
+            # Valores muy chicos son ruido: se comparan contra un mínimo
+            expected = max(reference.get(metric, 0.0), floor)
+            if current[metric] > expected * (1 + tolerance):
+                regressions.append({'operation': key, 'metric': metric, 'baseline': reference.get(metric),
+                                    'current': current[metric], 'ratio': round(current[metric] / expected, 2)})
+    return regressions
+
+
+def _machine() -> dict:
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks del registro sobre datos sintéticos.')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='cantidades de versiones separadas por coma')
+    parser.add_argument('--repeat', type=int, default=20, help='ejecuciones por operación')
+    parser.add_argument('--heavy-repeat', type=int, default=3, help='ejecuciones de las operaciones sobre todo el registro')
+    parser.add_argument('--skip-http', action='store_true', help='medir solo la capa de servicio')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.5, help='empeoramiento admitido (0.5 = 50%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='guardar estos resultados como línea base')
+    parser.add_argument('--output', type=Path, default=None, help='archivo JSON con los resultados')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(',') if s.strip()):
+        results.update(run_size(size, args.repeat, args.heavy_repeat, not args.skip_http, args.seed))
+    report = {'machine': _machine(), 'results': results}
+    if resource is not None:
+        report['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {'results': {}}
+    if args.update_baseline:
+        # Se conservan los tamaños que no se midieron en esta corrida
+        baseline = {'machine': report['machine'], 'results': {**baseline.get('results', {}), **results}}
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f'Línea base actualizada: {args.baseline}')
+        return 0
+
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    for r in regressions:
+        print(f"[regresión] {r['operation']} {r['metric']}: {r['baseline']} -> {r['current']} (x{r['ratio']})")
+    if not regressions:
+        compared = sum(1 for key in results if key in baseline.get('results', {}))
+        print(f'Sin regresiones ({compared} operaciones comparadas con {args.baseline.name})')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Registros sintéticos para los benchmarks.
+
+Genera tablas con el esquema del registro (`registry_schema.REGISTRY_SCHEMA`)
+por columnas, sin pasar por MLModel, para poder llegar al millón de versiones
+en pocos segundos. Los valores imitan exports reales: algoritmos y
+herramientas de un catálogo acotado, métricas y metadata como
+`custom_properties` y, en promedio, `versions_per_model` versiones por modelo.
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+
+from app.models.model_schema import CustomProperty, MLModel
+from app.services.registry_schema import CUSTOM_PROPERTY_TYPE, TIMESTAMP_TYPE, conform_table
+from app.services.segment_store import SegmentStore
+
+ALGORITHMS = ['XGBoost', 'LightGBM', 'GLM', 'RandomForest', 'CatBoost', 'NeuralNetwork', 'GPT-4o', 'Llama-3']
+FUNCTIONS = ['classification', 'regression', 'clustering', 'generation']
+LANGUAGES = ['python', 'sas', 'r']
+TOOLS = [('Python 3', '3.9'), ('Python 3', '3.11'), ('SAS', '9.4'), ('R', '4.3')]
+TARGET_LEVELS = ['binary', 'ordinal', 'interval', 'nominal']
+AREAS = ['RIESGO', 'VALOR-CLIENTE', 'FRAUDE', 'COBRANZA', 'MARKETING', 'OPERACIONES']
+COUNTRIES = ['CRI', 'GTM', 'HND', 'PAN', 'NIC', 'SLV']
+PEOPLE = [f'analista.{i:02d}' for i in range(40)]
+METRICS = ['accuracy', 'precision', 'recall', 'f1', 'roc_auc']
+
+
+def _pick(rng, values, n):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), n)]
+
+
+def _custom_properties(rng, n: int, areas, owners) -> pa.Array:
+    """Lista de structs por fila: dueño, área y las métricas del modelo."""
+    per_row = 2 + len(METRICS)
+    names = np.tile(np.asarray(['owner', 'area'] + METRICS, dtype=object), n)
+    scores = np.round(rng.uniform(0.55, 0.99, (n, len(METRICS))), 4).astype(str)
+    values = np.empty((n, per_row), dtype=object)
+    values[:, 0] = owners
+    values[:, 1] = areas
+    values[:, 2:] = scores
+    types = np.tile(np.asarray(['string', 'string'] + ['float'] * len(METRICS), dtype=object), n)
+    struct = pa.StructArray.from_arrays(
+        [pa.array(names, pa.string()), pa.array(values.ravel(), pa.string()), pa.array(types, pa.string())],
+        fields=list(CUSTOM_PROPERTY_TYPE))
+    offsets = pa.array(np.arange(0, n * per_row + 1, per_row, dtype=np.int32))
+    return pa.ListArray.from_arrays(offsets, struct)
+
+
+def synthetic_table(versions: int, versions_per_model: int = 3, seed: int = 0) -> pa.Table:
+    """Tabla de `versions` filas; las versiones de cada modelo quedan intercaladas como en producción."""
+    rng = np.random.default_rng(seed)
+    n = versions
+    models = max(1, n // versions_per_model)
+    model_index = np.arange(n) % models
+    version = np.arange(n) // models + 1
+
+    ids = np.asarray([f'{k:08x}-bench-{k % 9973:04d}' for k in range(models)], dtype=object)[model_index]
+    areas = np.asarray(AREAS, dtype=object)[model_index % len(AREAS)]
+    countries = np.asarray(COUNTRIES, dtype=object)[model_index % len(COUNTRIES)]
+    algorithms = np.asarray(ALGORITHMS, dtype=object)[model_index % len(ALGORITHMS)]
+    names = [f'BAC_{a}-{c}-{k % 97}M_PRED_{algo[:3].upper()}_{k}'
+             for a, c, algo, k in zip(areas, countries, algorithms, model_index)]
+    tool = rng.integers(0, len(TOOLS), models)[model_index]
+    languages = np.asarray(LANGUAGES, dtype=object)[tool % len(LANGUAGES)]
+    owners = _pick(rng, PEOPLE, n)
+
+    # Altas repartidas en dos años desde 2023 (UTC)
+    created_s = rng.integers(0, 2 * 365 * 86400, models)[model_index]
+    created_at = np.datetime64('2023-01-01T00:00:00', 'us') + created_s.astype('timedelta64[s]')
+    modified_at = created_at + (version - 1).astype('timedelta64[D]')
+    modified_at = np.where(version > 1, modified_at, np.datetime64('NaT'))
+
+    columns = {
+        'creationTimeStamp': pa.array(created_at, TIMESTAMP_TYPE),
+        'createdBy': pa.array(_pick(rng, PEOPLE, models)[model_index], pa.string()),
+        'modifiedTimeStamp': pa.array(modified_at, TIMESTAMP_TYPE),
+        'modifiedBy': pa.array(np.where(version > 1, owners, None), pa.string()),
+        'id': pa.array(ids, pa.string()),
+        'name': pa.array(names, pa.string()),
+        'description': pa.array([f'Modelo de predicción de {a.lower()} para {c} (versión {v})'
+                                 for a, c, v in zip(areas, countries, version)], pa.string()),
+        'scoreCodeType': pa.array(languages, pa.string()),
+        'algorithm': pa.array(algorithms, pa.string()),
+        'function': pa.array(np.asarray(FUNCTIONS, dtype=object)[model_index % len(FUNCTIONS)], pa.string()),
+        'modeler': pa.array(owners, pa.string()),
+        'modelType': pa.array(languages, pa.string()),
+        'trainCodeType': pa.array(languages, pa.string()),
+        'targetLevel': pa.array(_pick(rng, TARGET_LEVELS, models)[model_index], pa.string()),
+        'tool': pa.array(np.asarray([t[0] for t in TOOLS], dtype=object)[tool], pa.string()),
+        'toolVersion': pa.array(np.asarray([t[1] for t in TOOLS], dtype=object)[tool], pa.string()),
+        'externalUrl': pa.array([f'https://mm.example.com/models/{i}' if k % 4 else None
+                                 for i, k in zip(ids, model_index)], pa.string()),
+        'modelVersionName': pa.array([f'{v}.0' for v in version], pa.string()),
+        'custom_properties': _custom_properties(rng, n, areas, owners),
+        'version': pa.array(version, pa.int64()),
+    }
+    return conform_table(pa.table(columns))
+
+
+def write_registry(data_dir: Path, table: pa.Table) -> int:
+    """Deja `table` como base del registro en `data_dir` (Parquet + instantánea Arrow)."""
+    store = SegmentStore(Path(data_dir))
+    generation = store.write_base(table)
+    store.write_snapshot(table, generation)
+    return generation
+
+
+def sample_model(model_id: str, seed: int = 0) -> MLModel:
+    """Un MLModel nuevo con la forma de los sintéticos (para medir altas)."""
+    rng = np.random.default_rng(seed)
+    tool, tool_version = TOOLS[seed % len(TOOLS)]
+    properties = [CustomProperty(name='owner', value=PEOPLE[seed % len(PEOPLE)], type='string'),
+                  CustomProperty(name='area', value=AREAS[seed % len(AREAS)], type='string')]
+    properties += [CustomProperty(name=m, value=f'{rng.uniform(0.55, 0.99):.4f}', type='float') for m in METRICS]
+    return MLModel(
+        creationTimeStamp=datetime.now(timezone.utc), createdBy=PEOPLE[seed % len(PEOPLE)],
+        modifiedTimeStamp=None, modifiedBy=None, id=model_id, name=f'BAC_BENCH_PRED_{seed}',
+        description='Modelo registrado durante el benchmark', scoreCodeType='python',
+        algorithm=ALGORITHMS[seed % len(ALGORITHMS)], function=FUNCTIONS[seed % len(FUNCTIONS)],
+        modeler=PEOPLE[seed % len(PEOPLE)], modelType='python', trainCodeType='python',
+        targetLevel=TARGET_LEVELS[seed % len(TARGET_LEVELS)], tool=tool, toolVersion=tool_version,
+        externalUrl=None, modelVersionName='1.0', custom_properties=properties,
+    )
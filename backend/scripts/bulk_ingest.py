@@ -1,8 +1,51 @@
+"""
+Ingesta masiva desde la línea de comandos.
+
+Uso (desde `backend/`):
+    python scripts/bulk_ingest.py [RUTA ...] [--batch-size N] [--workers N]
+
+RUTA puede ser un archivo JSON (objeto o arreglo), NDJSON o un directorio;
+por defecto se usa `data/input_jsons/`. Los registros se escriben por lotes
+mientras se leen; un archivo ilegible o con JSON inválido se informa como
+error y la ingesta sigue con el resto.
+"""
+
+import argparse
+import sys
+from itertools import chain
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.services import bulk
+from app.services.model_service import ModelService
+
+DEFAULT_INPUT = Path(__file__).resolve().parents[2] / 'data' / 'input_jsons'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Registra en bloque modelos desde archivos JSON/NDJSON.')
+    parser.add_argument('paths', nargs='*', type=Path, default=[DEFAULT_INPUT])
+    parser.add_argument('--batch-size', type=int, default=bulk.STREAM_BATCH_SIZE,
+                        help='registros por lote de validación y escritura')
+    parser.add_argument('--workers', type=int, default=None, help='procesos para validar (por defecto, núcleos disponibles)')
+    args = parser.parse_args(argv)
+    if args.workers is not None:
+        bulk.BULK_WORKERS = max(args.workers, 1)
+
+    service = ModelService()
+    # Los archivos se leen y escriben por lotes; uno inválido queda como error en el reporte
+    records = chain.from_iterable(bulk.iter_path_records(path) for path in args.paths)
+    report = bulk.ingest_stream(service, records, batch_size=args.batch_size)
+    for result in report['results']:
+        if result['status'] == 'error':
+            print(f"[error] {result['source']}: {result['error']}")
+    # Regenerar exports una sola vez antes de salir
+    service.exports.flush()
+    print(f"Ingestas realizadas: {report['created']} de {report['total']} "
+          f"({report['unchanged']} sin cambios, {report['failed']} con error)")
+    return 0 if report['failed'] == 0 else 1
 
-from sqlmodel import Session
-from app.database import engine
-from app.routers.models import bulk_ingest
 
 if __name__ == '__main__':
-    with Session(engine) as session:
-        print('Ingestas realizadas:', len(bulk_ingest.__wrapped__(session=session)))
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from backend.app.models.model_schema import MLModel
+from backend.app.services.archive import RetentionPolicy
+from backend.app.services.master import rebuild_master
+from backend.app.services.model_service import ModelService
+from backend.app.services.registry_schema import registry_table
+from test_bulk import _record
+
+
+def _edit(svc, model_id, version, **fields):
+    svc.update_model(model_id, MLModel(**_record(model_id, description=f'v{version}', **fields)))
+
+
+def test_compaction_archives_old_versions_and_reads_fall_through(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('MODEL_RETENTION_VERSIONS', '2')
+    monkeypatch.setenv('MODEL_CHECKPOINT_EVERY', '3')
+    svc = ModelService()
+    svc.create_models([MLModel(**_record('a', description='v1')), MLModel(**_record('b'))])
+    for version in range(2, 6):
+        _edit(svc, 'a', version)
+
+    assert svc.store.compact(force=True)
+    assert svc.store.archive.versions('a') == [1, 2, 3]
+    # La generación cambia: el propio servicio y los demás workers recargan solo lo caliente
+    assert svc.get_all_models(latest_only=False) and svc.engine.count(latest_only=False) == 3
+    assert sorted(svc.engine._positions['a']) == [4, 5]
+
+    fresh = ModelService()
+    assert [fresh.get_model('a', v).description for v in range(1, 6)] == ['v1', 'v2', 'v3', 'v4', 'v5']
+    assert fresh.get_model('a').version == 5 and fresh.get_model('a', version=9) is None
+    assert fresh.engine.versions('a') == [1, 2, 3, 4, 5]
+    assert fresh.diff_versions('a', 1, 5)['changes']['description'] == {'from': 'v1', 'to': 'v5'}
+    # Sin nada nuevo para archivar no se reescribe la base
+    assert not fresh.store.compact(force=True)
+
+    rebuild_master(tmp_path, incremental=False)
+    exported = pd.read_parquet(tmp_path / 'exports' / 'master_all.parquet')
+    assert sorted(exported.loc[exported['id'] == 'a', 'version']) == [1, 2, 3, 4, 5]
+    assert len(pd.read_parquet(tmp_path / 'exports' / 'master_latest.parquet')) == 2
+
+
+def test_retention_by_age_keeps_recent_versions():
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    rows = [{**_record('a', modifiedTimeStamp=stamp), 'version': v}
+            for v, stamp in enumerate(['2025-01-01T00:00:00Z', '2025-05-20T00:00:00Z', '2025-01-02T00:00:00Z'], 1)]
+    table = registry_table(rows + [{**_record('b', modifiedTimeStamp='2024-01-01T00:00:00Z'), 'version': 1}])
+
+    hot, cold = RetentionPolicy(keep_days=30).split(table, now)
+    # v1 es vieja; v2 es reciente; v3 y b son la última versión de su modelo
+    assert cold.column('version').to_pylist() == [1]
+    assert hot.column('version').to_pylist() == [2, 3, 1]
+    # Con las dos reglas una versión se conserva si cumple cualquiera
+    hot, cold = RetentionPolicy(keep_versions=1, keep_days=30).split(table, now)
+    assert cold.column('version').to_pylist() == [1]
+    assert RetentionPolicy(keep_days=365).split(table, now)[1] is None
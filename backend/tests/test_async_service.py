@@ -0,0 +1,177 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routers import models as models_router
+from backend.app.services.async_service import ServiceBusy, ServicePool
+from backend.app.services.model_service import ModelService
+from backend.app.utils.rw_lock import RWLock
+from test_bulk import _record
+
+
+def test_rw_lock_shares_reads_and_serializes_writes():
+    lock = RWLock()
+    inside, events = threading.Barrier(2, timeout=2), []
+
+    def reader():
+        with lock.read():
+            # Las dos lecturas están dentro a la vez
+            inside.wait()
+            time.sleep(0.05)
+            events.append('read')
+
+    def writer():
+        with lock.write():
+            events.append('write')
+
+    readers = [threading.Thread(target=reader) for _ in range(2)]
+    for t in readers:
+        t.start()
+    time.sleep(0.01)
+    w = threading.Thread(target=writer)
+    w.start()
+    for t in readers + [w]:
+        t.join(2)
+    assert events == ['read', 'read', 'write']
+
+    with lock.write(), lock.read(), lock.write():
+        pass
+
+
+def test_pool_rejects_when_queue_is_full():
+    pool = ServicePool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(release.wait, 2))
+        second = asyncio.ensure_future(pool.run(lambda: 'ok'))
+        await asyncio.sleep(0.05)
+        assert pool.stats()['running'] == 1 and pool.stats()['queued'] == 1
+        with pytest.raises(ServiceBusy):
+            await pool.run(lambda: None)
+        release.set()
+        return await first, await second
+
+    assert asyncio.run(scenario()) == (True, 'ok')
+    assert pool.stats()['queued'] == 0
+    pool.shutdown()
+
+
+def test_async_endpoints_do_not_block_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    svc.create_model(models_router.MLModel(**_record('m1')))
+    monkeypatch.setattr(models_router, 'model_service', svc)
+    monkeypatch.setattr(models_router, 'service_pool', ServicePool(max_workers=1, max_queue=0))
+    release = threading.Event()
+    slow_get = svc.get_model_json
+    monkeypatch.setattr(svc, 'get_model_json', lambda *a: release.wait(2) and slow_get(*a))
+
+    with TestClient(app) as client:
+        results = {}
+        slow = threading.Thread(target=lambda: results.setdefault('slow', client.get('/models/m1')))
+        slow.start()
+        time.sleep(0.1)
+        # El loop sigue atendiendo mientras la lectura lenta ocupa el único hilo del pool
+        assert client.get('/').status_code == 200
+        busy = client.get('/models/summary/dashboard/')
+        assert busy.status_code == 503 and busy.headers['retry-after'] == '1'
+        release.set()
+        slow.join(2)
+        assert results['slow'].json()['id'] == 'm1'
+        assert client.get('/models/summary/dashboard/').json()['total_models'] == 1
+
+
+def test_concurrent_reads_refresh_only_under_the_write_lock(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    reader, writer = ModelService(), ModelService()
+    writer.create_model(models_router.MLModel(**_record('m0')))
+    reader.get_all_models()
+    outside_write_lock, errors = [], []
+    engine_refresh = reader.engine.refresh
+
+    def checked_refresh():
+        # Aplicar cambios de otro worker modifica el estado compartido: solo con la escritura tomada
+        if reader.rw_lock._writer != threading.get_ident():
+            outside_write_lock.append(threading.current_thread().name)
+        return engine_refresh()
+
+    monkeypatch.setattr(reader.engine, 'refresh', checked_refresh)
+    done = threading.Event()
+
+    def read_loop():
+        try:
+            while not done.is_set():
+                reader.get_model('m0')
+                reader.get_all_models()
+                reader.get_models_summary()
+                reader.get_models_page(limit=5)
+        except Exception as e:  # pragma: no cover - se reporta abajo
+            errors.append(e)
+
+    threads = [threading.Thread(target=read_loop, name=f'reader-{i}') for i in range(4)]
+    for t in threads:
+        t.start()
+    # Otro worker agrega segmentos mientras se lee
+    for i in range(1, 30):
+        writer.create_model(models_router.MLModel(**_record(f'm{i}')))
+    done.set()
+    for t in threads:
+        t.join(5)
+    assert not errors and not outside_write_lock
+    assert len(reader.get_all_models()) == 30 and reader.get_models_summary()['total_models'] == 30
+
+
+def test_concurrent_reads_build_lazy_structures_once(tmp_path, monkeypatch):
+    from backend.app.models.query_schema import ModelQuery
+    from backend.app.services import model_service, parquet_engine
+
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    ModelService().create_models([models_router.MLModel(**_record(f'm{i}')) for i in range(5)])
+    svc = ModelService()
+    builds = []
+
+    def slow(name, build):
+        def wrapper(*args, **kwargs):
+            builds.append(name)
+            # Da tiempo a que las demás lecturas lleguen mientras se arma
+            time.sleep(0.05)
+            return build(*args, **kwargs)
+        return wrapper
+
+    monkeypatch.setattr(model_service.InsightsAggregate, 'from_frame',
+                        slow('insights', model_service.InsightsAggregate.from_frame))
+    monkeypatch.setattr(model_service.SearchIndex, 'build', slow('search', model_service.SearchIndex.build))
+    monkeypatch.setattr(parquet_engine.LatestIndex, 'from_frame', slow('query', parquet_engine.LatestIndex.from_frame))
+    saves = []
+    save = svc._save_search_index
+    monkeypatch.setattr(svc, '_save_search_index', lambda: (saves.append(1), save()))
+
+    query = ModelQuery(filters=[{'field': 'algorithm', 'value': 'XGBoost'}])
+    start = threading.Barrier(6, timeout=5)
+
+    results = []
+
+    def reader():
+        start.wait()
+        results.append((svc.get_insights()['total_modelos'], len(svc.search_models('m1')['items']) > 0,
+                        svc.query_models(query)['total']))
+
+    threads = [threading.Thread(target=reader) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [(5, True, 5)] * 6
+    assert sorted(builds) == ['insights', 'query', 'search'] and len(saves) == 1
@@ -0,0 +1,53 @@
+import os
+import sys
+# Asegurar que `backend/` esté primero en sys.path: los benchmarks se importan como en la CLI
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if BACKEND not in sys.path[:1]:
+    sys.path.insert(0, BACKEND)
+
+from benchmarks.rebuild_scaling import measure_scaling
+from benchmarks.run_benchmarks import compare, run_size
+from benchmarks.synthetic import synthetic_table
+
+
+def test_synthetic_table_interleaves_versions():
+    table = synthetic_table(30, versions_per_model=3)
+    assert table.num_rows == 30
+    rows = table.to_pylist()
+    assert {r['version'] for r in rows} == {1, 2, 3}
+    assert len({r['id'] for r in rows}) == 10
+    assert [p['name'] for p in rows[0]['custom_properties']][:3] == ['owner', 'area', 'accuracy']
+
+
+def test_small_run_and_baseline_comparison():
+    results = run_size(120, repeat=2, heavy_repeat=1, http=True)
+    assert {'120:service:get_model', '120:http:GET /models/{id}', '120:service:rebuild_master'} <= set(results)
+    assert all(r['p50_ms'] > 0 and r['ops_per_s'] > 0 for r in results.values())
+
+    baseline = {key: dict(stats) for key, stats in results.items()}
+    assert compare(results, baseline, tolerance=0.5) == []
+    baseline['120:service:get_all_models']['p50_ms'] = results['120:service:get_all_models']['p50_ms'] / 10
+    regressions = compare(results, baseline, tolerance=0.5)
+    assert [(r['operation'], r['metric']) for r in regressions] == [('120:service:get_all_models', 'p50_ms')]
+
+
+def test_rebuild_scaling_reports_speedup_against_one_process():
+    results = measure_scaling(60, [1, 2], repeat=1)
+    assert set(results) == {1, 2} and results[1]['speedup'] == 1.0
+    assert results[2]['best_s'] > 0 and results[2]['speedup'] > 0
+
+
+def test_full_listing_repeats_are_not_served_from_the_response_cache():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.model_service import ModelService
+    from benchmarks.run_benchmarks import _registry_dir, _use_service, http_operations
+
+    with _registry_dir(40, 0) as data_dir:
+        service = ModelService()
+        _use_service(service)
+        with TestClient(app) as client:
+            listing = next(op for op in http_operations(client, service, 40, 0) if op.name == 'GET /models/')
+            for i in range(3):
+                listing.run(i)
+    assert service.response_cache.hits == 0 and service.response_cache.misses == 3
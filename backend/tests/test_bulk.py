@@ -0,0 +1,160 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import io
+import json
+import subprocess
+
+import pytest
+
+from backend.app.services.bulk import (ingest_records, ingest_stream, iter_json_stream, iter_path_records,
+                                       iter_upload_records, parse_json_records, validate_records)
+from backend.app.services.model_service import ModelService
+
+
+def _record(model_id, **overrides):
+    record = {
+        'creationTimeStamp': '2025-03-12T16:50:51.979Z', 'createdBy': 'tester', 'modifiedTimeStamp': None,
+        'modifiedBy': None, 'id': model_id, 'name': f'model-{model_id}', 'description': 'desc',
+        'scoreCodeType': 'python', 'algorithm': 'XGBoost', 'function': 'classification', 'modeler': 'tester',
+        'modelType': 'python', 'trainCodeType': 'python', 'targetLevel': 'ordinal', 'tool': 'Python 3',
+        'toolVersion': '3.9', 'externalUrl': None, 'modelVersionName': '1.0', 'custom_properties': [],
+    }
+    record.update(overrides)
+    return record
+
+
+def test_parse_array_object_and_ndjson():
+    assert len(parse_json_records(json.dumps([_record('a'), _record('b')]))) == 2
+    assert parse_json_records(json.dumps(_record('a')))[0]['id'] == 'a'
+    ndjson = '\n'.join(json.dumps(_record(i)) for i in 'abc') + '\n'
+    assert [r['id'] for r in parse_json_records(ndjson.encode())] == ['a', 'b', 'c']
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, 1 << 16])
+def test_iter_json_stream_matches_parse_across_chunk_boundaries(size):
+    documents = [
+        json.dumps([_record('a'), {'n': 12345, 'x': [1.5, -2e3, None, True]}, _record('ñandú')], indent=2),
+        json.dumps(_record('a')),
+        '\n'.join(json.dumps(_record(i)) for i in 'abc') + '\n',
+        ' [ ] ', '', '[1, 22, 333]',
+    ]
+    for text in documents:
+        data = text.encode('utf-8')
+        assert list(iter_json_stream(_chunks(data, size))) == parse_json_records(data)
+    # BOM de UTF-8 (archivos guardados desde Windows)
+    assert list(iter_json_stream(_chunks('\ufeff[{"a": 1}]'.encode('utf-8'), size))) == [{'a': 1}]
+    for broken in ('[{"a": 1} {"b": 2}]', '[{"a": 1},', '{"a": 1}\n{"b":'):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_stream(_chunks(broken.encode(), size)))
+
+
+def test_ingest_stream_writes_in_batches_and_reports_bad_json(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    generation = svc.store.generation
+    good = '\n'.join(json.dumps(_record(f'm{i}')) for i in range(5)).encode()
+    broken = (json.dumps(_record('x')) + '\n{"id": ').encode()
+    records = list(iter_upload_records('good.ndjson', io.BytesIO(good))) + \
+        list(iter_upload_records('broken.ndjson', io.BytesIO(broken)))
+    report = ingest_stream(svc, records, batch_size=2, parallel=False)
+
+    assert (report['total'], report['created'], report['failed']) == (7, 6, 1)
+    assert report['results'][-1]['source'] == 'broken.ndjson[1]'
+    assert report['results'][-1]['error'].startswith('JSON inválido')
+    # Un append por lote (el último lote solo trae el error)
+    assert svc.store.generation == generation + 3
+    assert len(svc.get_all_models()) == 6
+
+
+def test_iter_path_reads_directory(tmp_path):
+    (tmp_path / 'one.json').write_text(json.dumps(_record('a')))
+    (tmp_path / 'many.ndjson').write_text(json.dumps(_record('b')) + '\n' + json.dumps(_record('c')))
+    (tmp_path / 'notes.txt').write_text('ignorar')
+    records = list(iter_path_records(tmp_path))
+    assert [source for source, _ in records] == ['many.ndjson[0]', 'many.ndjson[1]', 'one.json[0]']
+
+
+def test_bad_file_in_directory_is_reported_and_skipped(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path / 'data'))
+    inputs = tmp_path / 'inputs'
+    inputs.mkdir()
+    (inputs / 'a.json').write_text(json.dumps([_record('a1'), _record('a2')]))
+    (inputs / 'b.json').write_text('{"id": "b1", ')
+    (inputs / 'c.ndjson').write_text(json.dumps(_record('c1')) + '\n' + json.dumps(_record('c2')))
+    (inputs / 'd.json').mkdir()
+
+    records = list(iter_path_records(inputs))
+    assert [source for source, _ in records] == ['a.json[0]', 'a.json[1]', 'b.json', 'c.ndjson[0]', 'c.ndjson[1]', 'd.json']
+    svc = ModelService()
+    report = ingest_stream(svc, iter(records), batch_size=2, parallel=False)
+    assert (report['created'], report['failed']) == (4, 2)
+    errors = {r['source']: r['error'] for r in report['results'] if r['status'] == 'error'}
+    assert errors['b.json'].startswith('JSON inválido') and errors['d.json'].startswith('No se pudo leer')
+    assert sorted(m.id for m in svc.get_all_models()) == ['a1', 'a2', 'c1', 'c2']
+
+    # La CLI informa el archivo roto y carga los demás
+    script = os.path.join(ROOT, 'backend', 'scripts', 'bulk_ingest.py')
+    (inputs / 'd.json').rmdir()
+    (inputs / 'a.json').write_text(json.dumps(_record('a3')))
+    done = subprocess.run([sys.executable, script, str(inputs), '--batch-size', '1', '--workers', '1'],
+                          capture_output=True, text=True, env=dict(os.environ, DATA_DIR=str(tmp_path / 'data')))
+    assert done.returncode == 1, done.stderr
+    assert '[error] b.json: JSON inválido' in done.stdout
+    assert 'Ingestas realizadas: 1 de 4 (2 sin cambios, 1 con error)' in done.stdout
+    assert ModelService().get_model('a3') is not None
+
+
+def test_validate_records_in_parallel_keeps_order(monkeypatch):
+    from backend.app.services import bulk
+    monkeypatch.setattr(bulk, 'PARALLEL_THRESHOLD', 1)
+    records = [_record(str(i)) for i in range(10)] + [{'id': 'roto'}]
+    validated = validate_records(records, batch_size=3, workers=2)
+    assert [m.id for m, _ in validated[:10]] == [str(i) for i in range(10)]
+    assert validated[-1][0] is None and 'Field required' in validated[-1][1]
+    # Un solo pool (spawn) para validate_records y la ingesta por streaming
+    pool = bulk._validation_pool()
+    assert pool._mp_context.get_start_method() == 'spawn'
+    assert validate_records(records, batch_size=3, workers=2) == validated and bulk._validation_pool() is pool
+
+
+def test_ingest_records_single_write(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    generation = svc.store.generation
+    exported = _record('b')
+    exported['custom properties'] = [{'name': 'owner', 'value': 'team', 'type': 'string'}]
+    del exported['custom_properties']
+    report = ingest_records(svc, [_record('a'), {'name': 'sin campos'}, _record('', custom_properties={}), exported])
+
+    assert (report['created'], report['failed']) == (3, 1)
+    assert [r['status'] for r in report['results']] == ['created', 'error', 'created', 'created']
+    assert report['results'][2]['id'] != ''
+    # Todo el lote se persiste en una sola generación
+    assert svc.store.generation == generation + 1
+    assert len(svc.get_all_models()) == 3
+    assert svc.get_model('b').custom_properties[0].value == 'team'
+
+
+def test_reingesting_identical_records_is_a_no_op(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    ingest_records(svc, [_record('a'), _record('b')])
+    generation = svc.store.generation
+
+    # Otra instancia (otro worker / reinicio) compara contra el hash guardado
+    report = ingest_records(ModelService(), [_record('a'), _record('b', description='v2'), _record('b', description='v2')])
+    assert (report['created'], report['unchanged']) == (1, 2)
+    assert [r['status'] for r in report['results']] == ['unchanged', 'created', 'unchanged']
+    assert svc.store.generation == generation + 1
+
+    report = ingest_records(svc, [_record('a'), _record('b', description='v2')])
+    assert report['unchanged'] == 2 and svc.store.generation == generation + 1
@@ -0,0 +1,39 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import time
+
+from backend.app.services import export_scheduler
+from backend.app.services.export_scheduler import ExportScheduler
+
+
+def test_notifications_are_coalesced(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(export_scheduler, 'rebuild_master', lambda data_dir, incremental: calls.append(incremental))
+    scheduler = ExportScheduler(tmp_path, debounce=0.2, max_staleness=5)
+
+    for generation in range(1, 6):
+        scheduler.notify(generation)
+    assert scheduler.state()['pending']
+    time.sleep(0.6)
+
+    assert calls == [True]
+    state = scheduler.state()
+    assert not state['pending']
+    assert state['exported_generation'] == 5
+    assert state['last_rebuild_at'] is not None
+
+
+def test_request_rebuild_waits_and_reports_errors(tmp_path, monkeypatch):
+    def failing(data_dir, incremental):
+        raise RuntimeError('disco lleno')
+    monkeypatch.setattr(export_scheduler, 'rebuild_master', failing)
+    scheduler = ExportScheduler(tmp_path, debounce=30, max_staleness=60)
+
+    assert scheduler.request_rebuild(full=True, wait=True, timeout=5)
+    assert scheduler.state()['last_error'] == 'disco lleno'
+    assert scheduler.last_rebuild_at is None
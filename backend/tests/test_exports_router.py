@@ -0,0 +1,77 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import gzip
+import io
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routers import exports as exports_router
+from backend.app.routers import models as models_router
+from backend.app.services.model_service import ModelService
+from test_bulk import _record
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    svc.exports.debounce = svc.exports.max_staleness = 3600.0
+    monkeypatch.setattr(models_router, 'model_service', svc)
+    monkeypatch.setattr(exports_router, 'model_service', svc)
+    svc.create_models([models_router.MLModel(**_record(f'm{i:02d}')) for i in range(5)])
+    return TestClient(app)
+
+
+def test_download_formats_and_compression(client):
+    assert client.get('/exports/download/master_all').status_code == 404
+    assert client.post('/exports/rebuild', params={'wait': True}).json()['status'] == 'ok'
+
+    csv = client.get('/exports/download/master_all')
+    assert csv.status_code == 200 and csv.headers['content-type'].startswith('text/csv')
+    assert csv.headers['accept-ranges'] == 'bytes'
+    assert len(pd.read_csv(io.BytesIO(csv.content))) == 5
+
+    parquet = client.get('/exports/download/master_latest', params={'format': 'parquet'})
+    assert len(pd.read_parquet(io.BytesIO(parquet.content))) == 5
+    arrow = client.get('/exports/download/master_latest', params={'format': 'arrow'})
+    assert pa.ipc.open_file(pa.BufferReader(arrow.content)).read_all().num_rows == 5
+
+    gz = client.get('/exports/download/master_all', params={'compression': 'gzip'})
+    assert gz.headers['content-disposition'] == 'attachment; filename="master_all.csv.gz"'
+    assert gzip.decompress(gz.content) == csv.content
+    zst = client.get('/exports/download/master_all', params={'compression': 'zstd'})
+    assert pa.input_stream(pa.BufferReader(zst.content), compression='zstd').read() == csv.content
+    assert client.get('/exports/download/master_all', params={'format': 'xlsx'}).status_code == 422
+
+
+def test_download_supports_ranges_and_revalidation(client):
+    client.post('/exports/rebuild', params={'wait': True})
+    full = client.get('/exports/download/master_all', params={'format': 'parquet'})
+    size, etag = len(full.content), full.headers['etag']
+
+    part = client.get('/exports/download/master_all', params={'format': 'parquet'}, headers={'Range': 'bytes=10-19'})
+    assert part.status_code == 206 and part.content == full.content[10:20]
+    assert part.headers['content-range'] == f'bytes 10-19/{size}'
+    tail = client.get('/exports/download/master_all', params={'format': 'parquet'}, headers={'Range': 'bytes=-8'})
+    assert tail.content == full.content[-8:] and tail.content.endswith(b'PAR1')
+    beyond = client.get('/exports/download/master_all', params={'format': 'parquet'},
+                        headers={'Range': f'bytes={size}-'})
+    assert beyond.status_code == 416 and beyond.headers['content-range'] == f'bytes */{size}'
+
+    assert client.get('/exports/download/master_all', params={'format': 'parquet'},
+                      headers={'If-None-Match': etag}).status_code == 304
+    # Después de un rebuild el archivo es otro: If-Range ya no coincide y se envía completo
+    models_router.model_service.create_model(models_router.MLModel(**_record('m99')))
+    client.post('/exports/rebuild', params={'wait': True})
+    stale = client.get('/exports/download/master_all', params={'format': 'parquet'},
+                       headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert stale.status_code == 200 and len(pd.read_parquet(io.BytesIO(stale.content))) == 6
@@ -0,0 +1,77 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from datetime import datetime
+
+import pyarrow.parquet as pq
+
+from backend.app.services.history import CHANGED_COLUMN
+from backend.app.services.model_service import ModelService
+from test_model_service import _model
+
+
+CREATED = datetime(2025, 1, 1, 12, 0)
+
+
+def _versions(svc, count=7):
+    svc.create_model(_model(creationTimeStamp=CREATED))
+    for v in range(2, count + 1):
+        svc.update_model('model-1', _model(creationTimeStamp=CREATED, description=f'v{v}',
+                                           modelVersionName=f'{v}.0' if v % 2 else '1.0'))
+
+
+def test_compaction_stores_old_versions_as_deltas(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('MODEL_CHECKPOINT_EVERY', '3')
+    svc = ModelService()
+    _versions(svc)
+    # Referencia leída desde los segmentos, antes de codificar el historial
+    before = ModelService()
+    expected = {v: before.get_model('model-1', version=v) for v in range(1, 8)}
+    svc.store.compact()
+
+    base = pq.read_table(tmp_path / 'models.parquet').to_pylist()
+    changed = {row['version']: row[CHANGED_COLUMN] for row in base}
+    # La última y los checkpoints (múltiplos de 3) quedan completos
+    assert changed[7] is None and changed[3] is None and changed[6] is None
+    # Cada edición renueva modifiedTimeStamp
+    assert changed[5] == ['modifiedTimeStamp', 'description', 'modelVersionName']
+    assert changed[2] == ['modifiedTimeStamp', 'description', 'modelVersionName']
+    delta = next(row for row in base if row['version'] == 2)
+    assert delta['algorithm'] is None and delta['description'] == 'v2'
+
+    fresh = ModelService()
+    for version, model in expected.items():
+        assert fresh.get_model('model-1', version=version) == model
+    history = fresh.get_all_models(latest_only=False)
+    assert [m.description for m in history] == [expected[v].description for v in range(1, 8)]
+    page = fresh.get_models_page(latest_only=False, fields=['version', 'algorithm'])
+    assert {item['algorithm'] for item in page['items']} == {'XGBoost'}
+
+    # Una segunda compactación no vuelve a codificar los deltas
+    fresh.update_model('model-1', _model(creationTimeStamp=CREATED, description='v8'))
+    fresh.store.compact()
+    assert ModelService().get_model('model-1', version=2) == expected[2]
+
+
+def test_diff_versions_reads_only_changed_fields(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    _versions(svc, count=4)
+    svc.store.compact()
+
+    diff = svc.diff_versions('model-1')
+    assert (diff['id'], diff['from'], diff['to']) == ('model-1', 3, 4)
+    assert set(diff['changes']) == {'modifiedTimeStamp', 'description', 'modelVersionName'}
+    assert diff['changes']['modelVersionName'] == {'from': '3.0', 'to': '1.0'}
+    # La versión 1 no tiene modifiedTimeStamp
+    changes = svc.diff_versions('model-1', 1, 2)['changes']
+    assert changes['description'] == {'from': 'desc', 'to': 'v2'} and changes['modifiedTimeStamp']['from'] is None
+    assert svc.diff_versions('model-1', 4, 1)['changes']['description'] == {'from': 'v4', 'to': 'desc'}
+    assert svc.diff_versions('model-1', 2, 2)['changes'] == {}
+    assert svc.diff_versions('model-1', 1, 9) is None
+    assert svc.diff_versions('missing') is None
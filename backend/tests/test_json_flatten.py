@@ -0,0 +1,64 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from backend.app.services import master
+from backend.app.utils.json_flatten import flatten, flatten_column, flatten_records
+
+PROPS = [{'name': 'owner', 'value': 'ana'}, {'name': 'tier', 'value': 'gold'}]
+
+
+def test_flatten_list_modes():
+    d = {'a': {'b': 1, 'c': {'d': 2}}, 'props': PROPS}
+    assert flatten(d) == {'a.b': 1, 'a.c.d': 2, 'props': PROPS}
+    assert flatten(d, list_mode='json')['props'].startswith('[{"name": "owner"')
+    assert flatten(d, list_mode='named') == {'a.b': 1, 'a.c.d': 2, 'props.owner': 'ana', 'props.tier': 'gold'}
+    assert flatten(d, list_mode='index')['props.1.value'] == 'gold'
+
+
+def test_flatten_column_matches_python_path():
+    records = [{'x': {'y': 1}, 'z': 'a'}, None, {'x': {'y': 2, 'w': [1, 2]}}]
+    expected = flatten_records(records, 'p')
+    assert flatten_column(records, 'p') == expected
+    # Tipos mezclados que Arrow no admite: se usa el camino en Python
+    mixed = [{'x': 1}, {'x': 'uno'}]
+    assert flatten_column(mixed, 'p') == {'p.x': [1, 'uno']}
+
+
+def _rowwise(df):
+    rows = [master._normalize_row(r) for r in df.to_dict(orient='records')]
+    return pd.DataFrame(rows)
+
+
+def _assert_same(fast, slow):
+    assert sorted(fast.columns) == sorted(slow.columns)
+    columns = sorted(slow.columns)
+    pd.testing.assert_frame_equal(fast[columns], slow[columns], check_dtype=False)
+
+
+def test_normalize_df_matches_rowwise():
+    df = pd.DataFrame([
+        {'id': 'a', 'version': 1, 'name': 'A', 'modelType': 'python', 'scoreCodeType': None,
+         'metrics': {'auc': 0.9}, 'custom_properties': PROPS, 'extra': {'k': {'j': 1}}},
+        {'id': 'b', 'version': 2, 'name': 'B', 'modelType': None, 'model_type': 'sas',
+         'scoreCodeType': 'ds2', 'metrics': None, 'custom_properties': [], 'extra': 'plano'},
+    ])
+    _assert_same(master._normalize_df(df), _rowwise(df))
+
+
+def test_normalize_df_legacy_rows_keep_order():
+    df = pd.DataFrame([
+        {'id': 'a', 'version': 1, 'name': 'A', 'raw_payload': None},
+        {'id': 'c', 'version': 1, 'name': 'C', 'raw_payload': {'id': 'c', 'metrics': {'ks': 0.4}}},
+        {'id': 'b', 'version': 1, 'name': 'B', 'raw_payload': ''},
+    ])
+    out = master._normalize_df(df)
+    assert out['id'].tolist() == ['a', 'c', 'b']
+    assert out.loc[1, 'metric.ks'] == 0.4
+    assert out.loc[1, 'payload.metrics.ks'] == 0.4
+    assert out.loc[0, 'payload.name'] == 'A'
@@ -0,0 +1,209 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import io
+import json
+
+import pytest
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backend.app.services.master import open_export, read_export, rebuild_master
+from backend.app.services.segment_store import SegmentStore
+from backend.app.utils.metrics import STAGE_SECONDS
+
+
+def _row(model_id, version, **extra):
+    row = {'id': model_id, 'version': version, 'name': f'model-{model_id}', 'algorithm': 'XGBoost',
+           'modelType': 'python', 'scoreCodeType': 'python'}
+    row.update(extra)
+    return pd.DataFrame([row])
+
+
+def _read_exports(data_dir):
+    df_all = read_export('master_all', data_dir).to_pandas()
+    df_latest = read_export('master_latest', data_dir).to_pandas()
+    return (df_all.sort_values(['id', 'version']).reset_index(drop=True),
+            df_latest.sort_values('id').reset_index(drop=True))
+
+
+def test_incremental_rebuild_matches_full(tmp_path):
+    store = SegmentStore(tmp_path, compact_threshold=0)
+    store.append(_row('a', 1))
+    store.append(_row('b', 1))
+    rebuild_master(tmp_path)
+    assert json.loads((tmp_path / 'exports' / 'master_state.json').read_text())['generation'] == 2
+
+    store.append(_row('a', 2, algorithm='LightGBM'))
+    store.append(_row('c', 1, tool='R'))
+    rebuild_master(tmp_path)
+    incremental_all, incremental_latest = _read_exports(tmp_path)
+    assert len(incremental_all) == 4
+    assert incremental_latest.set_index('id').loc['a', 'algorithm'] == 'LightGBM'
+    fh, _ = open_export('master_all', 'csv', data_dir=tmp_path)
+    with fh:
+        assert len(pd.read_csv(fh)) == 4
+
+    rebuild_master(tmp_path, incremental=False)
+    full_all, full_latest = _read_exports(tmp_path)
+    pd.testing.assert_frame_equal(incremental_all, full_all, check_like=True)
+    pd.testing.assert_frame_equal(incremental_latest, full_latest, check_like=True)
+
+
+def test_incremental_rebuild_adds_parts_without_rewriting_exports(tmp_path, monkeypatch):
+    from backend.app.services import master
+
+    store = SegmentStore(tmp_path, compact_threshold=0)
+    store.append(_row('a', 1))
+    store.append(_row('b', 1))
+    rebuild_master(tmp_path)
+    export_dir = tmp_path / 'exports'
+    def published():
+        return {p.name: (p.stat().st_ino, p.stat().st_mtime_ns) for p in export_dir.glob('master_*.*')
+                if p.suffix in ('.csv', '.parquet', '.arrow')}
+
+    before = published()
+    assert len(before) == 6
+
+    store.append(_row('a', 2, algorithm='LightGBM'))
+    rebuild_master(tmp_path)
+    first_part = export_dir / 'master_all.parts' / 'part-000000000002.parquet'
+    first_stat = first_part.stat().st_mtime_ns
+    store.append(_row('c', 1))
+    store.append(_row('b', 2))
+    rebuild_master(tmp_path)
+
+    # Ni la base ni las partes anteriores se reescriben: cada rebuild agrega una parte
+    assert published() == before
+    assert first_part.stat().st_mtime_ns == first_stat
+    assert [p.name for p in sorted((export_dir / 'master_latest.parts').iterdir())] == \
+        ['part-000000000002.parquet', 'part-000000000003.parquet']
+    assert len(pq.read_table(export_dir / 'master_all.parquet')) == 2
+    incremental = _read_exports(tmp_path)
+    assert incremental[1][['id', 'version']].values.tolist() == [['a', 2], ['b', 2], ['c', 1]]
+    downloaded = {}
+    for fmt in ('csv', 'parquet', 'arrow'):
+        fh, _ = open_export('master_latest', fmt, data_dir=tmp_path)
+        with fh:
+            downloaded[fmt] = fh.read()
+    assert len(pd.read_csv(io.BytesIO(downloaded['csv']))) == 3
+    assert pq.read_table(pa.BufferReader(downloaded['parquet'])).equals(
+        pa.ipc.open_file(pa.BufferReader(downloaded['arrow'])).read_all())
+
+    # Con EXPORT_MAX_PARTS partes el siguiente rebuild es completo y deja solo la base
+    monkeypatch.setattr(master, 'EXPORT_MAX_PARTS', 2)
+    store.append(_row('d', 1))
+    rebuild_master(tmp_path)
+    assert not (export_dir / 'master_all.parts').exists() and not (export_dir / 'master_latest.parts').exists()
+    assert len(pq.read_table(export_dir / 'master_all.parquet')) == 6
+    full = _read_exports(tmp_path)
+    pd.testing.assert_frame_equal(incremental[0], full[0][full[0]['id'] != 'd'].reset_index(drop=True),
+                                  check_like=True)
+
+
+def test_rebuild_falls_back_to_full_after_compaction(tmp_path):
+    store = SegmentStore(tmp_path, compact_threshold=0)
+    store.append(_row('a', 1))
+    rebuild_master(tmp_path)
+    store.append(_row('b', 1))
+    store.append(_row('a', 2))
+    store.compact()
+
+    rebuild_master(tmp_path)
+    df_all, df_latest = _read_exports(tmp_path)
+    assert len(df_all) == 3
+    assert df_latest[['id', 'version']].values.tolist() == [['a', 2], ['b', 1]]
+
+
+def test_batched_rebuild_matches_single_batch_and_expands_deltas(tmp_path, monkeypatch):
+    from backend.app.services import master
+
+    store = SegmentStore(tmp_path, compact_threshold=0, checkpoint_every=3)
+    for version in range(1, 6):
+        for model_id in 'abc':
+            store.append(_row(model_id, version, description=f'{model_id}{version}'))
+    store.compact()
+    assert pq.read_table(tmp_path / 'models.parquet').column('_changed').null_count < 15
+
+    rebuild_master(tmp_path, incremental=False)
+    single = _read_exports(tmp_path)
+    monkeypatch.setattr(master, 'EXPORT_BATCH_ROWS', 4)
+    rebuild_master(tmp_path, incremental=False)
+    batched = _read_exports(tmp_path)
+    pd.testing.assert_frame_equal(single[0], batched[0])
+    pd.testing.assert_frame_equal(single[1], batched[1])
+
+    df_all = batched[0].set_index(['id', 'version'])
+    assert df_all.loc[('b', 2), 'payload.description'] == 'b2'
+    assert df_all.loc[('b', 2), 'algorithm'] == 'XGBoost'
+    assert batched[1][['id', 'version']].values.tolist() == [['a', 5], ['b', 5], ['c', 5]]
+    # Los tres formatos tienen el mismo contenido; el Parquet queda en row groups del tamaño del lote
+    export_dir = tmp_path / 'exports'
+    arrow = pa.ipc.open_file(export_dir / 'master_all.arrow').read_all()
+    assert arrow.column_names == pq.read_schema(export_dir / 'master_all.parquet').names
+    assert arrow.num_rows == len(pd.read_csv(export_dir / 'master_all.csv')) == 15
+    assert pq.ParquetFile(export_dir / 'master_all.parquet').num_row_groups == 4
+
+
+def test_parallel_rebuild_matches_serial(tmp_path, monkeypatch):
+    from backend.app.services import master
+
+    store = SegmentStore(tmp_path, compact_threshold=0, checkpoint_every=3)
+    for version in range(1, 4):
+        for i, model_id in enumerate('abcdef'):
+            # Columnas que aparecen solo en algunos lotes: el esquema final es la unión
+            extra = {'tool': 'R'} if model_id == 'f' else {'externalUrl': f'http://x/{model_id}'} if i % 2 else {}
+            store.append(_row(model_id, version, description=f'{model_id}{version}', **extra))
+    store.compact()
+    monkeypatch.setattr(master, 'EXPORT_BATCH_ROWS', 5)
+    monkeypatch.setattr(master, 'EXPORT_PARALLEL_MIN_ROWS', 0)
+
+    export_dir = tmp_path / 'exports'
+    rebuild_master(tmp_path, incremental=False, workers=1)
+    serial = {p.name: p.read_bytes() for p in export_dir.glob('master_*.csv')}
+    serial_tables = {name: pq.read_table(export_dir / f'{name}.parquet') for name in ('master_all', 'master_latest')}
+    parallel_runs = STAGE_SECONDS.count('export_parallel')
+    rebuild_master(tmp_path, incremental=False, workers=2)
+    assert STAGE_SECONDS.count('export_parallel') == parallel_runs + 1
+    assert {p.name: p.read_bytes() for p in export_dir.glob('master_*.csv')} == serial
+    for name, table in serial_tables.items():
+        assert pq.read_table(export_dir / f'{name}.parquet').equals(table)
+        assert pa.ipc.open_file(export_dir / f'{name}.arrow').read_all().equals(table)
+    assert pq.ParquetFile(export_dir / 'master_all.parquet').num_row_groups == 4
+    assert not [p for p in export_dir.iterdir() if p.name.startswith('.master')]
+
+
+def test_insights_aggregate_incremental_matches_full():
+    from backend.app.services.master import InsightsAggregate, _normalize_df
+
+    rows = [
+        {'id': 'a', 'version': 1, 'name': 'a', 'algorithm': 'XGBoost', 'modelType': 'python',
+         'scoreCodeType': 'python', 'metrics': {'accuracy': 0.8, 'f1': '0.5'}},
+        {'id': 'b', 'version': 1, 'name': '', 'algorithm': 'XGBoost', 'modelType': None,
+         'scoreCodeType': 'R', 'metrics': {'accuracy': 0.6}},
+        {'id': 'c', 'version': 1, 'name': 'c', 'algorithm': 'GLM', 'modelType': 'sas',
+         'scoreCodeType': 'python', 'metrics': {'accuracy': 'n/a'}},
+    ]
+    new_b = dict(rows[1], version=2, algorithm='GLM', metrics={'accuracy': 0.7})
+
+    full = InsightsAggregate.from_frame(_normalize_df(pd.DataFrame([rows[0], new_b, rows[2]]))).snapshot()
+    assert full['total_modelos'] == 3
+    assert full['por_tipo'] == {'python': 1, 'sas': 1}
+    assert full['algoritmo_mas_usado'] == 'GLM'
+    assert full['promedio_metricas'] == {'accuracy': 0.75, 'f1': 0.5}
+    assert full['campos_faltantes_promedio'] == 2 / 3
+
+    incremental = InsightsAggregate()
+    for row in rows:
+        incremental.add(row)
+    incremental.replace(rows[1], new_b)
+    snapshot = incremental.snapshot()
+    assert snapshot['promedio_metricas'] == pytest.approx(full.pop('promedio_metricas'))
+    snapshot.pop('promedio_metricas')
+    assert snapshot == full
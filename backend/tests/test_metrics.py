@@ -0,0 +1,44 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.routers import models as models_router
+from backend.app.services.model_service import ModelService
+from backend.app.utils.metrics import STAGE_SECONDS, Histogram
+from test_bulk import _record
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram('demo_seconds', 'Demo.', ('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        hist.observe(value, 'write')
+    lines = hist.render()
+    assert lines[:2] == ['# HELP demo_seconds Demo.', '# TYPE demo_seconds histogram']
+    assert 'demo_seconds_bucket{stage="write",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="write",le="1.0"} 3' in lines
+    assert 'demo_seconds_bucket{stage="write",le="+Inf"} 4' in lines
+    assert 'demo_seconds_count{stage="write"} 4' in lines
+
+
+def test_metrics_endpoint_exposes_stages_and_routes(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(models_router, 'model_service', ModelService())
+    client = TestClient(app)
+    writes = STAGE_SECONDS.count('parquet_write')
+
+    assert client.post('/models', json=_record('m1')).status_code == 200
+    assert client.get('/models/m1').status_code == 200
+    assert STAGE_SECONDS.count('parquet_write') == writes + 1
+
+    response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    body = response.text
+    assert 'registry_stage_duration_seconds_count{stage="append"}' in body
+    # Las rutas se agrupan por plantilla, no por id
+    assert 'http_request_duration_seconds_count{method="GET",route="/models/{model_id}",status="200"}' in body
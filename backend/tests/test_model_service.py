@@ -10,6 +10,8 @@ from backend.app.services.model_service import ModelService
 from backend.app.models.model_schema import MLModel, CustomProperty
 from datetime import datetime
 
+import pyarrow as pa
+
 
 def test_create_model(tmp_path, monkeypatch):
     # Configurar DATA_DIR temporal
@@ -42,3 +44,148 @@ def test_create_model(tmp_path, monkeypatch):
     assert res.id != ''
     models_file = tmp_path / 'models.parquet'
     assert models_file.exists()
+
+
+def _model(**overrides):
+    data = dict(
+        creationTimeStamp=datetime.utcnow(),
+        createdBy='tester',
+        modifiedTimeStamp=None,
+        modifiedBy=None,
+        id='model-1',
+        name='test-model',
+        description='desc',
+        scoreCodeType='python',
+        algorithm='XGBoost',
+        function='classification',
+        modeler='tester',
+        modelType='python',
+        trainCodeType='python',
+        targetLevel='ordinal',
+        tool='Python',
+        toolVersion='3.9',
+        externalUrl=None,
+        modelVersionName='1.0',
+        custom_properties=[CustomProperty(name='owner', value='team-a', type='string')],
+    )
+    data.update(overrides)
+    return MLModel(**data)
+
+
+def test_indexes_track_versions_and_reload(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    svc.create_model(_model())
+    svc.create_model(_model(id='model-2', algorithm='LightGBM', custom_properties=[]))
+    updated = svc.update_model('model-1', _model(description='v2'))
+    assert updated.version == 2
+    assert svc.update_model('missing', _model()) is None
+
+    assert svc.get_model('model-1').description == 'v2'
+    assert svc.get_model('model-1', version=1).description == 'desc'
+    assert svc.get_model('model-1', version=3) is None
+    assert svc.get_model('missing') is None
+
+    latest = {m.id: m.version for m in svc.get_all_models()}
+    assert latest == {'model-1': 2, 'model-2': 1}
+    assert len(svc.get_all_models(latest_only=False)) == 3
+    assert svc.get_models_summary()['algorithms'] == {'XGBoost': 1, 'LightGBM': 1}
+    assert svc.get_insights()['total_modelos'] == 2
+    svc.update_model('model-2', _model(id='model-2', algorithm='XGBoost', name=''))
+    insights = svc.get_insights()
+    assert insights['algoritmo_mas_usado'] == 'XGBoost'
+    assert insights['campos_faltantes_promedio'] == 0.5
+
+    # Un servicio nuevo reconstruye los índices desde base + segmentos
+    reloaded = ModelService()
+    assert reloaded.get_model('model-1').version == 2
+    assert reloaded.get_model('model-1').custom_properties[0].value == 'team-a'
+    assert {m.id for m in reloaded.get_all_models()} == {'model-1', 'model-2'}
+
+
+def test_services_sharing_data_dir_apply_each_other_writes(tmp_path, monkeypatch):
+    # Dos instancias simulan dos workers de uvicorn sobre el mismo directorio
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    worker_a, worker_b = ModelService(), ModelService()
+    worker_a.create_model(_model())
+    assert worker_b.get_model('model-1').version == 1
+
+    # La versión se calcula sobre el estado en disco, no sobre la copia local
+    assert worker_b.update_model('model-1', _model(description='b')).version == 2
+    assert worker_a.update_model('model-1', _model(description='a')).version == 3
+    worker_b.create_model(_model(id='model-2'))
+    assert {m.id: m.version for m in worker_a.get_all_models()} == {'model-1': 3, 'model-2': 1}
+    assert [m.description for m in worker_b.get_all_models(latest_only=False)][:3] == ['desc', 'b', 'a']
+
+    # Tras una compactación los deltas ya no existen: recarga completa
+    worker_a.store.compact()
+    worker_a.create_model(_model(id='model-3'))
+    worker_a.store.compact()
+    assert worker_b.get_model('model-3').version == 1
+    assert len(worker_b.get_all_models(latest_only=False)) == 5
+
+
+def test_lazy_load_from_arrow_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    svc.create_model(_model())
+    svc.create_model(_model(id='model-2'))
+    svc.store.compact()
+    assert (tmp_path / 'models.arrow').exists()
+    svc.update_model('model-2', _model(id='model-2', description='v2'))
+
+    # Construir el servicio no lee el registro
+    fresh = ModelService()
+    assert not fresh.engine._loaded
+    # Instantánea (generación 2) + el segmento posterior, sin pasar por pandas completo
+    assert fresh.get_model('model-2').description == 'v2'
+    assert fresh.engine._table.num_rows == 2 and fresh.engine._base_df is None
+    page = fresh.get_models_page(fields=['id', 'version'])
+    assert page['items'] == [{'id': 'model-1', 'version': 1}, {'id': 'model-2', 'version': 2}]
+    assert fresh.get_models_summary()['total_models'] == 2
+
+    # Sin instantánea se lee el Parquet y se deja una nueva
+    (tmp_path / 'models.arrow').unlink()
+    assert ModelService().get_model('model-1').version == 1
+    assert (tmp_path / 'models.arrow').exists()
+
+
+def test_registry_is_dictionary_encoded_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    svc.create_models([_model(id=f'm-{i}', algorithm='GLM' if i % 3 else 'XGBoost') for i in range(6)])
+    svc.update_model('m-0', _model(id='m-0', algorithm='GLM'))
+
+    assert svc.get_models_summary()['algorithms'] == {'GLM': 5, 'XGBoost': 1}
+    table = svc.engine._table
+    assert pa.types.is_dictionary(table.schema.field('algorithm').type)
+    assert [f.name for f in table.schema.field('custom_properties').type.value_type] == ['name', 'value', 'type']
+    assert svc.get_model('m-0', version=1).algorithm == 'XGBoost'
+    assert svc.get_model('m-0').custom_properties[0].value == 'team-a'
+
+
+def test_identical_writes_do_not_create_versions(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    created = datetime(2025, 1, 1)
+    first = svc.register_models([_model(creationTimeStamp=created)])[0]
+    assert first.created and first.model.version == 1
+    generation = svc.store.generation
+
+    again = svc.register_models([_model(creationTimeStamp=created)])[0]
+    assert not again.created and again.model.version == 1
+    # Un PUT sin cambios no sube la versión ni escribe
+    result = svc.revise_model('model-1', _model(creationTimeStamp=created))
+    assert not result.created and result.model.version == 1
+    assert svc.store.generation == generation
+
+    assert svc.revise_model('model-1', _model(creationTimeStamp=created, description='v2')).created
+    assert svc.update_model('model-1', _model(creationTimeStamp=created, description='v2')).version == 2
+    assert svc.store.generation == generation + 1
+
+    # Las filas sin hash (escritas antes de existir la columna) se comparan por contenido
+    svc.store.compact()
+    legacy = ModelService()
+    legacy.refresh()
+    legacy.engine._hashes = {k: None for k in legacy.engine._hashes}
+    assert not legacy.register_models([_model(creationTimeStamp=created, description='v2')])[0].created
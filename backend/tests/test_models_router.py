@@ -0,0 +1,173 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.models.query_schema import ModelQuery, Predicate
+from backend.app.routers import models as models_router
+from backend.app.services.model_service import ModelService
+from test_bulk import _record
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    svc = ModelService()
+    monkeypatch.setattr(models_router, 'model_service', svc)
+    svc.create_models([models_router.MLModel(**_record(f'm{i:02d}')) for i in range(5)])
+    svc.update_model('m01', models_router.MLModel(**_record('m01', description='v2')))
+    return TestClient(app)
+
+
+def test_list_supports_offset_and_limit(client):
+    assert len(client.get('/models/').json()) == 5
+    page = client.get('/models/', params={'offset': 1, 'limit': 2}).json()
+    assert [m['id'] for m in page] == ['m02', 'm03']
+
+
+def test_page_cursor_walks_all_rows_with_projection(client):
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 2, 'fields': 'id,version', 'latest_only': False}
+        if cursor:
+            params['cursor'] = cursor
+        page = client.get('/models/page', params=params).json()
+        assert page['total'] == 6
+        assert all(set(item) == {'id', 'version'} for item in page['items'])
+        seen.extend((item['id'], item['version']) for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == 6 and ('m01', 2) in seen
+
+    assert client.get('/models/page', params={'fields': 'id,nope'}).status_code == 400
+
+
+def test_stream_returns_ndjson(client):
+    response = client.get('/models/stream', params={'fields': 'id,description,creationTimeStamp'})
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 5
+    assert {'id': 'm01', 'description': 'v2', 'creationTimeStamp': '2025-03-12T16:50:51.979000Z'} in lines
+
+    full = [json.loads(line) for line in client.get('/models/stream').text.splitlines()]
+    assert full == client.get('/models/').json()
+
+
+def test_query_with_index_and_residual_filters(client, tmp_path):
+    svc = models_router.model_service
+    svc.create_models([
+        models_router.MLModel(**_record('x1', algorithm='LightGBM', createdBy='ana',
+                                        creationTimeStamp='2025-06-01T00:00:00Z')),
+        models_router.MLModel(**_record('x2', algorithm='LightGBM', createdBy='luis',
+                                        creationTimeStamp='2025-07-01T00:00:00')),
+    ])
+    body = {'filters': [{'field': 'algorithm', 'op': 'in', 'value': ['LightGBM', 'GLM']},
+                        {'field': 'creationTimeStamp', 'op': 'gte', 'value': '2025-05-01T00:00:00Z'},
+                        {'field': 'description', 'op': 'eq', 'value': 'desc'}],
+            'sort_by': 'createdBy', 'descending': True, 'fields': ['id', 'createdBy']}
+    result = client.post('/models/query', json=body).json()
+    assert result['total'] == 2
+    assert result['items'] == [{'id': 'x2', 'createdBy': 'luis'}, {'id': 'x1', 'createdBy': 'ana'}]
+
+    # El índice se mantiene al versionar: x1 deja de ser LightGBM
+    svc.update_model('x1', models_router.MLModel(**_record('x1', algorithm='GLM')))
+    result = client.get('/models/query', params={'algorithm': 'LightGBM', 'fields': 'id'}).json()
+    assert result['items'] == [{'id': 'x2'}]
+    result = client.get('/models/query', params={'algorithm': 'GLM', 'created_to': '2025-04-01T00:00:00Z'}).json()
+    assert [m['id'] for m in result['items']] == ['x1'] and result['items'][0]['version'] == 2
+
+    history = client.post('/models/query', json={'latest_only': False,
+                                                  'filters': [{'field': 'id', 'op': 'eq', 'value': 'x1'}]}).json()
+    assert history['total'] == 2
+    assert client.post('/models/query', json={'filters': [{'field': 'nope', 'value': 1}]}).status_code == 422
+
+
+def test_query_rejects_values_that_do_not_fit_the_operator(client):
+    bodies = [{'field': 'algorithm', 'op': 'eq', 'value': ['GLM']},
+              {'field': 'version', 'op': 'gte', 'value': {'v': 1}},
+              {'field': 'algorithm', 'op': 'in', 'value': [['GLM'], 'LightGBM']},
+              {'field': 'version', 'op': 'between', 'value': [1, [2]]}]
+    for predicate in bodies:
+        response = client.post('/models/query', json={'filters': [predicate]})
+        assert response.status_code == 422, predicate
+    # Sin pasar por el esquema, el servicio igual responde un error de cliente y no un 500
+    query = ModelQuery.model_construct(filters=[Predicate.model_construct(field='version', op='gte', value={'v': 1})],
+                                       sort_by=None, descending=False, latest_only=True, offset=0, limit=10, fields=None)
+    with pytest.raises(ValueError):
+        models_router.model_service.query_models(query)
+
+
+def test_diff_between_versions(client):
+    diff = client.get('/models/m01/diff').json()
+    assert diff['from'] == 1 and diff['to'] == 2
+    assert diff['changes']['description']['to'] == 'v2'
+    assert client.get('/models/m01/diff', params={'from': 1, 'to': 1}).json()['changes'] == {}
+    assert client.get('/models/m01/diff', params={'to': 5}).status_code == 404
+
+
+def test_put_reports_whether_a_version_was_created(client):
+    current = client.get('/models/m02').json()
+    response = client.put('/models/m02', json=current)
+    assert response.headers['X-Version-Created'] == 'false' and response.json()['version'] == 1
+    response = client.put('/models/m02', json={**current, 'description': 'otra'})
+    assert response.headers['X-Version-Created'] == 'true' and response.json()['version'] == 2
+
+    upload = {'file': ('m.json', json.dumps(_record('m03')), 'application/json')}
+    assert client.post('/models/from-json-file', files=upload).json()['created'] is False
+
+
+def test_read_endpoints_use_generation_etags(client, monkeypatch):
+    from backend.app.routers import dashboard as dashboard_router
+    svc = models_router.model_service
+    monkeypatch.setattr(dashboard_router, 'model_service', svc)
+
+    for url in ('/models/summary/dashboard/', '/dashboard/insights', '/models/'):
+        first = client.get(url)
+        etag = first.headers['ETag']
+        assert first.status_code == 200 and 'Last-Modified' in first.headers
+        revalidated = client.get(url, headers={'If-None-Match': etag})
+        assert revalidated.status_code == 304 and revalidated.content == b''
+        assert client.get(url, headers={'If-None-Match': f'W/{etag}'}).status_code == 304
+
+    # La segunda lectura sale de la caché; otros parámetros son otra representación
+    hits = svc.response_cache.hits
+    assert client.get('/models/').json() == client.get('/models/', params={'limit': 100}).json()
+    assert svc.response_cache.hits == hits + 1
+    assert client.get('/models/', params={'limit': 2}).headers['ETag'] != etag
+
+    # Una escritura cambia la generación: el ETag anterior deja de valer
+    svc.update_model('m02', models_router.MLModel(**_record('m02', description='v2')))
+    response = client.get('/models/', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert {m['id']: m['version'] for m in response.json()}['m02'] == 2
+
+
+def test_upload_accepts_several_files(client, monkeypatch):
+    from backend.app.services import bulk
+    # Lotes chicos para pasar por el pool de validación
+    monkeypatch.setattr(bulk, 'BULK_WORKERS', 2)
+    monkeypatch.setattr(bulk, 'STREAM_BATCH_SIZE', 2)
+    files = [
+        ('files', ('lote.json', json.dumps([_record(f'u{i}') for i in range(3)]), 'application/json')),
+        ('files', ('lote.ndjson', '\n'.join(json.dumps(_record(f'n{i}')) for i in range(3)), 'application/x-ndjson')),
+        ('files', ('uno.json', json.dumps(_record('m00')), 'application/json')),
+    ]
+    report = client.post('/models/upload', files=files).json()
+    assert (report['total'], report['created'], report['unchanged'], report['failed']) == (7, 6, 1, 0)
+    assert report['files'] == ['lote.json', 'lote.ndjson', 'uno.json']
+    assert [r['source'] for r in report['results']][:4] == ['lote.json[0]', 'lote.json[1]', 'lote.json[2]', 'lote.ndjson[0]']
+    assert client.get('/models/n2').status_code == 200
+
+    bad = [('files', ('notas.txt', 'hola', 'text/plain'))]
+    assert client.post('/models/upload', files=bad).status_code == 400
+    broken = {'file': ('roto.json', '[{"id": "a"},', 'application/json')}
+    assert client.post('/models/from-json-file', files=broken).status_code == 400
@@ -0,0 +1,37 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from datetime import datetime, timezone
+
+import pyarrow as pa
+
+from backend.app.services.registry_schema import CATEGORY_TYPE, REGISTRY_SCHEMA, conform_table
+
+
+def test_conform_legacy_table():
+    legacy_props = pa.list_(pa.struct([('name', pa.string()), ('type', pa.string()), ('value', pa.string())]))
+    table = pa.table({
+        'id': ['a', 'b'],
+        'version': pa.array([1, 2], type=pa.int32()),
+        'algorithm': ['XGBoost', 'XGBoost'],
+        'creationTimeStamp': pa.array([datetime(2024, 1, 1), None], type=pa.timestamp('ns')),
+        'custom_properties': pa.array([[{'name': 'owner', 'type': 'string', 'value': 'ana'}], None],
+                                      type=legacy_props),
+        'raw_payload_json': ['{}', None],
+    })
+    conformed = conform_table(table)
+
+    assert conformed.schema.names == REGISTRY_SCHEMA.names + ['raw_payload_json']
+    for field in REGISTRY_SCHEMA:
+        assert conformed.schema.field(field.name).type == field.type
+    assert conformed.schema.field('algorithm').type == CATEGORY_TYPE
+    assert conformed.column('algorithm').chunk(0).dictionary.to_pylist() == ['XGBoost']
+    row = conformed.to_pylist()[0]
+    assert row['custom_properties'] == [{'name': 'owner', 'value': 'ana', 'type': 'string'}]
+    # Las fechas sin zona se interpretan como UTC
+    assert row['creationTimeStamp'] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert conformed.to_pylist()[1]['custom_properties'] is None
@@ -0,0 +1,65 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json
+
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.models.model_schema import MLModel
+from backend.app.routers import models as models_router
+from backend.app.services.model_service import ModelService
+from test_bulk import _record
+
+
+@pytest.fixture(params=['parquet', 'sqlite'])
+def service(request, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('MODEL_STORAGE_ENGINE', request.param)
+    svc = ModelService()
+    svc.create_models([
+        MLModel(**_record('a', description='Predicción de tasa', externalUrl='http://x/a')),
+        MLModel(**_record('b', creationTimeStamp='2025-01-01T00:00:00Z', modifiedTimeStamp='2025-02-01T10:00:00.5Z',
+                          modifiedBy='ana', custom_properties=[{'name': 'team', 'value': 'riesgo', 'type': 'string'}])),
+    ])
+    svc.update_model('a', MLModel(**_record('a', algorithm='GLM')))
+    return svc
+
+
+def _pydantic_bytes(payload) -> bytes:
+    # Lo que produce FastAPI con response_model (ver cached_json)
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def test_fast_serialization_matches_pydantic(service):
+    for latest_only in (True, False):
+        assert service.get_all_models_json(latest_only) == _pydantic_bytes(service.get_all_models(latest_only))
+    assert service.get_all_models_json(offset=1, limit=1) == _pydantic_bytes(service.get_all_models(offset=1, limit=1))
+    for model_id, version in (('a', None), ('a', 1), ('b', None)):
+        assert service.get_model_json(model_id, version) == _pydantic_bytes(service.get_model(model_id, version))
+    assert service.get_model_json('missing') is None
+
+    fields = ['id', 'modifiedTimeStamp', 'custom_properties', 'version']
+    fast = service.get_models_page(limit=10), service.get_models_page(limit=10, fields=fields)
+    service.fast_serialization = False
+    assert (service.get_models_page(limit=10), service.get_models_page(limit=10, fields=fields)) == fast
+
+
+def test_endpoints_keep_the_response_schema(service, monkeypatch):
+    monkeypatch.setattr(models_router, 'model_service', service)
+    with TestClient(app) as client:
+        fast = client.get('/models/', params={'latest_only': False}), client.get('/models/b')
+        service.fast_serialization = False
+        service.response_cache.clear()
+        slow = client.get('/models/', params={'latest_only': False}), client.get('/models/b')
+        assert client.get('/models/missing').status_code == 404
+    assert [r.content for r in fast] == [r.content for r in slow]
+    assert fast[1].headers['content-type'] == 'application/json'
+    assert orjson.loads(fast[1].content)['custom_properties'] == [{'name': 'team', 'value': 'riesgo', 'type': 'string'}]
@@ -0,0 +1,51 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.app.models.model_schema import MLModel
+from backend.app.services.model_service import ModelService
+from backend.app.services.search_index import SearchIndex, tokenize
+from test_bulk import _record
+
+
+def test_tokenize_strips_accents_and_punctuation():
+    assert tokenize('Clasificación BAC_VALOR-CLIENTE 12M') == ['clasificacion', 'bac', 'valor', 'cliente', '12m']
+
+
+def test_ranking_prefix_and_updates():
+    index = SearchIndex.build([
+        {'id': 'a', 'name': 'churn predictor', 'description': 'modelo de fuga'},
+        {'id': 'b', 'name': 'credit score', 'description': 'predice churn en tarjetas',
+         'custom_properties': [{'name': 'DS_TAMD', 'value': 'Supervisado', 'type': 'string'}]},
+    ])
+    # El nombre pesa más que la descripción
+    assert [d for d, _ in index.search('churn')] == ['a', 'b']
+    assert [d for d, _ in index.search('supervis')] == ['b']
+    assert [d for d, _ in index.search('churn tarj')] == ['b']
+    assert index.search('inexistente') == []
+
+    index.update('a', {'id': 'a', 'name': 'fraude'})
+    assert [d for d, _ in index.search('churn')] == ['b']
+    assert 'predictor' not in index.vocabulary
+
+
+def test_service_search_is_persisted_and_replayed(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('SEARCH_INDEX_SAVE_EVERY', '1000')
+    svc = ModelService()
+    svc.create_models([MLModel(**_record('a', name='churn predictor')), MLModel(**_record('b', name='fraude'))])
+    result = svc.search_models('chur', fields=['id', 'name'])
+    assert result['total'] == 1
+    assert result['items'][0]['id'] == 'a' and result['items'][0]['score'] > 0
+    assert (tmp_path / 'models.search.json').exists()
+
+    # Cambios posteriores al último guardado se reaplican desde los segmentos al recargar
+    svc.update_model('b', MLModel(**_record('b', name='churn fraude')))
+    assert SearchIndex.load(tmp_path / 'models.search.json').generation < svc.store.generation
+    assert [i['id'] for i in svc.search_models('churn')['items']] == ['a', 'b']
+    reloaded = ModelService()
+    assert [i['id'] for i in reloaded.search_models('fraude')['items']] == ['b']
+    assert reloaded.search_models('churn')['total'] == 2
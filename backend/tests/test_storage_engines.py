@@ -0,0 +1,142 @@
+import os
+import sys
+# Asegurar que el root del repo esté en sys.path para que 'backend' sea importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from backend.app.models.model_schema import MLModel
+from backend.app.models.query_schema import ModelQuery
+from backend.app.services.master import read_export, rebuild_master
+from backend.app.services.model_service import ModelService
+from test_bulk import _record
+
+
+@pytest.fixture(params=['parquet', 'sqlite'])
+def engine_env(request, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('MODEL_STORAGE_ENGINE', request.param)
+    return request.param
+
+
+def _models(n):
+    return [MLModel(**_record(f'm{i}', algorithm='GLM' if i % 2 else 'XGBoost',
+                              creationTimeStamp=f'2025-01-{i + 1:02d}T00:00:00Z',
+                              custom_properties=[{'name': 'team', 'value': f't{i}', 'type': 'string'}]))
+            for i in range(n)]
+
+
+def test_engines_share_service_behaviour(engine_env):
+    svc = ModelService()
+    assert svc.engine.name == engine_env
+    svc.create_models(_models(4))
+    assert svc.update_model('m0', MLModel(**{**_record('m0'), 'algorithm': 'GLM'})).version == 2
+    assert not svc.register_models([MLModel(**_record('m1', algorithm='GLM', creationTimeStamp='2025-01-02T00:00:00Z',
+                                                      custom_properties=[{'name': 'team', 'value': 't1',
+                                                                          'type': 'string'}]))])[0].created
+
+    assert svc.get_model('m0').algorithm == 'GLM' and svc.get_model('m0', version=1).algorithm == 'XGBoost'
+    assert svc.get_model('m2').custom_properties[0].value == 't2'
+    assert svc.get_model('missing') is None and svc.get_model('m0', version=9) is None
+    assert svc.diff_versions('m0')['changes']['algorithm'] == {'from': 'XGBoost', 'to': 'GLM'}
+
+    summary = svc.get_models_summary()
+    assert summary['total_models'] == 4 and summary['algorithms'] == {'GLM': 3, 'XGBoost': 1}
+    assert svc.get_insights()
+    assert len(svc.get_all_models(latest_only=False)) == 5
+
+    first = svc.get_models_page(limit=3, fields=['id'])
+    rest = svc.get_models_page(limit=3, cursor=first['next_cursor'], fields=['id'])
+    assert [i['id'] for i in first['items'] + rest['items']] == ['m1', 'm2', 'm3', 'm0']
+    assert rest['next_cursor'] is None and first['total'] == 4
+    assert [len(chunk) for chunk in svc.iter_models(chunk_size=2)] == [2, 2]
+
+    query = ModelQuery(filters=[{'field': 'algorithm', 'op': 'eq', 'value': 'GLM'},
+                                {'field': 'creationTimeStamp', 'op': 'gte', 'value': '2025-01-02T00:00:00Z'}],
+                       sort_by='id', descending=True, fields=['id', 'version'])
+    assert svc.query_models(query)['items'] == [{'id': 'm3', 'version': 1}, {'id': 'm1', 'version': 1},
+                                                {'id': 'm0', 'version': 2}]
+    assert svc.search_models('t3')['items'][0]['id'] == 'm3'
+
+    # Otro proceso (otro servicio sobre el mismo directorio) ve las escrituras y avisa los cambios
+    other = ModelService()
+    other.create_model(MLModel(**_record('m9', algorithm='XGBoost')))
+    assert svc.get_models_summary()['algorithms'] == {'GLM': 3, 'XGBoost': 2}
+    assert svc.get_insights()['total_modelos'] == 5
+    assert svc.search_models('m9')['items'][0]['id'] == 'm9'
+
+    rebuild_master(svc.data_dir)
+    latest = read_export('master_latest', svc.data_dir).to_pandas()
+    assert sorted(latest['id']) == ['m0', 'm1', 'm2', 'm3', 'm9']
+    # El hash interno no se exporta como parte del payload
+    assert 'payload.content_hash' not in latest.columns and 'payload.description' in latest.columns
+
+
+def test_unsaved_rows_keep_utc_timestamps(engine_env):
+    svc = ModelService()
+    svc.create_models([MLModel(**_record('a', creationTimeStamp='2025-01-01T10:00:00')),
+                       MLModel(**_record('b', creationTimeStamp='2025-01-01T10:00:00-03:00'))])
+    updated = svc.update_model('a', MLModel(**_record('a', creationTimeStamp='2025-01-01T10:00:00', description='v2')))
+    assert updated.modifiedTimeStamp.utcoffset().total_seconds() == 0
+
+    # Lo recién escrito tiene las mismas fechas que al leerlo de disco en otro worker
+    fresh = ModelService()
+    for model_id in ('a', 'b'):
+        before, after = svc.get_model(model_id), fresh.get_model(model_id)
+        assert before.creationTimeStamp == after.creationTimeStamp
+        assert before.creationTimeStamp.utcoffset().total_seconds() == 0
+    assert svc.get_model('b').creationTimeStamp.hour == 13
+    assert svc.get_model('a').modifiedTimeStamp == fresh.get_model('a').modifiedTimeStamp
+    assert svc.get_all_models_json() == fresh.get_all_models_json()
+
+
+def test_sqlite_uses_wal_and_latest_indexes(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    # Un registro Parquet existente se importa al abrir la base por primera vez
+    ModelService().create_models(_models(3))
+    monkeypatch.setenv('MODEL_STORAGE_ENGINE', 'sqlite')
+    svc = ModelService()
+    assert svc.get_models_summary()['total_models'] == 3
+    assert svc.update_model('m1', MLModel(**_record('m1', description='v2'))).version == 2
+
+    conn = sqlite3.connect(tmp_path / 'models.sqlite3')
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    plan = ' '.join(r[-1] for r in conn.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM model_versions WHERE is_latest = 1 AND "algorithm" = ?', ('GLM',)))
+    assert 'ix_latest_algorithm' in plan
+    assert conn.execute('SELECT COUNT(*) FROM model_versions WHERE is_latest = 1').fetchone()[0] == 3
+
+
+def test_sqlite_full_rebuild_reads_the_registry_in_batches(tmp_path, monkeypatch):
+    from backend.app.services import master
+
+    monkeypatch.setenv('DATA_DIR', str(tmp_path))
+    monkeypatch.setenv('MODEL_STORAGE_ENGINE', 'sqlite')
+    svc = ModelService()
+    svc.create_models(_models(5))
+    svc.update_model('m1', MLModel(**_record('m1', description='v2')))
+    generation = svc.engine.generation
+    svc.update_model('m2', MLModel(**_record('m2', description='v2')))
+
+    batches = list(svc.engine.scan_batches(generation, batch_rows=2))
+    assert [b.num_rows for b in batches] == [2, 2, 2]
+    # La última versión de cada id a esa generación (la v2 de m2 es posterior)
+    latest = pa.concat_tables(svc.engine.scan_batches(generation, latest_only=True, batch_rows=2))
+    latest = [(r['id'], r['version']) for r in latest.select(['id', 'version']).to_pylist()]
+    assert latest == [('m0', 1), ('m2', 1), ('m3', 1), ('m4', 1), ('m1', 2)]
+
+    rebuild_master(tmp_path, incremental=False)
+    single = {name: read_export(name, tmp_path) for name in master.EXPORT_NAMES}
+    monkeypatch.setattr(master, 'EXPORT_BATCH_ROWS', 2)
+    rebuild_master(tmp_path, incremental=False)
+    for name, table in single.items():
+        assert read_export(name, tmp_path).equals(table)
+    assert pq.ParquetFile(tmp_path / 'exports' / 'master_all.parquet').num_row_groups == 4
+    assert sorted(single['master_latest'].column('id').to_pylist()) == [f'm{i}' for i in range(5)]